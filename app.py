@@ -3,10 +3,11 @@ import pandas as pd
 import os
 import io
 import json
+import hashlib
 import webbrowser
-from openpyxl import load_workbook
 import streamlit.components.v1 as components
-from st_aggrid import AgGrid, GridOptionsBuilder, GridUpdateMode, DataReturnMode
+from backend.core.value_format import ValueFormatter
+# openpyxl and st_aggrid are imported where they are used to keep startup fast
 
 st.set_page_config(page_title="Spectro Report Viewer", layout="wide")
 
@@ -45,21 +46,172 @@ def save_settings(settings):
 if "app_settings" not in st.session_state:
     st.session_state.app_settings = load_settings()
 
+def latest_watched_file(settings):
+    """Newest spreadsheet in the spectrometer's export folder (MTC_WATCH_DIR or settings "watch_dir"), or None."""
+    directory = os.environ.get("MTC_WATCH_DIR") or settings.get("watch_dir")
+    if not directory or not os.path.isdir(directory):
+        return None
+    files = [
+        e for e in os.scandir(directory)
+        if e.is_file() and e.name.lower().endswith((".xlsx", ".xls")) and not e.name.startswith("~$")
+    ]
+    return max(files, key=lambda e: e.stat().st_mtime).path if files else None
+
+def file_fingerprint(path):
+    """(path, mtime, size) of a file on disk: the cache key for what is read from it."""
+    info = os.stat(path)
+    return (path, info.st_mtime_ns, info.st_size)
+
+@st.cache_data(max_entries=8, show_spinner="Reading report...")
+def load_report(key, _source):
+    """
+    Spectro export as the viewer shows it (S.No added, CE% computed), read once per `key`:
+    the content hash of an upload or the fingerprint of a file on disk.
+    Returns (data, CE% error message or None).
+    """
+    data = pd.read_excel(_source)
+
+    # Add S.No column
+    if 'S.No' not in data.columns:
+        data.insert(0, 'S.No', range(1, 1 + len(data)))
+
+    # Calculate CE% = C + (Si / 3) + P
+    # We look for exact matches of standard chemistry headers
+    c_col = "C [%]"
+    si_col = "Si [%]"
+    p_col = "P [%]"
+
+    ce_error = None
+    if all(col in data.columns for col in [c_col, si_col, p_col]):
+        try:
+            # Ensure columns are numeric
+            c_val = pd.to_numeric(data[c_col], errors='coerce')
+            si_val = pd.to_numeric(data[si_col], errors='coerce')
+            p_val = pd.to_numeric(data[p_col], errors='coerce')
+
+            # Calculate formula
+            ce_val = c_val + (si_val / 3) + p_val
+
+            # Round C, Si, and CE to 2 decimal places as requested
+            data[c_col] = c_val.round(2)
+            data[si_col] = si_val.round(2)
+            ce_val = ce_val.round(2)
+
+            # Insert the CE% column (e.g., after standard chemistry if possible, or just append)
+            # User requested to move CE% next to Si% (after Si)
+            if si_col in data.columns:
+                loc_index = data.columns.get_loc(si_col) + 1
+            elif c_col in data.columns:
+                loc_index = data.columns.get_loc(c_col) + 1
+            else:
+                loc_index = 1
+
+            if "CE%" not in data.columns:
+                data.insert(loc_index, "CE%", ce_val)
+            else:
+                data["CE%"] = ce_val # Update if exists
+
+        except Exception as e:
+            ce_error = str(e)
+    return data, ce_error
+
+@st.cache_data(max_entries=16, show_spinner=False)
+def deduplicate_report(key, _data, sample_col, heat_col, group_col):
+    """
+    Sample Id / Heat No with their "-N" suffix removed and, with `group_col`, at most two
+    rows per value of it. Memoized per report `key` and column choice.
+    """
+    data = _data.copy()
+
+    # Clean Sample Id if found
+    if sample_col:
+        data[sample_col] = data[sample_col].astype(str).str.replace(r'-\d+$', '', regex=True)
+
+    # Clean Heat No if found
+    if heat_col:
+        data[heat_col] = data[heat_col].astype(str).str.replace(r'-\d+$', '', regex=True)
+
+    if group_col:
+        # Apply Top 2 Logic
+        data = data.groupby(group_col).head(2).reset_index(drop=True)
+
+        # Re-generate S.No
+        if 'S.No' in data.columns:
+            data['S.No'] = range(1, 1 + len(data))
+    return data
+
+@st.cache_data(max_entries=4, show_spinner=False)
+def load_mtc_sheet(key):
+    """The MTC workbook's first sheet without headers, re-read only when the file changes (`key` = fingerprint)."""
+    return pd.read_excel(key[0], header=None)
+
+# Rows per page offered by the Report Viewer grid
+PAGE_SIZES = [50, 100, 250, 500]
+
+def apply_filter_model(data, model):
+    """
+    Rows matching a Report Viewer filter model, sorted as it says. The model is
+    {"filters": {column: {"values": [...]} or {"min": x, "max": y}}, "sort": [column, ascending] or None}.
+    """
+    mask = pd.Series(True, index=data.index)
+    for col, f in model.get("filters", {}).items():
+        if col not in data.columns:
+            continue
+        if "values" in f:
+            mask &= data[col].astype(str).isin(f["values"])
+        else:
+            mask &= pd.to_numeric(data[col], errors="coerce").between(f["min"], f["max"])
+    result = data[mask]
+    sort = model.get("sort")
+    if sort and sort[0] in result.columns:
+        result = result.sort_values(sort[0], ascending=sort[1], kind="stable")
+    return result.reset_index(drop=True)
+
+@st.cache_data(max_entries=16, show_spinner=False)
+def filter_report(key, dedup, _data, model):
+    """apply_filter_model memoized per report `key`, clean/dedup choice and filter model."""
+    return apply_filter_model(_data, model)
+
+def report_view_frame():
+    """
+    Rows the Report Viewer currently shows, for the MTC tab. Only the view (file key,
+    dedup choice and filter model) is kept in the session; the rows come from the caches.
+    """
+    view = st.session_state.get("report_view")
+    if not view:
+        return pd.DataFrame()
+    source = view["source"]
+    if source is None:
+        uploaded = st.session_state.get("report_uploader")
+        if uploaded is None:
+            return pd.DataFrame()
+        source = io.BytesIO(uploaded.getvalue())
+    data, _ = load_report(view["key"], source)
+    if view["dedup"]:
+        data = deduplicate_report(view["key"], data, *view["dedup"])
+    return filter_report(view["key"], view["dedup"], data, view["model"])
+
 def render_report_viewer():
+    from st_aggrid import AgGrid, GridOptionsBuilder, GridUpdateMode, DataReturnMode
+
     st.header("Daily Report")
     
-    # Default file path
-    DEFAULT_FILE_PATH = r"E:\SPECTRO-09-01-2026.xlsx"
+    # Default file: the latest export in the watched folder, else the fixed path
+    DEFAULT_FILE_PATH = latest_watched_file(st.session_state.app_settings) or r"E:\SPECTRO-09-01-2026.xlsx"
     
     # File Uploader
     uploaded_file = st.file_uploader("Upload an Excel file", type=["xlsx", "xls"], key="report_uploader")
     
     data = None
     source_name = ""
+    data_key = None
+    ce_error = None
     
     if uploaded_file is not None:
         try:
-            data = pd.read_excel(uploaded_file)
+            content = uploaded_file.getvalue()
+            data_key = hashlib.sha256(content).hexdigest()
+            data, ce_error = load_report(data_key, io.BytesIO(content))
             source_name = uploaded_file.name
             st.success(f"Loaded uploaded file: {source_name}")
         except Exception as e:
@@ -68,7 +220,8 @@ def render_report_viewer():
         # Try loading the default file
         if os.path.exists(DEFAULT_FILE_PATH):
             try:
-                data = pd.read_excel(DEFAULT_FILE_PATH)
+                data_key = file_fingerprint(DEFAULT_FILE_PATH)
+                data, ce_error = load_report(data_key, DEFAULT_FILE_PATH)
                 source_name = DEFAULT_FILE_PATH
             except Exception as e:
                 st.error(f"Error reading default file at {DEFAULT_FILE_PATH}: {e}")
@@ -81,47 +234,8 @@ def render_report_viewer():
     if data is not None:
         st.subheader(f"Report Data: {source_name}")
     
-        # Add S.No column
-        if 'S.No' not in data.columns:
-            data.insert(0, 'S.No', range(1, 1 + len(data)))
-    
-        # Calculate CE% = C + (Si / 3) + P
-        # We look for exact matches of standard chemistry headers
-        c_col = "C [%]"
-        si_col = "Si [%]"
-        p_col = "P [%]"
-        
-        if all(col in data.columns for col in [c_col, si_col, p_col]):
-            try:
-                # Ensure columns are numeric
-                c_val = pd.to_numeric(data[c_col], errors='coerce')
-                si_val = pd.to_numeric(data[si_col], errors='coerce')
-                p_val = pd.to_numeric(data[p_col], errors='coerce')
-                
-                # Calculate formula
-                ce_val = c_val + (si_val / 3) + p_val
-                
-                # Round C, Si, and CE to 2 decimal places as requested
-                data[c_col] = c_val.round(2)
-                data[si_col] = si_val.round(2)
-                ce_val = ce_val.round(2)
-                
-                # Insert the CE% column (e.g., after standard chemistry if possible, or just append)
-                # User requested to move CE% next to Si% (after Si)
-                if si_col in data.columns:
-                    loc_index = data.columns.get_loc(si_col) + 1
-                elif c_col in data.columns:
-                    loc_index = data.columns.get_loc(c_col) + 1
-                else:
-                    loc_index = 1
-                    
-                if "CE%" not in data.columns:
-                    data.insert(loc_index, "CE%", ce_val)
-                else:
-                    data["CE%"] = ce_val # Update if exists
-                
-            except Exception as e:
-                st.error(f"Error calculating CE%: {e}")
+        if ce_error:
+            st.error(f"Error calculating CE%: {ce_error}")
     
         # Sidebar: Column Selection
         st.sidebar.markdown("---")
@@ -177,19 +291,12 @@ def render_report_viewer():
 
         # Deduplication Option
         deduplicate = st.sidebar.checkbox("Clean & Deduplicate (Max 2)", value=False, key="deduplicate")
+        dedup = None
         
         if deduplicate:
             # Identify columns
             sample_col = next((col for col in data.columns if "sample" in col.lower() and "id" in col.lower()), None)
             heat_col = next((col for col in data.columns if "heat" in col.lower() and "no" in col.lower()), None)
-            
-            # Clean Sample Id if found
-            if sample_col:
-                data[sample_col] = data[sample_col].astype(str).str.replace(r'-\d+$', '', regex=True)
-            
-            # Clean Heat No if found
-            if heat_col:
-                data[heat_col] = data[heat_col].astype(str).str.replace(r'-\d+$', '', regex=True)
 
             # Choose Deduplication Key
             options = []
@@ -201,17 +308,12 @@ def render_report_viewer():
                 dedup_choice = st.sidebar.radio("Group By (Max 2):", options, index=0)
                 if dedup_choice == "Sample Id": target_col_name = sample_col
                 if dedup_choice == "Heat No": target_col_name = heat_col
-                
-                if target_col_name:
-                    # Apply Top 2 Logic
-                    data = data.groupby(target_col_name).head(2).reset_index(drop=True)
-                    
-                    # Re-generate S.No
-                    if 'S.No' in data.columns:
-                        data['S.No'] = range(1, 1 + len(data))
             else:
                 st.sidebar.warning("Could not find 'Sample Id' or 'Heat No' to deduplicate.")
 
+            dedup = (sample_col, heat_col, target_col_name)
+            data = deduplicate_report(data_key, data, *dedup)
+
         # --- Saved Formats Logic ---
         st.sidebar.markdown("---")
         st.sidebar.subheader("Saved Formats")
@@ -321,63 +423,88 @@ def render_report_viewer():
             current_hidden = edited_col_df[~edited_col_df["Visible"]]["Column Name"].tolist()
             st.session_state.hidden_columns = current_hidden
         
-        # Filter data based on session state (The Truth)
+        # Visible columns from session state (The Truth)
         selected_columns = [col for col in all_columns if col not in st.session_state.hidden_columns]
     
-        if selected_columns:
-            data = data[selected_columns]
-        else:
+        if not selected_columns:
             st.warning("No columns selected!")
             st.stop()
     
+        # --- Filters (evaluated here, so only the visible page is sent to the grid) ---
+        model = {"filters": {}, "sort": None}
+        with st.expander("🔎 Filter & Sort", expanded=False):
+            filter_cols = st.multiselect("Filter on columns", options=all_columns, key="filter_columns")
+            for col in filter_cols:
+                numeric = pd.to_numeric(data[col], errors="coerce")
+                if pd.api.types.is_numeric_dtype(data[col]) and numeric.notna().any():
+                    lo, hi = float(numeric.min()), float(numeric.max())
+                    if lo < hi:
+                        chosen = st.slider(col, lo, hi, (lo, hi), key=f"filter_range_{col}")
+                        if chosen != (lo, hi):
+                            model["filters"][col] = {"min": chosen[0], "max": chosen[1]}
+                        continue
+                chosen = st.multiselect(col, options=sorted(data[col].astype(str).unique()), key=f"filter_values_{col}")
+                if chosen:
+                    model["filters"][col] = {"values": chosen}
+
+            sort_col = st.selectbox("Sort by", options=["(file order)"] + all_columns, key="sort_column")
+            if sort_col != "(file order)":
+                ascending = st.radio("Order", ["Ascending", "Descending"], horizontal=True, key="sort_order") == "Ascending"
+                model["sort"] = [sort_col, ascending]
+
+        filtered = filter_report(data_key, dedup, data, model)
+
+        # The MTC tab rebuilds the rows from this view instead of a stored copy of them
+        st.session_state.report_view = {
+            "key": data_key,
+            "source": None if uploaded_file is not None else DEFAULT_FILE_PATH,
+            "dedup": dedup,
+            "model": model,
+        }
+
+        # --- Paging ---
+        col_size, col_page = st.columns([1, 1])
+        with col_size:
+            page_size = st.selectbox("Rows per page", PAGE_SIZES, index=1, key="page_size")
+        pages = max(1, -(-len(filtered) // page_size))
+        if st.session_state.get("page_number", 1) > pages:
+            # Fewer pages after a filter change: go to the last one that still exists
+            st.session_state.page_number = pages
+        with col_page:
+            page = st.number_input(f"Page (of {pages})", min_value=1, max_value=pages, value=1, step=1, key="page_number")
+        first = (page - 1) * page_size
+        page_df = filtered.iloc[first:first + page_size][selected_columns]
+
+        if len(filtered):
+            st.info(f"Showing **{first + 1}-{first + len(page_df)}** of **{len(filtered)}** entries"
+                    + (f" (filtered from {len(data)})" if len(filtered) != len(data) else ""))
+        else:
+            st.info(f"No entries match the filters (of {len(data)})")
+
         # Build Grid Options
-        gb = GridOptionsBuilder.from_dataframe(data)
-        # gb.configure_pagination(paginationAutoPageSize=False, paginationPageSize=20) # Add pagination
+        gb = GridOptionsBuilder.from_dataframe(page_df)
         gb.configure_side_bar() # Add a sidebar
         gb.configure_default_column(
-            groupable=True, 
-            value=True, 
-            enableRowGroup=True, 
-            aggFunc='sum', 
             editable=False,
-            filterable=True,
-            sortable=True,
-            filter=True, # Enable filtering on all columns
+            sortable=False, # Sorting and filtering apply to all rows, above the grid
+            filter=False,
             minWidth=100, # Ensure columns are readable
-            resizable=True,
-            filterParams={
-                "buttons": ["apply", "reset"],
-                "closeOnApply": True
-            }
+            resizable=True
         )
         
         gridOptions = gb.build()
     
-        # Placeholder for row count
-        count_placeholder = st.empty()
-    
-        grid_response = AgGrid(
-            data, 
+        # Display only: nothing is sent back from the browser on interaction
+        AgGrid(
+            page_df, 
             gridOptions=gridOptions, 
-            enable_enterprise_modules=True, # Needed for some advanced filtering, but basic works
-            update_mode=GridUpdateMode.MODEL_CHANGED,
-            data_return_mode=DataReturnMode.FILTERED_AND_SORTED,
+            update_mode=GridUpdateMode.NO_UPDATE,
+            data_return_mode=DataReturnMode.AS_INPUT,
             fit_columns_on_grid_load=False,
             theme='streamlit', # Add theme
             height=800, # Make the grid taller for scrolling
             key="report_grid"
         )
-        
-        # Show row count in the placeholder
-        filtered_count = len(grid_response['data'])
-        count_placeholder.info(f"Showing **{filtered_count}** entries")
-        
-        # --- Persist Filtered Data for MTC Tab ---
-        # This allows us to use the filtered Heat List in the MTC dropdowns
-        if len(grid_response['data']) > 0:
-             st.session_state.filtered_df = pd.DataFrame(grid_response['data'])
-        else:
-             st.session_state.filtered_df = pd.DataFrame()
 
 def render_mtc_viewer():
     st.header("MTC Report")
@@ -387,7 +514,7 @@ def render_mtc_viewer():
     if os.path.exists(MTC_FILE_PATH):
         try:
             # Load Data without header clearly
-            df = pd.read_excel(MTC_FILE_PATH, header=None)
+            df = load_mtc_sheet(file_fingerprint(MTC_FILE_PATH))
             
             # --- Parsing Logic (Hardcoded for this specific template) ---
             # Row 1: Customer
@@ -439,7 +566,7 @@ def render_mtc_viewer():
             available_heats = []
             available_samples = []
             
-            fdf = st.session_state.filtered_df if 'filtered_df' in st.session_state and not st.session_state.filtered_df.empty else pd.DataFrame()
+            fdf = report_view_frame()
             
             if not fdf.empty:
                 # Find Column Names
@@ -507,7 +634,6 @@ def render_mtc_viewer():
                 return None
 
             # Get source data
-            fdf = st.session_state.filtered_df if 'filtered_df' in st.session_state else None
             
             # Fetch Rows
             # For data_row_1: Always taken index 0 (first match)
@@ -530,31 +656,21 @@ def render_mtc_viewer():
                 "CE": "-", "Tin": "-"
             }
             
-            for elem, col_name in element_map.items():
-                spec_val = specs.get(elem, "-")
-                
-                # Helper to format value
-                def fmt_val(row, col):
-                    if row is not None and col in row:
-                        raw = row[col]
-                        if pd.isna(raw): return ""
-                        # Format floats to 3 decimal places? Or keep as is? User showed 3.49% (2 decimals)
-                        # Let's try to keep 2-3 decimals if float.
-                        try:
-                            val_str = f"{float(raw):.2f}%" 
-                        except:
-                            val_str = str(raw)
-                        
-                        # Add % if missing and looks like a number
-                        if "%" not in val_str and val_str.replace('.','',1).isdigit(): val_str += "%"
-                        return val_str
-                    return ""
+            # Observed values are formatted like the backend certificates (per-element decimals,
+            # settings["value_format"]), both heat columns in one call
+            def raw_val(row, col):
+                return row[col] if row is not None and col in row else None
 
+            raw_values = [raw_val(row, col) for col in element_map.values() for row in (data_row_1, data_row_2)]
+            observed = ValueFormatter(st.session_state.app_settings).format_cells(
+                raw_values, [elem for elem in element_map for _ in range(2)])
+
+            for i, elem in enumerate(element_map):
                 chem_data.append({
                     "Element": elem,
-                    "Spec": spec_val,
-                    "heat1_val": fmt_val(data_row_1, col_name),
-                    "heat2_val": fmt_val(data_row_2, col_name),
+                    "Spec": specs.get(elem, "-"),
+                    "heat1_val": observed[2 * i],
+                    "heat2_val": observed[2 * i + 1],
                     "Hide": False
                 })
             
@@ -1220,7 +1336,18 @@ def render_mtc_viewer():
                         st.error(f"Error generating Excel: {e}")
                         return None
 
-                excel_data = generate_excel()
+                # Filling the template (a full openpyxl load and save) only runs on request; the
+                # workbook is kept until any input of the certificate changes
+                excel_key = hashlib.sha256(json.dumps([
+                    st.session_state.app_settings, invoice_no, qty_str, date_str, part_details, heat1, heat2,
+                    edited_chem_df.to_dict("records"), edited_mech_df.to_dict("records"),
+                ], default=str).encode("utf-8")).hexdigest()
+
+                if st.button("Prepare Excel (.xlsx)"):
+                    st.session_state.mtc_excel = (excel_key, generate_excel())
+
+                prepared = st.session_state.get("mtc_excel")
+                excel_data = prepared[1] if prepared and prepared[0] == excel_key else None
                 
                 if excel_data:
                      st.download_button(
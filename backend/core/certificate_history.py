@@ -0,0 +1,198 @@
+import os
+import json
+import sqlite3
+import datetime
+import threading
+
+from .elements import CERT_ELEMENTS, element_symbol, ELEMENT_SYMBOLS
+
+# Register columns for the mechanical block, matched by keyword in the parameter name
+MECHANICAL_COLUMNS = [("Hardness", "hardness"), ("Tensile Strength", "tensile"),
+                      ("Yield Strength", "yield"), ("Elongation", "elongation")]
+
+REGISTER_COLUMNS = (["Issued", "Invoice No", "Dispatch Date", "Quantity", "Part Details", "Grade", "Heat No"]
+                    + CERT_ELEMENTS + [name for name, _ in MECHANICAL_COLUMNS])
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS certificates (
+    cert_id      TEXT PRIMARY KEY,
+    issued_at    TEXT NOT NULL,
+    month        TEXT NOT NULL,
+    invoice_no   TEXT,
+    grade        TEXT,
+    heat1        TEXT,
+    heat2        TEXT,
+    payload      TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS certificate_files (
+    cert_id      TEXT PRIMARY KEY,
+    output       BLOB NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_certificates_month_grade ON certificates (month, grade, issued_at);
+"""
+
+# Added to `certificates` after the first release; older databases get them on open
+ARCHIVE_COLUMNS = [("dispatch_date", "TEXT"), ("template_hash", "TEXT"), ("output_size", "INTEGER")]
+
+# Search indexes. NOCASE so case-insensitive prefix LIKEs ("123A%") are index range scans.
+INDEXES = """
+CREATE INDEX IF NOT EXISTS idx_certificates_issued ON certificates (issued_at);
+CREATE INDEX IF NOT EXISTS idx_certificates_invoice ON certificates (invoice_no COLLATE NOCASE);
+CREATE INDEX IF NOT EXISTS idx_certificates_heat1 ON certificates (heat1 COLLATE NOCASE);
+CREATE INDEX IF NOT EXISTS idx_certificates_heat2 ON certificates (heat2 COLLATE NOCASE);
+CREATE INDEX IF NOT EXISTS idx_certificates_grade ON certificates (grade COLLATE NOCASE, issued_at);
+"""
+
+SEARCH_FIELDS = "cert_id, issued_at, invoice_no, dispatch_date, grade, heat1, heat2, template_hash, output_size"
+
+
+def _prefix(value: str):
+    """LIKE pattern matching values that start with `value` (its own % and _ taken literally)."""
+    return value.strip().replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_") + "%"
+
+
+class CertificateHistory:
+    """
+    Every issued certificate in a small SQLite database: its payload, the columns the
+    register and searches use (invoice, heats, grade, dispatch date, issue time), the hash
+    of the template it was filled from and the generated file itself, so a reprint is the
+    stored bytes. Re-downloading an edited certificate updates its row and file.
+    Register exports iterate a cursor, so memory stays flat however many certificates a month has.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        self._local = threading.local()
+        with self._connect() as conn:
+            conn.executescript(SCHEMA)
+            existing = {row[1] for row in conn.execute("PRAGMA table_info(certificates)")}
+            for name, kind in ARCHIVE_COLUMNS:
+                if name not in existing:
+                    conn.execute(f"ALTER TABLE certificates ADD COLUMN {name} {kind}")
+            conn.executescript(INDEXES)
+
+    def _connect(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=30)
+            conn.execute("PRAGMA journal_mode=WAL")
+            self._local.conn = conn
+        return conn
+
+    def record(self, cert_id: str, data: dict, issued_at: datetime.datetime = None,
+               output: bytes = None, template_hash: str = None):
+        """Stores (or updates) a certificate's payload and, when given, its generated file."""
+        issued_at = issued_at or datetime.datetime.now()
+        with self._connect() as conn:
+            conn.execute(
+                """
+                INSERT INTO certificates (cert_id, issued_at, month, invoice_no, grade, heat1, heat2, payload,
+                                          dispatch_date, template_hash, output_size)
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+                ON CONFLICT(cert_id) DO UPDATE SET
+                    invoice_no = excluded.invoice_no, grade = excluded.grade,
+                    heat1 = excluded.heat1, heat2 = excluded.heat2, payload = excluded.payload,
+                    dispatch_date = excluded.dispatch_date,
+                    template_hash = COALESCE(excluded.template_hash, template_hash),
+                    output_size = COALESCE(excluded.output_size, output_size)
+                """,
+                (cert_id, issued_at.isoformat(timespec="seconds"), issued_at.strftime("%Y-%m"),
+                 data.get("invoice_no", ""), str(data.get("grade", "")).strip(),
+                 data.get("heat1", ""), data.get("heat2", ""), json.dumps(data),
+                 str(data.get("date", "")), template_hash, len(output) if output is not None else None)
+            )
+            if output is not None:
+                conn.execute("INSERT OR REPLACE INTO certificate_files (cert_id, output) VALUES (?, ?)",
+                             (cert_id, sqlite3.Binary(output)))
+
+    def search(self, invoice: str = None, heat: str = None, grade: str = None,
+               start: str = None, end: str = None, limit: int = 100):
+        """
+        Issued certificates, newest first, matching every given filter: invoice and heat
+        by prefix (either heat column), grade exactly, issue date between start and end
+        (YYYY-MM-DD, inclusive); case-insensitive. Each filter is an index lookup.
+        """
+        clauses, params = [], []
+        if invoice:
+            clauses.append("invoice_no LIKE ? ESCAPE '\\'")
+            params.append(_prefix(invoice))
+        if heat:
+            clauses.append("(heat1 LIKE ? ESCAPE '\\' OR heat2 LIKE ? ESCAPE '\\')")
+            params += [_prefix(heat)] * 2
+        if grade:
+            clauses.append("grade = ? COLLATE NOCASE")
+            params.append(grade.strip())
+        if start:
+            clauses.append("issued_at >= ?")
+            params.append(start)
+        if end:
+            # Up to the end of that day
+            clauses.append("issued_at < ?")
+            params.append((datetime.date.fromisoformat(end) + datetime.timedelta(days=1)).isoformat())
+        where = f"WHERE {' AND '.join(clauses)}" if clauses else ""
+        cur = self._connect().execute(
+            f"SELECT {SEARCH_FIELDS} FROM certificates {where} ORDER BY issued_at DESC LIMIT ?",
+            (*params, limit))
+        names = [d[0] for d in cur.description]
+        return [dict(zip(names, row)) for row in cur]
+
+    def get(self, cert_id: str):
+        """A certificate's search fields plus its payload as `data`, or None if unknown."""
+        cur = self._connect().execute(f"SELECT {SEARCH_FIELDS}, payload FROM certificates WHERE cert_id = ?",
+                                      (cert_id,))
+        row = cur.fetchone()
+        if row is None:
+            return None
+        entry = dict(zip([d[0] for d in cur.description], row))
+        entry["data"] = json.loads(entry.pop("payload"))
+        return entry
+
+    def output(self, cert_id: str):
+        """The generated file as issued, or None (unknown, or recorded before files were archived)."""
+        row = self._connect().execute("SELECT output FROM certificate_files WHERE cert_id = ?",
+                                      (cert_id,)).fetchone()
+        return bytes(row[0]) if row else None
+
+    def register_rows(self, month: str):
+        """
+        Yields (grade, row) for the month's register, ordered by grade then issue time.
+        Each certificate gives one row per heat column (heat 1 and heat 2, blanks skipped).
+        Uses its own connection: a streamed response may resume the generator on another thread.
+        """
+        conn = sqlite3.connect(self.path, timeout=30, check_same_thread=False)
+        try:
+            cur = conn.execute(
+                "SELECT issued_at, grade, payload FROM certificates WHERE month = ? ORDER BY grade, issued_at",
+                (month,))
+            for issued_at, grade, payload in cur:
+                data = json.loads(payload)
+                for heat_key, value_key in (("heat1", "heat1_val"), ("heat2", "heat2_val")):
+                    heat = data.get(heat_key, "")
+                    if not heat:
+                        continue
+                    yield grade, self._register_row(issued_at, grade, heat, value_key, data)
+        finally:
+            conn.close()
+
+    def _register_row(self, issued_at, grade, heat, value_key, data):
+        chemistry = {}
+        for item in data.get("chemistry", []):
+            symbol = element_symbol(item.get("Element", ""))
+            if symbol:
+                chemistry[symbol] = item.get(value_key, "")
+
+        mechanical = {}
+        for item in data.get("mechanical", []):
+            param = str(item.get("Parameter", "")).lower()
+            for name, keyword in MECHANICAL_COLUMNS:
+                if keyword in param and name not in mechanical:
+                    # Mechanical observations are a single column (heat 1)
+                    mechanical[name] = item.get("heat1_val", "")
+
+        row = ([issued_at.replace("T", " "), data.get("invoice_no", ""), data.get("date", ""),
+                data.get("qty", ""), data.get("part_details", ""), grade, heat]
+               + [chemistry.get(ELEMENT_SYMBOLS[name], "") for name in CERT_ELEMENTS]
+               + [mechanical.get(name, "") for name, _ in MECHANICAL_COLUMNS])
+        # Blanks as None: the write-only sheet skips them entirely, csv writes them empty
+        return [v if v != "" else None for v in row]
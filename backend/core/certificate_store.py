@@ -0,0 +1,84 @@
+import time
+import uuid
+import threading
+from collections import OrderedDict
+
+
+class CertificateStore:
+    """
+    Filled certificate workbooks kept between edits, so a change to one field only
+    rewrites the affected cells instead of regenerating from the template.
+
+    Workbooks stay in this process (LRU, `max_items`, `ttl` seconds). With a `shared`
+    SharedCache the payload (settings + data) is persisted too, so another worker can
+    rebuild the workbook once and keep patching from there.
+    """
+
+    def __init__(self, max_items: int = 16, ttl: int = 4 * 3600, shared=None):
+        self.max_items = max_items
+        self.ttl = ttl
+        self.shared = shared
+        self._items = OrderedDict()
+        self._lock = threading.Lock()
+
+    def create(self, wb, layout, settings: dict, data: dict, template_hash: str):
+        cert_id = uuid.uuid4().hex
+        self.put(cert_id, wb, layout, settings, data, template_hash)
+        return cert_id
+
+    def put(self, cert_id: str, wb, layout, settings: dict, data: dict, template_hash: str, created=None):
+        entry = {
+            "wb": wb,
+            "layout": layout,
+            "settings": settings,
+            "data": data,
+            "template_hash": template_hash,
+            "created": created or time.time(),
+        }
+        with self._lock:
+            self._items[cert_id] = entry
+            self._items.move_to_end(cert_id)
+            self._evict()
+        self._persist(cert_id, entry)
+        return entry
+
+    def get(self, cert_id: str):
+        """In-process entry with its workbook, or None (see payload for other workers' certificates)."""
+        with self._lock:
+            self._evict()
+            entry = self._items.get(cert_id)
+            if entry is not None:
+                self._items.move_to_end(cert_id)
+            return entry
+
+    def discard(self, cert_id: str):
+        """Drops the in-process workbook (e.g. after a failed patch); the persisted payload stays."""
+        with self._lock:
+            self._items.pop(cert_id, None)
+
+    def payload(self, cert_id: str):
+        """Settings/data of a certificate created by any worker, or None if unknown or expired."""
+        if self.shared is None:
+            return None
+        payload = self.shared.get(self._key(cert_id))
+        if payload is None or time.time() - payload["created"] > self.ttl:
+            return None
+        return payload
+
+    def _persist(self, cert_id, entry):
+        if self.shared is not None:
+            self.shared.set(self._key(cert_id), {
+                "settings": entry["settings"],
+                "data": entry["data"],
+                "created": entry["created"],
+            })
+
+    def _key(self, cert_id):
+        return f"certificate:{cert_id}"
+
+    def _evict(self):
+        now = time.time()
+        for cid in [c for c, e in self._items.items() if now - e["created"] > self.ttl]:
+            del self._items[cid]
+        while len(self._items) > self.max_items:
+            self._items.popitem(last=False)
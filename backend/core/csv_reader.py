@@ -0,0 +1,99 @@
+import csv
+import codecs
+import re
+import importlib.util
+
+import pandas as pd
+
+from .elements import element_columns
+
+# Bytes of the file read to detect its encoding, delimiter and decimal mark
+SNIFF_BYTES = 64 * 1024
+DELIMITERS = ",;\t|"
+
+_POINT_DECIMAL = re.compile(r"^\s*-?\d+\.\d+\s*$")
+_COMMA_DECIMAL = re.compile(r"^\s*-?\d+,\d+\s*$")
+
+
+def _encoding(prefix: bytes):
+    if prefix.startswith(codecs.BOM_UTF8):
+        return "utf-8-sig"
+    if prefix.startswith((codecs.BOM_UTF16_LE, codecs.BOM_UTF16_BE)):
+        return "utf-16"
+    try:
+        # The prefix may end inside a multi-byte character
+        codecs.getincrementaldecoder("utf-8")().decode(prefix, final=False)
+        return "utf-8"
+    except UnicodeDecodeError:
+        # Spectrometer PCs run Windows with the western code page
+        return "cp1252"
+
+
+def _decode(prefix: bytes, encoding: str):
+    return codecs.getincrementaldecoder(encoding)(errors="replace").decode(prefix, final=False)
+
+
+def sniff_csv(prefix: bytes):
+    """
+    Encoding, delimiter and decimal mark of a CSV export from its first bytes:
+    {"encoding": "utf-8", "sep": ";", "decimal": ","}.
+    """
+    encoding = _encoding(prefix)
+    lines = [line for line in _decode(prefix, encoding).splitlines() if line.strip()]
+    if len(lines) > 1 and len(prefix) >= SNIFF_BYTES:
+        lines = lines[:-1]  # probably cut off
+    sample = "\n".join(lines[:50])
+
+    try:
+        sep = csv.Sniffer().sniff(sample, delimiters=DELIMITERS).delimiter
+    except csv.Error:
+        # Irregular rows: go by the delimiter that splits the header most
+        counts = {d: lines[0].count(d) for d in DELIMITERS} if lines else {}
+        sep = max(counts, key=counts.get) if counts and max(counts.values()) else ","
+
+    decimal = "."
+    if sep != ",":
+        fields = [f for line in lines[1:50] for f in line.split(sep)]
+        if sum(bool(_COMMA_DECIMAL.match(f)) for f in fields) > sum(bool(_POINT_DECIMAL.match(f)) for f in fields):
+            decimal = ","
+    return {"encoding": encoding, "sep": sep, "decimal": decimal}
+
+
+def csv_engine():
+    """pyarrow's multithreaded parser when pyarrow is installed, else pandas' C parser."""
+    return "pyarrow" if importlib.util.find_spec("pyarrow") is not None else "c"
+
+
+def read_spectro_csv(source, engine: str = None):
+    """
+    Reads a CSV spectro export (a path or a seekable binary file object). The format is
+    sniffed from the first SNIFF_BYTES, element columns are declared float64 up front so
+    they are parsed straight to numbers, and the fastest available engine is used.
+    Files whose element columns hold text ("<0.001") are read again without the dtypes.
+    """
+    if hasattr(source, "read"):
+        source.seek(0)
+        prefix = source.read(SNIFF_BYTES)
+    else:
+        with open(source, "rb") as f:
+            prefix = f.read(SNIFF_BYTES)
+    options = sniff_csv(prefix)
+
+    lines = _decode(prefix, options["encoding"]).splitlines()
+    header = next(csv.reader(lines[:1], delimiter=options["sep"]), [])
+    dtypes = {col: "float64" for col in element_columns(header).values()}
+
+    engines = [engine or csv_engine()]
+    if engines[0] != "c":
+        engines.append("c")  # pyarrow rejects some irregular files the C parser reads
+    error = None
+    attempts = [dtypes, None] if dtypes else [None]
+    for name in engines:
+        for dtype in attempts:
+            if hasattr(source, "seek"):
+                source.seek(0)
+            try:
+                return pd.read_csv(source, engine=name, dtype=dtype, **options)
+            except (ValueError, TypeError, pd.errors.ParserError) as e:
+                error = e
+    raise error
@@ -0,0 +1,129 @@
+import numpy as np
+import pandas as pd
+
+# A text column becomes categorical when it repeats enough (distinct values / rows)
+CATEGORY_MAX_RATIO = 0.5
+CATEGORY_MIN_ROWS = 32
+
+# Decimal places tried when checking that float32 reproduces a column exactly
+MAX_DECIMALS = 6
+
+
+def _float32_decimals(narrow: np.ndarray):
+    """Fewest decimals d for which rounding the widened float32 values to d places maps back onto them."""
+    wide = narrow.astype(np.float64)
+    finite = np.isfinite(wide)
+    wide, narrow = wide[finite], narrow[finite]
+    for d in range(MAX_DECIMALS + 1):
+        if np.array_equal(wide.round(d).astype(np.float32), narrow):
+            return d
+    return None
+
+
+def parse_dates(series: pd.Series):
+    """
+    A spectro date column as datetime64 (unparseable values as NaT). ISO text ("2026-01-05",
+    as CSV exports write it) is read year-month-day; anything else day first, as in the plant's
+    Excel exports ("05-01-2026"), each distinct value on its own so mixed separators still parse.
+    """
+    if pd.api.types.is_datetime64_any_dtype(series):
+        return series
+    dates = pd.to_datetime(series, errors="coerce", format="ISO8601")
+    rest = dates.isna() & series.notna()
+    if rest.any():
+        values = series.astype(object)
+        parsed = {v: pd.to_datetime(str(v), errors="coerce", dayfirst=True) for v in values[rest].unique()}
+        dates = pd.to_datetime(dates.astype(object).where(~rest, values.map(parsed)))
+    return dates
+
+
+def widen(series: pd.Series):
+    """
+    float32 columns back as the float64 values they were compacted from (3.49, not
+    3.490000009536743); any other column is returned unchanged.
+    """
+    if series.dtype != np.float32:
+        return series
+    narrow = series.to_numpy()
+    wide = narrow.astype(np.float64)
+    decimals = _float32_decimals(narrow)
+    if decimals is not None:
+        wide = wide.round(decimals)
+    return pd.Series(wide, index=series.index, name=series.name)
+
+
+def widen_frame(df: pd.DataFrame):
+    """Frame with every float32 column widened (no copy when there are none)."""
+    narrow = [col for col, dtype in df.dtypes.items() if dtype == np.float32]
+    if not narrow:
+        return df
+    df = df.copy(deep=False)
+    for col in narrow:
+        df[col] = widen(df[col])
+    return df
+
+
+def _compact_float(series: pd.Series):
+    values = series.to_numpy()
+    narrow = values.astype(np.float32)
+    decimals = _float32_decimals(narrow)
+    if decimals is None:
+        return series
+    finite = np.abs(values[np.isfinite(values)])
+    # Neighbouring d-decimal values must be more than two float32 steps apart, so any
+    # subset of the column (a filter, a day partition) widens back to the same values
+    if finite.size and finite.max() * 2.4e-7 >= 10.0 ** -decimals:
+        return series
+    candidate = pd.Series(narrow, index=series.index, name=series.name)
+    # Lossless only: widening must give back exactly the original values (NaN/inf included)
+    if np.array_equal(widen(candidate).to_numpy(), values, equal_nan=True):
+        return candidate
+    return series
+
+
+def _compact_text(series: pd.Series):
+    # "" placeholders become missing values (the API shows both as blank)
+    series = series.mask(series.eq(""))
+    values = series.dropna()
+    if values.empty:
+        return series
+    kinds = {str} if series.dtype != object else set(map(type, values.tolist()))
+    if kinds == {str}:
+        if len(series) >= CATEGORY_MIN_ROWS and values.nunique() <= CATEGORY_MAX_RATIO * len(series):
+            return series.astype("category")
+        return series.astype("str")
+    if kinds <= {int, np.int64}:
+        return series.astype("Int64")
+    # inf in a text column was always sent as 0, in a float column it would be 0.0
+    if kinds <= {float, np.float64} and np.isfinite(values.to_numpy(dtype=np.float64)).all():
+        return series.astype("float64")
+    return series
+
+
+def compact_frame(df: pd.DataFrame):
+    """
+    Smaller in-memory copy of a parsed spectro frame:
+    - repetitive text (Heat No, Grade, ...) as categoricals,
+    - element percentages as float32 where that reproduces every value exactly,
+    - integers at the smallest width that fits,
+    - "" placeholders as missing values, numeric object columns as float64/Int64.
+    Every value still serializes to the same API output. Returns (frame, report) where
+    report holds the deep memory usage before and after in bytes.
+    """
+    before = int(df.memory_usage(deep=True).sum())
+    columns = {}
+    for i, col in enumerate(df.columns):
+        series = df.iloc[:, i]
+        dtype = series.dtype
+        if dtype == np.float64:
+            series = _compact_float(series)
+        elif pd.api.types.is_integer_dtype(dtype) and not pd.api.types.is_extension_array_dtype(dtype):
+            series = pd.to_numeric(series, downcast="integer")
+        elif dtype == object or pd.api.types.is_string_dtype(dtype):
+            series = _compact_text(series)
+        columns[i] = series
+
+    compact = pd.concat(columns, axis=1)
+    compact.columns = df.columns
+    after = int(compact.memory_usage(deep=True).sum())
+    return compact, {"before_bytes": before, "after_bytes": after}
@@ -0,0 +1,87 @@
+import re
+
+# Certificate element name -> spectro symbol. Several spellings seen in
+# templates and the grade master ("Nickle", "Moly") map to the same symbol.
+ELEMENT_SYMBOLS = {
+    "Carbon": "C",
+    "Silicon": "Si",
+    "Manganese": "Mn",
+    "Phosphorus": "P",
+    "Sulphur": "S",
+    "Copper": "Cu",
+    "Nickel": "Ni",
+    "Nickle": "Ni",
+    "Chromium": "Cr",
+    "Moly": "Mo",
+    "Molybdenum": "Mo",
+    "Magnesium": "Mg",
+    "CE": "CE",
+    "Tin": "Sn",
+}
+
+# Certificate chemistry rows, in template order
+CERT_ELEMENTS = ["Carbon", "Silicon", "Manganese", "Phosphorus", "Sulphur", "Copper",
+                 "Nickel", "Chromium", "Moly", "Magnesium", "CE", "Tin"]
+
+SYMBOLS = ["C", "Si", "Mn", "P", "S", "Cu", "Ni", "Cr", "Mo", "Mg", "CE", "Sn"]
+
+# "C [%]", "C%", "Si %", "Mg", "CE%", "sn" ...
+_COLUMN_RE = re.compile(r"^\s*([A-Za-z]{1,2})\s*(?:\[\s*%\s*\]|%)?\s*$")
+_SYMBOL_LOOKUP = {s.upper(): s for s in SYMBOLS}
+_NAME_LOOKUP = {name.lower(): s for name, s in ELEMENT_SYMBOLS.items()}
+
+
+def column_symbol(column):
+    """Spectro column header -> element symbol ("C [%]" -> "C", "CARBON" -> "C"), or None for non-element columns."""
+    m = _COLUMN_RE.match(str(column))
+    if not m:
+        return _NAME_LOOKUP.get(str(column).strip().lower())
+    return _SYMBOL_LOOKUP.get(m.group(1).upper())
+
+
+def element_symbol(name):
+    """Certificate/grade master element name -> symbol (" Carbon " -> "C", "CE" -> "CE")."""
+    if not name:
+        return None
+    key = str(name).strip().lower()
+    for label, symbol in ELEMENT_SYMBOLS.items():
+        if label.lower() == key:
+            return symbol
+    # Fall back to substring match the way ExcelGenerator maps template rows
+    for label, symbol in sorted(ELEMENT_SYMBOLS.items(), key=lambda kv: -len(kv[0])):
+        if label.lower() in key:
+            return symbol
+    return column_symbol(name)
+
+
+def element_columns(columns):
+    """Maps element symbol -> first matching column in `columns`."""
+    found = {}
+    for col in columns:
+        symbol = column_symbol(col)
+        if symbol and symbol not in found:
+            found[symbol] = col
+    return found
+
+
+_NUM = r"(\d+(?:\.\d+)?)"
+
+
+def parse_spec_limits(spec):
+    """
+    Grade master spec string -> (lower, upper) limits, either may be None.
+    Handles "3.25 - 4.10%", "3.20 ~ 4.10%", "0.050% Max", "Min 12 %" and "-".
+    """
+    if spec is None:
+        return (None, None)
+    text = str(spec).strip().lower()
+    nums = [float(n) for n in re.findall(_NUM, text)]
+    if not nums:
+        return (None, None)
+    if "max" in text:
+        return (None, nums[0])
+    if "min" in text:
+        return (nums[0], None)
+    if len(nums) >= 2:
+        return (min(nums[0], nums[1]), max(nums[0], nums[1]))
+    return (None, None)
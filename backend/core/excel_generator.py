@@ -4,13 +4,22 @@ from openpyxl.drawing.image import Image
 import os
 import io
 
+from .elements import element_symbol, ELEMENT_SYMBOLS
+from .template_layout import get_layout
+from .value_format import ValueFormatter
+
 class ExcelGenerator:
-    def __init__(self, settings):
+    # Header fields written next to their template labels
+    HEADER_FIELDS = ("invoice_no", "qty", "date", "part_details")
+
+    def __init__(self, settings, layout_cache=None):
         self.settings = settings
+        self.layout_cache = layout_cache  # SharedCache for discovered template layouts
         self.b_style = settings.get("border_style", "thin")
         self.font_family = settings.get("font_family", "Calibri")
         self.font_size = settings.get("font_size", 10)
         self.header_color = settings.get("header_fill_color", "#d9e1f2").replace("#", "")
+        self.formatter = ValueFormatter(settings)
         
         # Styles
         self.side_obj = Side(border_style=self.b_style, color="000000") if self.b_style != "none" else Side()
@@ -23,29 +32,29 @@ class ExcelGenerator:
         self.left_align = Alignment(horizontal='left', vertical='center', wrap_text=True)
         self.right_align = Alignment(horizontal='right', vertical='center', wrap_text=True)
 
-        # User Specific Row Mappings (Fixed to match M537 template)
-        self.row_map = {
-            "Carbon": 14,
-            "Silicon": 15,
-            "Manganese": 16,
-            "Phosphorus": 17,
-            "Sulphur": 18,
-            "Copper": 19,
-            "Nickel": 20,
-            "Chromium": 21,
-            "Moly": 22,
-            "Magnesium": 23,
-            "CE": 24,
-            "Tin": 26, # User requested Row 26 for Tin
-        }
+        # Row/cell positions come from the template's labels (see template_layout)
         self.BASE = 2 # Col B (Spec)
 
-    def generate(self, template_path, data):
-        if not os.path.exists(template_path):
-            raise FileNotFoundError(f"Template not found: {template_path}")
+    def generate(self, template, data):
+        """
+        Fills the MTC template with `data`. `template` is a path or the template file's bytes.
+        """
+        wb, _ = self.fill(template, data)
+        return self.serialize(wb)
 
-        wb = load_workbook(template_path)
+    def fill(self, template, data):
+        """Loads the template and writes `data` into it. Returns the workbook and its layout."""
+        if not isinstance(template, (bytes, bytearray)):
+            if not os.path.exists(template):
+                raise FileNotFoundError(f"Template not found: {template}")
+            with open(template, "rb") as f:
+                template = f.read()
+        wb = load_workbook(io.BytesIO(template))
         ws = wb.active
+        layout = get_layout(bytes(template), ws, shared=self.layout_cache)
+        chem_first, chem_last = layout["chem_rows"]
+        chem_range = range(chem_first, chem_last + 1)
+        mech_rows = layout["mechanical_rows"]
         
         # 1. Surgical Sanitization (Only Column E onwards)
         # We NO LONGER unmerge everything. We preserve A-D layout.
@@ -57,107 +66,58 @@ class ExcelGenerator:
             sheet.column_dimensions['D'].width = 24
             
             # Wipe Columns E through Z surgically
-            for r in range(1, 251):
-                # Targeted unmerge ONLY if a merge range touches Column E or beyond
-                for rng in list(sheet.merged_cells.ranges):
-                    if rng.max_col >= 5:
-                        try: sheet.unmerge_cells(str(rng))
-                        except: pass
-                
-                for c in range(5, 51): # E to AZ
-                    cell = sheet.cell(row=r, column=c)
+            # Targeted unmerge ONLY if a merge range touches Column E or beyond
+            for rng in list(sheet.merged_cells.ranges):
+                if rng.max_col >= 5:
+                    try: sheet.unmerge_cells(str(rng))
+                    except: pass
+
+            # Only cells that exist can hold content; creating the empty ones
+            # (250 rows x E..AZ) would just bloat the saved sheet
+            for (r, c), cell in list(sheet._cells.items()):
+                if r <= 250 and 5 <= c <= 50: # E to AZ
                     cell.value = None
                     cell.border = Border() 
                     cell.fill = PatternFill(fill_type=None)
             
-            # Step 1.1: Surgical Unmerge for Data Rows (14-26)
+            # Step 1.1: Surgical Unmerge for the chemistry data rows
             for rng in list(sheet.merged_cells.ranges):
-                if rng.min_row >= 14 and rng.max_row <= 26 and rng.min_col <= 4:
+                if rng.min_row >= chem_first and rng.max_row <= chem_last and rng.min_col <= 4:
                     try: sheet.unmerge_cells(str(rng))
                     except: pass
 
         # 2. Update Header Values (Concatenate labels to preserve template text)
-        invoice_val = data.get("invoice_no", "")
-        qty_val = data.get("qty", "") # Removed replace("no's", "Nos") as user wants 'no's'
-        date_val = data.get("date", "")
-
-        self._safe_write(ws, 4, 3, f"Invoice No : {invoice_val}")
-        self._safe_write(ws, 5, 3, f"Despatch Quantity:  {qty_val}")
-        self._safe_write(ws, 6, 3, f"Dispatch Date : {date_val}")
-        self._safe_write(ws, 8, 2, data.get("part_details", "")) 
-
-        # Clear Dynamic Data Rows COMPLETELY (Rows 14-26 and 28-31, Col 1-4)
-        for row_to_clear in list(range(14, 27)) + list(range(28, 32)):
-            for c_idx in range(1, 5):
-                self._safe_write(ws, row_to_clear, c_idx, None)
+        for field in self.HEADER_FIELDS:
+            self._write_header(ws, layout, field, data)
+
+        # Clear Dynamic Data Rows COMPLETELY (chemistry block and mechanical rows, Col 1-4)
+        for row_to_clear in list(chem_range) + list(mech_rows):
+            self._clear_row(ws, row_to_clear)
         
-        # Heat Nos (Row 13)
-        self._write_styled(ws, 13, self.BASE+1, data.get("heat1", ""), fill=True)
-        self._write_styled(ws, 13, self.BASE+2, data.get("heat2", ""), fill=True)
+        # Heat Nos (row labelled "Element")
+        self._write_heats(ws, layout, data)
 
         # 3. Logo (Insert if missing)
         self._insert_logo(ws)
 
         # 4. Chemistry (Dynamic Write & Row Hiding)
-        chem_data = data.get("chemistry", [])
-        written_rows = set()
-        for item in chem_data:
-            elem_name = item.get("Element", "")
-            target_row = None
-            for key, row_idx in self.row_map.items():
-                if key.lower() in elem_name.lower():
-                    target_row = row_idx
-                    break
-            
-            if target_row:
-                written_rows.add(target_row)
-                # Write Label (Col 1), Spec (Col 2), and Observations (Col 3, 4)
-                # V15: Carbon row (Row 14) should NOT have the heat value fill (force white)
-                if target_row == 14:
-                    self._write_styled(ws, target_row, 1, elem_name, align='left', fill=True)
-                    self._write_styled(ws, target_row, 2, item.get("Spec", ""))
-                    self._write_styled(ws, target_row, 3, self._fmt(item.get('heat1_val', '')), fill=True)
-                    self._write_styled(ws, target_row, 4, self._fmt(item.get('heat2_val', '')), fill=True)
-                else:
-                    self._write_styled(ws, target_row, 1, elem_name, align='left')
-                    self._write_styled(ws, target_row, 2, item.get("Spec", ""))
-                    self._write_styled(ws, target_row, 3, self._fmt(item.get('heat1_val', '')), fill=True)
-                    self._write_styled(ws, target_row, 4, self._fmt(item.get('heat2_val', '')), fill=True)
-
-        # Hide empty rows in chemistry block (14-26) to stop "empty row" issue
-        for r in range(14, 27):
-            if r not in written_rows:
-                ws.row_dimensions[r].hidden = True
-            else:
-                ws.row_dimensions[r].hidden = False
+        chem_by_row = self._chem_rows(layout, data.get("chemistry", []))
+        observed = self._observations(chem_by_row)
+        for target_row, item in chem_by_row.items():
+            self._write_chem_row(ws, layout, target_row, item, observed[target_row])
+
+        # Hide empty rows in chemistry block to stop "empty row" issue
+        for r in chem_range:
+            ws.row_dimensions[r].hidden = r not in chem_by_row
 
         # 5. Mechanical (Dynamic Write - Index Based for Robustness)
         mech_data = data.get("mechanical", [])
-        # Map the first 4 items to rows 28, 29, 30, 31 respectively
-        for i, row in enumerate(mech_data[:4]):
-            target_row = 28 + i
-            param = row.get("Parameter", "")
-            
-            # Write Label (Col 1), Spec (Col 2), and observations (Col 3)
-            self._write_styled(ws, target_row, 1, param, align='left')
-            self._write_styled(ws, target_row, 2, row.get("Spec", ""))
-            
-            # V15: Merge C and D for observations in Rows 28-31
-            try:
-                # Always unmerge first to avoid conflicts if template has partial merges
-                ws.unmerge_cells(start_row=target_row, start_column=3, end_row=target_row, end_column=4)
-            except: pass
-            try:
-                ws.merge_cells(start_row=target_row, start_column=3, end_row=target_row, end_column=4)
-            except: pass
-            
-            self._write_styled(ws, target_row, 3, row.get('heat1_val', ''), fill=True)
+        # Map the items to the template's mechanical rows in order
+        for target_row, row in zip(mech_rows, mech_data):
+            self._write_mech_row(ws, target_row, row)
 
         # --- Footer & Grade ---
-        grade = data.get("grade", "GRADE 4512")
-        conc_text = f"Conclusion: The above material is satisfactory to Ductile iron J434C GRADE {grade}."
-        conc_row = 42 
-        self._write_styled(ws, conc_row, 1, conc_text, align='left')
+        self._write_conclusion(ws, layout, data)
         
         # --- Final Print Configuration ---
         try:
@@ -182,23 +142,7 @@ class ExcelGenerator:
             ws.page_margins.bottom = 0.5
             
             # V15: Apply Thick Outer Border (A1:D50)
-            thick_side = Side(style='thick')
-            # Top
-            for c in range(1, 5):
-                cell = ws.cell(row=1, column=c)
-                cell.border = Border(top=thick_side, left=cell.border.left, right=cell.border.right, bottom=cell.border.bottom)
-            # Bottom
-            for c in range(1, 5):
-                cell = ws.cell(row=50, column=c)
-                cell.border = Border(bottom=thick_side, left=cell.border.left, right=cell.border.right, top=cell.border.top)
-            # Left
-            for r in range(1, 51):
-                cell = ws.cell(row=r, column=1)
-                cell.border = Border(left=thick_side, right=cell.border.right, top=cell.border.top, bottom=cell.border.bottom)
-            # Right
-            for r in range(1, 51):
-                cell = ws.cell(row=r, column=4)
-                cell.border = Border(right=thick_side, left=cell.border.left, top=cell.border.top, bottom=cell.border.bottom)
+            self._apply_outer_border(ws, range(1, 51))
 
         except Exception as e:
             # Fallback for older openpyxl or missing parents
@@ -207,16 +151,168 @@ class ExcelGenerator:
                 ws.print_area = 'A1:D50'
             except: pass
 
+        return wb, layout
+
+    def serialize(self, wb):
         output = io.BytesIO()
         wb.save(output)
         return output.getvalue()
 
-    def _fmt(self, val):
-        if val is None or val == "": return ""
+    def patch(self, wb, layout, old, new):
+        """
+        Applies only the fields that differ between two certificate payloads to an already
+        filled workbook (see fill): changed header cells, heat numbers, chemistry rows,
+        mechanical rows and the conclusion. Returns the names of the changed fields, or
+        None if the change cannot be applied in place (a mechanical row was removed, whose
+        template merge/borders are gone) and the certificate must be filled again.
+        """
+        old_mech = old.get("mechanical", [])
+        new_mech = new.get("mechanical", [])
+        slots = len(layout["mechanical_rows"])
+        if min(len(new_mech), slots) < min(len(old_mech), slots):
+            return None
+
+        ws = wb.active
+        changed = []
+        touched_rows = set()
+
+        for field in self.HEADER_FIELDS:
+            if old.get(field, "") != new.get(field, ""):
+                self._write_header(ws, layout, field, new)
+                changed.append(field)
+
+        if (old.get("heat1", ""), old.get("heat2", "")) != (new.get("heat1", ""), new.get("heat2", "")):
+            self._write_heats(ws, layout, new)
+            touched_rows.add(layout["heat_row"])
+            changed.extend(f for f in ("heat1", "heat2") if old.get(f, "") != new.get(f, ""))
+
+        old_chem = self._chem_rows(layout, old.get("chemistry", []))
+        new_chem = self._chem_rows(layout, new.get("chemistry", []))
+        observed = self._observations(new_chem)
+        for target_row in sorted(set(old_chem) | set(new_chem)):
+            item = new_chem.get(target_row)
+            if old_chem.get(target_row) == item:
+                continue
+            self._clear_row(ws, target_row)
+            if item is not None:
+                self._write_chem_row(ws, layout, target_row, item, observed[target_row])
+            ws.row_dimensions[target_row].hidden = item is None
+            touched_rows.add(target_row)
+        if old.get("chemistry", []) != new.get("chemistry", []):
+            changed.append("chemistry")
+
+        for i, target_row in enumerate(layout["mechanical_rows"]):
+            item = new_mech[i] if i < len(new_mech) else None
+            if (old_mech[i] if i < len(old_mech) else None) == item:
+                continue
+            self._clear_row(ws, target_row)
+            if item is not None:
+                self._write_mech_row(ws, target_row, item)
+            touched_rows.add(target_row)
+        if old_mech != new_mech:
+            changed.append("mechanical")
+
+        if old.get("grade") != new.get("grade"):
+            self._write_conclusion(ws, layout, new)
+            touched_rows.add(layout["conclusion_row"])
+            changed.append("grade")
+
+        # Styled writes replace the thick outer border on columns A and D
+        self._apply_outer_border(ws, sorted(r for r in touched_rows if 1 <= r <= 50))
+        return changed
+
+    def _write_header(self, ws, layout, field, data):
+        value = data.get(field, "")
+        if field == "invoice_no":
+            self._safe_write(ws, *layout["invoice_cell"], f"Invoice No : {value}")
+        elif field == "qty":
+            # Removed replace("no's", "Nos") as user wants 'no's'
+            self._safe_write(ws, *layout["qty_cell"], f"Despatch Quantity:  {value}")
+        elif field == "date":
+            self._safe_write(ws, *layout["date_cell"], f"Dispatch Date : {value}")
+        elif field == "part_details":
+            self._safe_write(ws, *layout["part_cell"], value)
+
+    def _write_heats(self, ws, layout, data):
+        heat_row = layout["heat_row"]
+        self._write_styled(ws, heat_row, self.BASE+1, data.get("heat1", ""), fill=True)
+        self._write_styled(ws, heat_row, self.BASE+2, data.get("heat2", ""), fill=True)
+
+    def _chem_rows(self, layout, chem_data):
+        """Template row -> chemistry item (later items win, as when writing them in order)."""
+        element_rows = {ELEMENT_SYMBOLS[name]: row for name, row in layout["elements"].items()}
+        rows = {}
+        for item in chem_data:
+            target_row = element_rows.get(element_symbol(item.get("Element", "")))
+            if target_row:
+                rows[target_row] = item
+        return rows
+
+    def _observations(self, chem_by_row):
+        """Template row -> (heat 1, heat 2) observed values, all formatted in one ValueFormatter call."""
+        items = list(chem_by_row.values())
+        values = [item.get(key, '') for item in items for key in ('heat1_val', 'heat2_val')]
+        elements = [item.get("Element", "") for item in items for _ in range(2)]
+        cells = self.formatter.format_cells(values, elements) if items else []
+        return {row: (cells[2 * i], cells[2 * i + 1]) for i, row in enumerate(chem_by_row)}
+
+    def _write_chem_row(self, ws, layout, target_row, item, observed=None):
+        # Write Label (Col 1), Spec (Col 2), and Observations (Col 3, 4)
+        # V15: Carbon row should NOT have the heat value fill (force white)
+        elem_name = item.get("Element", "")
+        is_carbon = target_row == layout["elements"].get("Carbon")
+        self._write_styled(ws, target_row, 1, elem_name, align='left', fill=is_carbon)
+        self._write_styled(ws, target_row, 2, item.get("Spec", ""))
+        if observed is None:
+            observed = (self._fmt(item.get('heat1_val', ''), elem_name), self._fmt(item.get('heat2_val', ''), elem_name))
+        self._write_styled(ws, target_row, 3, observed[0], fill=True)
+        self._write_styled(ws, target_row, 4, observed[1], fill=True)
+
+    def _write_mech_row(self, ws, target_row, row):
+        # Write Label (Col 1), Spec (Col 2), and observations (Col 3)
+        self._write_styled(ws, target_row, 1, row.get("Parameter", ""), align='left')
+        self._write_styled(ws, target_row, 2, row.get("Spec", ""))
+
+        # V15: Merge C and D for observations in the mechanical rows
+        try:
+            # Always unmerge first to avoid conflicts if template has partial merges
+            ws.unmerge_cells(start_row=target_row, start_column=3, end_row=target_row, end_column=4)
+        except: pass
         try:
-            return f"{float(val):.2f}%"
-        except:
-            return str(val)
+            ws.merge_cells(start_row=target_row, start_column=3, end_row=target_row, end_column=4)
+        except: pass
+
+        self._write_styled(ws, target_row, 3, row.get('heat1_val', ''), fill=True)
+
+    def _write_conclusion(self, ws, layout, data):
+        grade = data.get("grade", "GRADE 4512")
+        conc_text = f"Conclusion: The above material is satisfactory to Ductile iron J434C GRADE {grade}."
+        self._write_styled(ws, layout["conclusion_row"], 1, conc_text, align='left')
+
+    def _clear_row(self, ws, row):
+        for c_idx in range(1, 5):
+            self._safe_write(ws, row, c_idx, None)
+
+    def _apply_outer_border(self, ws, rows):
+        thick_side = Side(style='thick')
+        for r in rows:
+            # Top / Bottom
+            if r in (1, 50):
+                for c in range(1, 5):
+                    cell = ws.cell(row=r, column=c)
+                    if r == 1:
+                        cell.border = Border(top=thick_side, left=cell.border.left, right=cell.border.right, bottom=cell.border.bottom)
+                    else:
+                        cell.border = Border(bottom=thick_side, left=cell.border.left, right=cell.border.right, top=cell.border.top)
+            # Left
+            cell = ws.cell(row=r, column=1)
+            cell.border = Border(left=thick_side, right=cell.border.right, top=cell.border.top, bottom=cell.border.bottom)
+            # Right
+            cell = ws.cell(row=r, column=4)
+            cell.border = Border(right=thick_side, left=cell.border.left, top=cell.border.top, bottom=cell.border.bottom)
+
+    def _fmt(self, val, element=None):
+        return self.formatter.format_value(val, element)
 
     def _get_target_cell(self, ws, row, col):
         """Helper to find the top-left cell of a merge range."""
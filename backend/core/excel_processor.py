@@ -1,57 +1,96 @@
 import pandas as pd
+import numpy as np
 import os
+import math
 import io
 import re
 import json
+import zipfile
+from decimal import Decimal
+
+from .elements import CERT_ELEMENTS, ELEMENT_SYMBOLS, element_columns
+from .dtypes import widen, widen_frame
+from .schema import align_columns
+from .csv_reader import read_spectro_csv
+from .template_layout import get_layout
+from .value_format import ValueFormatter
+
+def js_number(value: float):
+    """
+    A finite float as JavaScript's Number.prototype.toString writes it: the same shortest
+    round-trip digits as Python's repr, but positional from 1e-7 up to 1e21 ("0.00005",
+    "4", "1e+21", "1e-7").
+    """
+    if value == 0:
+        return "0"
+    text = repr(float(value))
+    if "e" not in text:
+        # Python is positional here too (1e-4 <= |value| < 1e16); only "4.0" differs
+        return text[:-2] if text.endswith(".0") else text
+    sign = "-" if value < 0 else ""
+    _, digits, exponent = Decimal(text.lstrip("-")).normalize().as_tuple()
+    digits = "".join(map(str, digits))
+    k, n = len(digits), exponent + len(digits)  # value = 0.<digits> * 10**n
+    if k <= n <= 21:
+        text = digits + "0" * (n - k)
+    elif 0 < n <= 21:
+        text = digits[:n] + "." + digits[n:]
+    elif -6 < n <= 0:
+        text = "0." + "0" * -n + digits
+    else:
+        mantissa = digits[0] + ("." + digits[1:] if k > 1 else "")
+        text = f"{mantissa}e{'+' if n > 0 else '-'}{abs(n - 1)}"
+    return sign + text
 
 class ExcelProcessor:
     def __init__(self):
         pass
 
-    def parse_spectro_report(self, file_content: bytes):
+    # Column names the Dashboard treats as the grade of a row (see gradesInRange)
+    GRADE_ALIASES = [
+        "Grade", "GRADE", "Grade No", "Cast Grade", "Grade / Spec",
+        "Reference", "Ref / Grade", "Material Grade", "Spec / Grade", "MATERIAL", "SPEC", "Standard"
+    ]
+
+    # Engines in the order they are tried when the file signature is inconclusive
+    ENGINE_ORDER = ["openpyxl", "xlrd", "pyxlsb", "csv"]
+
+    def parse_spectro_report(self, source, with_facets: bool = False, with_drafts: bool = False):
         """
         Parses the uploaded Spectro Report (xlsx) and returns structured data.
+        `source` may be raw bytes, a path on disk or a seekable binary file object
+        (e.g. the spooled file behind an UploadFile) - file objects and paths are
+        read in place, never copied into another buffer.
+        """
+        df = self.load_spectro_frame(source)
+        return self.build_report(df, with_facets=with_facets, with_drafts=with_drafts)
+
+    def load_spectro_frame(self, source):
+        """
+        Reads a Spectro Report into a cleaned DataFrame (S.No renumbered, CE% added).
         """
         try:
-            file_obj = io.BytesIO(file_content)
+            file_obj = io.BytesIO(source) if isinstance(source, (bytes, bytearray)) else source
             df = None
             errors = []
 
-            # 1. Try modern XLSX (openpyxl)
-            try:
-                file_obj.seek(0)
-                df = pd.read_excel(file_obj, engine='openpyxl')
-            except Exception as e: errors.append(f"openpyxl: {e}")
-
-            # 2. Try old XLS (xlrd)
-            if df is None or df.empty:
-                try:
+            def rewind():
+                # Paths are reopened by each engine; file objects must be rewound
+                if hasattr(file_obj, "seek"):
                     file_obj.seek(0)
-                    df = pd.read_excel(file_obj, engine='xlrd')
-                except Exception as e: errors.append(f"xlrd: {e}")
+                return file_obj
 
-            # 3. Try Binary XLSB (pyxlsb)
-            if df is None or df.empty:
-                try:
-                    file_obj.seek(0)
-                    df = pd.read_excel(file_obj, engine='pyxlsb')
-                except Exception as e: errors.append(f"pyxlsb: {e}")
+            # Sniff the container first so rare engines (xlrd, pyxlsb) are only
+            # imported for files that actually need them
+            preferred = self._sniff_engines(rewind())
+            fallback = [name for name in self.ENGINE_ORDER if name not in preferred]
 
-            # 4. Try CSV (sometimes machine exports rename .csv to .xlsx)
-            if df is None or df.empty:
-                try:
-                    file_obj.seek(0)
-                    # Try comma first
-                    df = pd.read_csv(file_obj)
-                except Exception as e:
-                    try:
-                        file_obj.seek(0)
-                        # Try semicolon (common in Europe/machines)
-                        df = pd.read_csv(file_obj, sep=';')
-                    except Exception as e2:
-                        errors.append(f"csv: {e2}")
-
-            if df is None or df.empty:
+            df = self._try_engines(preferred, rewind, errors)
+            if (df is None or df.empty) and errors:
+                # Misleading signature (renamed or odd exports): try the remaining engines
+                df = self._try_engines(fallback, rewind, errors)
+
+            if df is None:
                 raise Exception(f"Failed to parse file with any engine. Engines tried: {', '.join(errors)}")
 
             if df.empty:
@@ -63,28 +102,261 @@ class ExcelProcessor:
             
             # 2. CE% Calculation
             df = self.calculate_ce(df)
-            
-            # 3. Extract Heats Safely
-            heat_col = next((c for c in df.columns if 'HEAT' in c.upper()), df.columns[1] if len(df.columns) > 1 else None)
-            heats = []
-            if heat_col:
-                heats = df[heat_col].dropna().astype(str).unique().tolist()
-
-            # 4. JSON Sanitization (replace NaN/inf with "")
-            df_plain = df.copy()
-            df_plain = df_plain.replace([float('inf'), float('-inf')], 0)
-            df_plain = df_plain.fillna("")
-
-            return {
-                "data": df_plain.to_dict(orient="records"),
-                "columns": df_plain.columns.tolist(),
-                "heats": heats
-            }
+            return df
         except Exception as e:
             import traceback
             print(f"ERROR: Spectro Analysis Failed: {traceback.format_exc()}")
             raise Exception(f"Excel parsing error: {str(e)}")
 
+    def _sniff_engines(self, file_obj):
+        """
+        Picks the engine(s) to try from the file signature: zip -> xlsx/xlsb, OLE2 -> xls, otherwise CSV.
+        """
+        if hasattr(file_obj, "read"):
+            head = file_obj.read(8)
+        else:
+            with open(file_obj, "rb") as f:
+                head = f.read(8)
+
+        if head.startswith(b"PK\x03\x04"):
+            try:
+                if hasattr(file_obj, "seek"):
+                    file_obj.seek(0)
+                with zipfile.ZipFile(file_obj) as zf:
+                    if "xl/workbook.bin" in zf.namelist():
+                        return ["pyxlsb"]
+            except zipfile.BadZipFile:
+                pass
+            return ["openpyxl"]
+        if head.startswith(b"\xd0\xcf\x11\xe0"):
+            return ["xlrd"]
+        return ["csv"]
+
+    def _try_engines(self, names, rewind, errors):
+        df = None
+        for name in names:
+            try:
+                df = self._read_with_engine(name, rewind)
+            except Exception as e:
+                errors.append(f"{name}: {e}")
+                continue
+            if not df.empty:
+                break
+        return df
+
+    def _read_with_engine(self, name, rewind):
+        if name == "csv":
+            # Sometimes machine exports rename .csv to .xlsx; the delimiter, decimal mark
+            # and encoding are sniffed (see csv_reader)
+            return read_spectro_csv(rewind())
+        return pd.read_excel(rewind(), engine=name)
+
+    def merge_frames(self, named_frames):
+        """
+        One frame from several parsed spectro files ([(file name, frame)...]): columns are
+        aligned by meaning (see schema.align_columns), rows get a `source_file` column, and
+        samples repeated across overlapping exports (same values in every shared column)
+        are kept once. S.No is renumbered.
+        Returns (frame, number of duplicate rows dropped).
+        """
+        names = [name for name, _ in named_frames]
+        # float32 columns widened first, so files compacted differently concatenate exactly
+        frames = [widen_frame(df) for _, df in named_frames]
+        strict_heat = lambda columns: next((c for c in columns if 'HEAT' in str(c).upper()), None)
+        frames = align_columns(frames, (strict_heat, self.find_grade_column, self.find_date_column))
+        # Files whose element columns only got their C%/Si%/P% names here get CE% now
+        frames = [df if "CE%" in df.columns else self.calculate_ce(df) for df in frames]
+
+        merged = pd.concat(frames, ignore_index=True, sort=False)
+        columns = [c for c in merged.columns if c != "source_file"]
+        merged = merged[columns]
+        merged["source_file"] = np.repeat(names, [len(df) for df in frames])
+        before = len(merged)
+        # A repeated sample is one whose values agree in every column all the files share
+        shared = [c for c in columns if c != 'S.No' and all(c in df.columns for df in frames)]
+        merged = merged.drop_duplicates(subset=shared or None).reset_index(drop=True)
+        if 'S.No' in merged.columns:
+            merged['S.No'] = range(1, 1 + len(merged))
+        return merged, before - len(merged)
+
+    def build_report(self, df: pd.DataFrame, with_facets: bool = False, with_drafts: bool = False,
+                     with_data: bool = True, formatter: ValueFormatter = None):
+        """
+        Builds the /api/analyze payload (rows, columns, heats and optional facets/drafts) from a parsed frame.
+        With `with_data=False` the rows are left out, for callers that encode them from the frame
+        themselves (see frame_json.report_body). Drafts are formatted with `formatter`
+        (the default ValueFormatter when None).
+        """
+        # 3. Extract Heats Safely
+        heat_col = self.find_heat_column(df.columns)
+        heats = []
+        if heat_col:
+            heats = df[heat_col].dropna().astype(str).unique().tolist()
+
+        result = {
+            "columns": df.columns.tolist(),
+            "heats": heats
+        }
+        if with_data:
+            # 4. JSON Sanitization (NaN -> "", inf -> 0) while building the records
+            result = {"data": self.json_records(df), **result}
+        if with_facets:
+            result["facets"] = self.build_facets(df)
+        if with_drafts:
+            result["drafts"] = self.build_heat_drafts(df, formatter)
+        return result
+
+    def json_records(self, df: pd.DataFrame):
+        """
+        Rows as JSON-safe dicts (NaN/NaT -> "", inf -> 0). Built column by column from the
+        frame itself, so at most one column is converted at a time instead of copying the
+        whole frame for each sanitizing step; the dicts share the converted values.
+        """
+        columns = df.columns.tolist()
+        values = [self._json_values(df.iloc[:, i]) for i in range(len(columns))]
+        return [dict(zip(columns, row)) for row in zip(*values)]
+
+    def _json_values(self, series: pd.Series):
+        series = widen(series)
+        if pd.api.types.is_float_dtype(series.dtype):
+            arr = series.to_numpy(dtype="float64", na_value=np.nan)
+            out = arr.tolist()
+            for i in np.flatnonzero(~np.isfinite(arr)):
+                out[i] = "" if math.isnan(out[i]) else 0.0
+            return out
+        out = series.tolist()
+        if (pd.api.types.is_bool_dtype(series.dtype) or pd.api.types.is_integer_dtype(series.dtype)) and not series.hasnans:
+            return out
+        for i in np.flatnonzero(series.isna().to_numpy()):
+            out[i] = ""
+        if series.dtype == object:
+            for i, v in enumerate(out):
+                if isinstance(v, float) and math.isinf(v):
+                    out[i] = 0
+        return out
+
+    def find_heat_column(self, columns):
+        columns = list(columns)
+        return next((c for c in columns if 'HEAT' in str(c).upper()), columns[1] if len(columns) > 1 else None)
+
+    def find_grade_column(self, columns):
+        """First column whose name is one of GRADE_ALIASES (exact, then case-insensitive)."""
+        for alias in self.GRADE_ALIASES:
+            if alias in columns:
+                return alias
+        upper = {str(c).strip().upper(): c for c in columns}
+        for alias in self.GRADE_ALIASES:
+            if alias.upper() in upper:
+                return upper[alias.upper()]
+        return None
+
+    def find_date_column(self, columns):
+        return next((c for c in columns if 'DATE' in str(c).upper()), None)
+
+    def build_heat_drafts(self, df: pd.DataFrame, formatter: ValueFormatter = None):
+        """
+        Certificate chemistry per heat, formatted the way ExcelGenerator writes it ("3.49%").
+        Each heat keeps its first two samples (the Dashboard fills column 2 from the second
+        when both certificate columns show the same heat) and the grade of its first graded sample:
+            {"123A26": {"grade": "SG 500/7", "samples": [{"Carbon": "3.49%", ...}, {...}]}}
+        """
+        heat_col = self.find_heat_column(df.columns)
+        if heat_col is None or df.empty:
+            return {}
+
+        heads = df[df[heat_col].notna()].groupby(df[heat_col].astype(str), sort=False).head(2)
+        symbols = element_columns(df.columns)
+        formatter = formatter or ValueFormatter()
+        formatted = {}
+        for name in CERT_ELEMENTS:
+            col = symbols.get(ELEMENT_SYMBOLS[name])
+            if col is not None:
+                formatted[name] = self.format_chemistry(heads[col], formatter, name).tolist()
+
+        grade_col = self.find_grade_column(df.columns)
+        grades = heads[grade_col].astype(object).fillna("").astype(str).str.strip().tolist() if grade_col else [""] * len(heads)
+
+        drafts = {}
+        for i, heat in enumerate(heads[heat_col].astype(str).tolist()):
+            draft = drafts.setdefault(heat, {"grade": "", "samples": []})
+            draft["samples"].append({name: values[i] for name, values in formatted.items()})
+            if not draft["grade"]:
+                draft["grade"] = grades[i]
+        return drafts
+
+    def format_chemistry(self, series: pd.Series, formatter: ValueFormatter = None, element: str = None):
+        """Numeric values with the element's decimals and unit (like ExcelGenerator._fmt); text is kept, blanks stay blank."""
+        return (formatter or ValueFormatter()).format_series(series, element)
+
+    def build_facets(self, df: pd.DataFrame):
+        """
+        Per-column distinct values and counts (plus min/max for numeric columns), computed
+        with value_counts so the client never has to scan the rows for its filter dropdowns.
+        Values are stringified the way the Dashboard renders them, and blanks are left out.
+        """
+        columns = {}
+        for col in df.columns:
+            series = widen(df[col])
+            counts = {}
+            for value, count in series.value_counts(dropna=True).items():
+                key = self._facet_key(value)
+                # Categoricals list every category, including ones with no rows left in a subset
+                if key == "" or count == 0:
+                    continue
+                counts[key] = counts.get(key, 0) + int(count)
+
+            values = sorted(counts)
+            facet = {
+                "values": values,
+                "counts": [counts[v] for v in values],
+                "distinct": len(values)
+            }
+            if pd.api.types.is_numeric_dtype(series) and not pd.api.types.is_bool_dtype(series):
+                finite = series.replace([float('inf'), float('-inf')], float('nan'))
+                if finite.notna().any():
+                    facet["min"] = float(finite.min())
+                    facet["max"] = float(finite.max())
+            columns[str(col)] = facet
+
+        # Distinct grades across all grade-like columns (Dashboard's gradesInRange)
+        grades = set()
+        for alias in self.GRADE_ALIASES:
+            for col in (alias, alias.upper()):
+                if col in df.columns:
+                    grades.update(k.strip() for k in columns[col]["values"] if k.strip())
+
+        return {"columns": columns, "grades": sorted(grades)}
+
+    def filter_mask(self, df: pd.DataFrame, filters: dict):
+        """
+        Boolean mask for the Dashboard's column filters ({column: [selected values]}), where a
+        row matches when its value, stringified like the grid shows it, is selected in every
+        filtered column. Each column's distinct values are keyed once and matched with isin.
+        """
+        mask = pd.Series(True, index=df.index)
+        for col, selected in (filters or {}).items():
+            if selected is None or col not in df.columns:
+                continue
+            selected = {str(v) for v in selected}
+            series = widen(df[col])
+            uniques = series.dropna().unique()
+            matching = [u for u in uniques if self._facet_key(u) in selected]
+            col_mask = series.isin(matching)
+            if "" in selected:
+                col_mask |= series.isna()
+            mask &= col_mask
+        return mask
+
+    def _facet_key(self, value):
+        # Mirror JSON -> JS toString(): 4.0 -> "4", 5e-05 -> "0.00005", timestamps as ISO strings
+        if isinstance(value, pd.Timestamp):
+            return value.isoformat()
+        if isinstance(value, float):
+            if value in (float('inf'), float('-inf')):
+                return "0"
+            return js_number(value)
+        return str(value)
+
     def calculate_ce(self, df: pd.DataFrame):
         """
         Calculates Carbon Equivalent (CE%) = C + (Si/3) + P
@@ -133,21 +405,20 @@ class ExcelProcessor:
     def parse_mtc_template(self, template_path: str):
         """
         Analyses the MTC template (Final correct.xlsx) to extract default labels and structure.
+        The layout is discovered once per template content (see template_layout).
         """
         if not os.path.exists(template_path):
              return None
              
         try:
-            df = pd.read_excel(template_path, header=None)
-            
-            # Extract defaults (logic mirror from app.py)
-            raw_part_line = str(df.iloc[7, 1]) if len(df) > 7 else ""
-            
-            return {
-                "part_details": raw_part_line,
-                "customer": "SUNDRAM FASTENERS LTD",
-                "reference": "REFERENCE - Ductile iron J434C GRADE 4512"
-            }
+            with open(template_path, "rb") as f:
+                layout = get_layout(f.read())
+            return {**layout["defaults"], "layout": layout}
         except Exception as e:
             print(f"Error parsing MTC template: {e}")
             return None
+
+
+def load_frame(content: bytes):
+    """Process-pool entry point: parses one spectro file's bytes (see ExcelProcessor.load_spectro_frame)."""
+    return ExcelProcessor().load_spectro_frame(content)
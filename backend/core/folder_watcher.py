@@ -0,0 +1,127 @@
+import os
+import time
+import threading
+
+from .utils import hash_file
+
+SPECTRO_EXTENSIONS = (".xlsx", ".xlsm", ".xls", ".csv")
+
+
+class FolderWatcher:
+    """
+    Polls a folder the spectrometer PC exports into and hands every new or changed
+    spreadsheet to `ingest(path, name, file_hash)`, which returns the number of rows
+    ingested (None when the content was already known).
+
+    A file is only read once its size and modification time have stayed the same for
+    `settle_seconds` and it can be opened, so exports still being written (or held open
+    by Excel) are picked up on a later scan. Content is identified by SHA-256: a file
+    touched or copied without changes is not ingested again.
+    """
+
+    def __init__(self, directory: str, ingest, interval: float = 5.0, settle_seconds: float = 10.0):
+        self.directory = directory
+        self.ingest = ingest
+        self.interval = interval
+        self.settle_seconds = settle_seconds
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = None
+        # name -> {"stamp": (size, mtime_ns), "since": first seen with that stamp, "hash", "status", ...}
+        self._files = {}
+        self._last_scan = None
+        self._last_error = None
+
+    def start(self):
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, name="folder-watcher", daemon=True)
+            self._thread.start()
+
+    def stop(self, timeout: float = 5.0):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+            self._thread = None
+
+    def _run(self):
+        while not self._stop.is_set():
+            self.scan()
+            self._stop.wait(self.interval)
+
+    def scan(self, now: float = None):
+        """One pass over the folder; returns the names ingested in it."""
+        now = time.time() if now is None else now
+        try:
+            entries = []
+            for e in os.scandir(self.directory):
+                # "~$..." are Excel's lock files next to an open workbook
+                if e.name.lower().endswith(SPECTRO_EXTENSIONS) and not e.name.startswith("~$") and e.is_file():
+                    st = e.stat()
+                    entries.append((st.st_mtime_ns, e, (st.st_size, st.st_mtime_ns)))
+            self._last_error = None
+        except OSError as e:
+            # Shared drive offline (or a file vanished mid-scan): retry on the next scan
+            self._last_error = str(e)
+            self._last_scan = now
+            return []
+
+        ingested = []
+        for _, entry, stamp in sorted(entries, key=lambda item: item[0]):
+            with self._lock:
+                state = self._files.get(entry.name)
+                if state is None or state["stamp"] != stamp:
+                    state = {"stamp": stamp, "since": now, "hash": None, "status": "pending",
+                             "rows": None, "error": None, "ingested_at": None}
+                    self._files[entry.name] = state
+                if state["status"] != "pending" or now - state["since"] < self.settle_seconds:
+                    continue
+            if self._process(entry, state, now):
+                ingested.append(entry.name)
+        with self._lock:
+            present = {entry.name for _, entry, _ in entries}
+            for name in [n for n in self._files if n not in present]:
+                del self._files[name]
+            self._last_scan = now
+        return ingested
+
+    def _process(self, entry, state, now):
+        try:
+            file_hash = hash_file(entry.path)
+        except OSError:
+            # Still locked by the writer; the stamp is unchanged, so retry next scan
+            return False
+        try:
+            rows = self.ingest(entry.path, entry.name, file_hash)
+        except Exception as e:
+            with self._lock:
+                state.update(hash=file_hash, status="error", error=str(e))
+            print(f"WARNING: Watched file {entry.name} could not be ingested: {e}")
+            return False
+        with self._lock:
+            state.update(hash=file_hash, status="known" if rows is None else "ingested", rows=rows,
+                         ingested_at=now)
+        return rows is not None
+
+    def latest(self):
+        """Path of the most recently modified file that was ingested (or already known), or None."""
+        with self._lock:
+            done = [(s["stamp"][1], name) for name, s in self._files.items() if s["status"] in ("ingested", "known")]
+        return os.path.join(self.directory, max(done)[1]) if done else None
+
+    def status(self):
+        with self._lock:
+            files = [
+                {"name": name, "size": s["stamp"][0], "modified": s["stamp"][1] / 1e9, "status": s["status"],
+                 "hash": s["hash"], "rows": s["rows"], "error": s["error"], "ingested_at": s["ingested_at"]}
+                for name, s in sorted(self._files.items(), key=lambda item: item[1]["stamp"][1], reverse=True)
+            ]
+            return {
+                "directory": self.directory,
+                "running": self._thread is not None and self._thread.is_alive(),
+                "interval": self.interval,
+                "settle_seconds": self.settle_seconds,
+                "last_scan": self._last_scan,
+                "error": self._last_error,
+                "latest": next((f["name"] for f in files if f["status"] in ("ingested", "known")), None),
+                "files": files,
+            }
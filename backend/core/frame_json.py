@@ -0,0 +1,108 @@
+import json
+import math
+import datetime
+from json.encoder import encode_basestring
+
+import numpy as np
+import pandas as pd
+
+from .dtypes import widen
+
+# Rows encoded per step by encode_records
+CHUNK_ROWS = 10000
+
+# Same output as FastAPI's JSONResponse (compact separators, UTF-8, no NaN literals)
+_dumps = json.JSONEncoder(ensure_ascii=False, allow_nan=False, separators=(",", ":")).encode
+
+
+def _default(value):
+    # What jsonable_encoder produced for the values a spectro frame can hold
+    if isinstance(value, (datetime.datetime, datetime.date, datetime.time)):
+        return value.isoformat()
+    if isinstance(value, np.generic):
+        return value.item()
+    return str(value)
+
+
+_dumps_any = json.JSONEncoder(ensure_ascii=False, allow_nan=False, separators=(",", ":"), default=_default).encode
+
+
+def _encode_value(value):
+    if value is None or value is pd.NaT or value is pd.NA:
+        return '""'
+    if isinstance(value, float):
+        if math.isnan(value):
+            return '""'
+        if math.isinf(value):
+            return "0"
+    return _dumps_any(value)
+
+
+def encode_column(series: pd.Series):
+    """
+    JSON text of every value of a column, read straight from its array: NaN/NaT/NA -> "",
+    inf -> 0 (as the Dashboard always received them). The column itself is not modified.
+    """
+    series = widen(series)
+    dtype = series.dtype
+    if isinstance(dtype, pd.CategoricalDtype):
+        # Each category is encoded once; rows pick theirs by code (-1, missing, picks the blank)
+        encoded = encode_column(pd.Series(dtype.categories)) + ['""']
+        return np.array(encoded, dtype=object)[series.cat.codes.to_numpy()].tolist()
+
+    if (pd.api.types.is_bool_dtype(dtype) or pd.api.types.is_integer_dtype(dtype)) and not series.hasnans:
+        if pd.api.types.is_bool_dtype(dtype):
+            return np.where(series.to_numpy(dtype=bool), "true", "false").tolist()
+        return list(map(str, series.tolist()))
+
+    if pd.api.types.is_float_dtype(dtype):
+        arr = series.to_numpy(dtype="float64", na_value=np.nan)
+        out = list(map(float.__repr__, arr.tolist()))
+        for i in np.flatnonzero(~np.isfinite(arr)):
+            out[i] = '""' if np.isnan(arr[i]) else "0.0"
+        return out
+
+    if pd.api.types.is_datetime64_dtype(dtype):
+        arr = series.to_numpy()
+        missing = np.isnat(arr)
+        # isoformat() only shows microseconds when a value has them
+        whole_seconds = (arr[~missing].astype("datetime64[us]").view("int64") % 1_000_000 == 0).all()
+        text = np.datetime_as_string(arr, unit="s" if whole_seconds else "us")
+        out = ['"' + t + '"' for t in text.tolist()]
+        for i in np.flatnonzero(missing):
+            out[i] = '""'
+        return out
+
+    values = series.tolist()
+    if pd.api.types.is_string_dtype(dtype) and all(type(v) is str for v in values):
+        return list(map(encode_basestring, values))
+    return list(map(_encode_value, values))
+
+
+def encode_records(df: pd.DataFrame, chunk_rows: int = CHUNK_ROWS):
+    """
+    The frame as a JSON array of row objects, encoded column by column without an
+    intermediate list of dicts. Rows are encoded `chunk_rows` at a time, so only one
+    chunk's per-value strings exist next to the output.
+    """
+    if df.empty:
+        return "[]"
+    # Keys are fixed per frame, so each row is one %-format of pre-encoded values
+    row_format = "{" + ",".join(_dumps(str(col)).replace("%", "%%") + ":%s" for col in df.columns) + "}"
+    parts = []
+    for start in range(0, len(df), chunk_rows):
+        chunk = df.iloc[start:start + chunk_rows]
+        columns = [encode_column(chunk.iloc[:, i]) for i in range(chunk.shape[1])]
+        parts.append(",".join([row_format % row for row in zip(*columns)]))
+    return "[" + ",".join(parts) + "]"
+
+
+def report_body(result: dict, df: pd.DataFrame):
+    """
+    UTF-8 JSON body for an /api/analyze style payload: "data" is encoded from `df`
+    directly, the remaining (small) keys with the standard encoder.
+    """
+    rest = _dumps({k: v for k, v in result.items() if k != "data"})
+    data = encode_records(df)
+    body = '{"data":' + data + ("," + rest[1:] if rest != "{}" else "}")
+    return body.encode("utf-8")
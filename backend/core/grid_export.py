@@ -0,0 +1,57 @@
+import numpy as np
+import pandas as pd
+
+from .dtypes import widen_frame
+
+# Rows materialised per step; only this slice of the projected columns is ever copied
+CHUNK_ROWS = 5000
+
+
+def project_columns(df: pd.DataFrame, columns):
+    """Requested columns that exist in `df`, in the requested order (all columns if none given)."""
+    if not columns:
+        return list(df.columns)
+    present = set(df.columns)
+    return [c for c in dict.fromkeys(columns) if c in present]
+
+
+def iter_chunks(df: pd.DataFrame, mask, columns, chunk_rows: int = CHUNK_ROWS):
+    """Yields the selected rows of the projected columns, chunk_rows at a time."""
+    positions = np.flatnonzero(np.asarray(mask)) if mask is not None else np.arange(len(df))
+    col_idx = [df.columns.get_loc(c) for c in columns]
+    for start in range(0, len(positions), chunk_rows):
+        # float32 columns (see dtypes.compact_frame) go out as their original values
+        yield widen_frame(df.iloc[positions[start:start + chunk_rows], col_idx])
+
+
+def iter_csv(df: pd.DataFrame, mask, columns, chunk_rows: int = CHUNK_ROWS):
+    """CSV bytes for the filtered, projected view, one encoded chunk at a time."""
+    yield "\ufeff".encode("utf-8")  # BOM so Excel opens the UTF-8 file correctly
+    header = True
+    for chunk in iter_chunks(df, mask, columns, chunk_rows):
+        chunk = chunk.replace([np.inf, -np.inf], 0)
+        yield chunk.to_csv(index=False, header=header).encode("utf-8")
+        header = False
+    if header:
+        yield pd.DataFrame(columns=columns).to_csv(index=False).encode("utf-8")
+
+
+def write_xlsx(df: pd.DataFrame, mask, columns, fileobj, sheet_title: str = "Report", chunk_rows: int = CHUNK_ROWS):
+    """
+    Writes the filtered, projected view into a write-only workbook (rows are streamed
+    to disk as they are appended). Returns the number of data rows written.
+    """
+    from openpyxl import Workbook
+
+    wb = Workbook(write_only=True)
+    ws = wb.create_sheet(sheet_title[:31] or "Report")
+    ws.append([str(c) for c in columns])
+    total = 0
+    for chunk in iter_chunks(df, mask, columns, chunk_rows):
+        chunk = chunk.replace([np.inf, -np.inf], 0)
+        for row in chunk.itertuples(index=False, name=None):
+            # NaN/NaT -> empty cell; numpy scalars -> Python values openpyxl can write
+            ws.append([None if pd.isna(v) else (v.item() if isinstance(v, np.generic) else v) for v in row])
+        total += len(chunk)
+    wb.save(fileobj)
+    return total
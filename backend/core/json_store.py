@@ -0,0 +1,67 @@
+import os
+import json
+import copy
+
+from .utils import file_lock, atomic_write_json
+
+
+class JsonStore:
+    """
+    Small JSON file wrapper with an in-process cache.
+    The file is only re-read when its mtime/size changes, so repeated GETs
+    (settings, formats, grade master) cost a stat() instead of a parse.
+    Writes are atomic and serialised across worker processes with a lock file.
+    """
+
+    def __init__(self, path: str, default=None):
+        self.path = path
+        self.default = default if default is not None else {}
+        self._data = None
+        self._stamp = None
+
+    def _file_stamp(self):
+        try:
+            st = os.stat(self.path)
+            return (st.st_mtime_ns, st.st_size)
+        except OSError:
+            return None
+
+    @property
+    def version(self):
+        """Opaque token that changes whenever the backing file changes."""
+        stamp = self._file_stamp()
+        return f"{stamp[0]}-{stamp[1]}" if stamp else "default"
+
+    def load(self):
+        """Returns a copy of the stored data (or the default if the file is missing)."""
+        stamp = self._file_stamp()
+        if stamp is None:
+            return copy.deepcopy(self.default)
+
+        if self._data is None or stamp != self._stamp:
+            with open(self.path, "r") as f:
+                self._data = json.load(f)
+            self._stamp = stamp
+        return copy.deepcopy(self._data)
+
+    def save(self, data):
+        with file_lock(self.path):
+            self._write(data)
+
+    def update(self, fn):
+        """
+        Locked read-modify-write: `fn` gets the current data (always re-read from disk,
+        another worker may have changed it) and mutates it in place. Its return value is
+        passed through; raising inside `fn` aborts without writing.
+        """
+        with file_lock(self.path):
+            self._data = None
+            data = self.load()
+            result = fn(data)
+            self._write(data)
+        return result
+
+    def _write(self, data):
+        atomic_write_json(self.path, data)
+        self._data = copy.deepcopy(data)
+        self._stamp = self._file_stamp()
@@ -0,0 +1,220 @@
+import os
+import base64
+import functools
+from html import escape
+from string import Template
+
+from .template_layout import DEFAULT_LAYOUT
+from .value_format import ValueFormatter
+
+# Shared by every certificate in a document: emitted once in <head>
+_DOCUMENT_HEAD = Template("""<!DOCTYPE html>
+<html>
+<head>
+<meta charset="utf-8">
+<title>$title</title>
+<style>
+    @page { size: A4; margin: 10mm; }
+    body { font-family: "$font_family", "Arial", sans-serif; background-color: #f0f0f0; margin: 0; padding: 20px; }
+    .page {
+        width: 210mm; min-height: 297mm; padding: 10mm; margin: 0 auto 20px auto;
+        background: white; box-shadow: 0 0 10px rgba(0,0,0,0.1); border: 1px solid #ccc; box-sizing: border-box;
+        break-after: page; page-break-after: always;
+    }
+    .page:last-of-type { break-after: auto; page-break-after: auto; }
+    table { width: 100%; border-collapse: collapse; font-size: ${font_size}pt; }
+    td, th { border: $border_px solid black; padding: 4px; vertical-align: middle; }
+    .logo-cell { background-color: #000080; color: white; text-align: center; width: 15%; vertical-align: middle; padding: 5px; }
+    .logo { width: 80px; height: 55px; margin: auto; $logo_css }
+    .tvs-text { font-weight: bold; font-family: "Arial Narrow", Arial, sans-serif; font-size: 24pt; letter-spacing: 1px; }
+    .company-header { text-align: center; color: #000000; }
+    .company-name { font-weight: bold; font-size: 14pt; color: #0070c0; }
+    .lab-report-title { font-weight: bold; margin-top: 5px; font-size: 12pt; }
+    .info-cell { width: 35%; font-size: 9pt; }
+    .info-line { margin-bottom: 2px; }
+    .banner { border: 1px solid black; border-top: none; padding: 4px; font-weight: bold; font-size: 10pt; }
+    .section-header { background-color: $header_color; font-weight: bold; text-align: $header_align; padding: 4px; }
+    .chem-header { background-color: #f2f2f2; font-weight: bold; text-align: center; }
+    .center { text-align: center; }
+    .value { text-align: center; font-weight: bold; }
+    .footer-table td { height: 50px; vertical-align: bottom; text-align: center; }
+    .footer-label { background-color: #f2f2f2; height: 20px; vertical-align: middle; font-weight: bold; }
+    @media print {
+        body { background: none; padding: 0; margin: 0; }
+        .page { box-shadow: none; margin: 0; border: none; width: 100%; min-height: 0; padding: 0; }
+        .logo-cell, .logo, .section-header { -webkit-print-color-adjust: exact; print-color-adjust: exact; }
+    }
+</style>
+</head>
+<body>
+""")
+
+# Drawn TVS badge, used when there is no logo.png to embed
+_LOGO_FALLBACK_CSS = ("background: white; clip-path: polygon(20% 0%, 80% 0%, 100% 50%, 80% 100%, 20% 100%, 0% 50%); "
+                      "display: flex; justify-content: center; align-items: center; color: #000080;")
+
+_PAGE = Template("""<div class="page">
+<table>
+    <tr>
+        <td class="logo-cell"><div class="logo">$logo_text</div></td>
+        <td class="company-header">
+            <div class="company-name">AUTOLEC DIVISION-FOUNDRY</div>
+            <div>Gummidipoondi-601201</div>
+            <div>E-Mail: mythili.g@sfl.co.in</div>
+            <div class="lab-report-title">LABORATORY REPORT</div>
+        </td>
+        <td class="info-cell">
+            <div class="info-line"><b>Customer:</b> $customer</div>
+            <div class="info-line"><b>Invoice No :</b> $invoice_no</div>
+            <div class="info-line"><b>Despatch Quantity:</b> $qty</div>
+            <div class="info-line"><b>Dispatch Date :</b> $date</div>
+        </td>
+    </tr>
+</table>
+<div class="banner">$reference</div>
+<div class="banner" style="margin-bottom: 10px;">$part_details</div>
+<table>
+    <tr><th style="width: 30%;">PARAMETER</th><th style="width: 30%;">SPECIFICATION</th><th colspan="2">OBSERVATIONS</th></tr>
+    <tr><td colspan="4" class="section-header">Specification <br> $chem_title</td></tr>
+    <tr class="chem-header"><td>Element</td><td>Percentage</td><td>$heat1</td><td>$heat2</td></tr>
+$chem_rows
+    <tr><td colspan="4" class="section-header">$mech_title</td></tr>
+$mech_rows
+    <tr><td colspan="4" class="section-header">$micro_title</td></tr>
+    <tr>
+        <td colspan="2" class="center" style="padding: 10px;">Thar Graphite from shall be 80 percent Types I &amp; II as determined in accordance with ASTM A 247</td>
+        <td colspan="2" class="center" style="padding: 10px;">Graphite form Type V and VI,<br>Nodularity: 90%<br>Nodule count: 290/mm&sup2;</td>
+    </tr>
+    <tr><td colspan="4" class="section-header">$matrix_title</td></tr>
+    <tr>
+        <td colspan="2" class="center" style="padding: 20px;">Ferrite - Pearlite</td>
+        <td colspan="2" class="center" style="padding: 20px;">Predominantly Ferrite matrix with Pearlite</td>
+    </tr>
+</table>
+<div class="banner">Conclusion: The above material is satisfactory to Ductile iron J434C GRADE $grade.</div>
+<div style="margin-top: 10px;">
+    <table class="footer-table">
+        <tr>
+            <td rowspan="2" style="width: 25%; text-align: left; vertical-align: middle; padding-left: 10px;">SFL/FD/9.15</td>
+            <td class="footer-label">REPORTED BY</td>
+            <td class="footer-label">APPROVED BY</td>
+        </tr>
+        <tr><td style="height: 60px;">G.Mythili</td><td style="height: 60px;">T.Thirugnanam</td></tr>
+    </table>
+</div>
+</div>
+""")
+
+_CHEM_ROW = Template("""    <tr><td>$element</td><td class="center">$spec</td><td class="value">$heat1_val</td><td class="value">$heat2_val</td></tr>""")
+_MECH_ROW = Template("""    <tr><td style="font-weight: bold;">$parameter</td><td class="center">$spec</td><td class="center" colspan="2">$heat1_val</td></tr>""")
+
+_DOCUMENT_TAIL = "</body>\n</html>\n"
+_AUTO_PRINT = "<script>window.print()</script>\n"
+
+
+def _text(value):
+    return escape("" if value is None else str(value))
+
+
+@functools.lru_cache(maxsize=8)
+def _logo_css(logo_path: str, mtime: float):
+    """The logo as a CSS background, so a 100-page document carries the image once."""
+    if not logo_path:
+        return _LOGO_FALLBACK_CSS
+    with open(logo_path, "rb") as f:
+        encoded = base64.b64encode(f.read()).decode("ascii")
+    return (f"background: url(data:image/png;base64,{encoded}) center / contain no-repeat; "
+            f"-webkit-print-color-adjust: exact;")
+
+
+class PrintRenderer:
+    """
+    Renders certificates (the same `data` dicts /api/generate-excel takes) into one HTML
+    document with a page break between them. The CSS and logo are built once per
+    settings; each certificate only substitutes values into the precompiled page template.
+    """
+
+    def __init__(self, settings: dict, defaults: dict = None, logo_path: str = None):
+        self.settings = settings
+        self.defaults = {**DEFAULT_LAYOUT["defaults"], **(defaults or {})}
+        if logo_path is None:
+            logo_path = os.path.join(os.getcwd(), "logo.png")
+        self.logo_path = logo_path if os.path.exists(logo_path) else ""
+        self.formatter = ValueFormatter(settings)
+        self._titles = {key: _text(settings.get(key, default)) for key, default in (
+            ("chem_title", "1. Chemical composition"),
+            ("mech_title", "2. Mechanical Properties"),
+            ("micro_title", "3. Microstructure"),
+            ("matrix_title", "3.1 Matrix"),
+        )}
+
+    def head(self, title: str = "MTC Report"):
+        s = self.settings
+        b_style = s.get("border_style", "thin")
+        border_px = {"thin": "1px", "medium": "2px", "thick": "3px"}.get(b_style, "0")
+        mtime = os.path.getmtime(self.logo_path) if self.logo_path else 0
+        return _DOCUMENT_HEAD.substitute(
+            title=_text(title),
+            font_family=_text(s.get("font_family", "Calibri")),
+            font_size=_text(s.get("font_size", 10)),
+            border_px=border_px,
+            header_color=_text(s.get("header_fill_color", "#d9e1f2")),
+            header_align=_text(s.get("header_align", "center")),
+            logo_css=_logo_css(self.logo_path, mtime),
+        )
+
+    def _observations(self, certificates):
+        """Per certificate, the (heat 1, heat 2) values of its shown chemistry rows, formatted
+        like the Excel certificate in one ValueFormatter call for the whole batch."""
+        shown = [[item for item in data.get("chemistry", []) if not item.get("Hide")] for data in certificates]
+        items = [item for rows in shown for item in rows]
+        values = [item.get(key, "") for item in items for key in ("heat1_val", "heat2_val")]
+        elements = [item.get("Element", "") for item in items for _ in range(2)]
+        cells = iter(self.formatter.format_cells(values, elements) if items else [])
+        return [[(next(cells), next(cells)) for _ in rows] for rows in shown]
+
+    def page(self, data: dict, observed=None):
+        shown = [item for item in data.get("chemistry", []) if not item.get("Hide")]
+        if observed is None:
+            observed = self._observations([data])[0]
+        chem_rows = "\n".join(
+            _CHEM_ROW.substitute(
+                element=_text(item.get("Element", "")),
+                spec=_text(item.get("Spec", "")),
+                heat1_val=_text(heat1_val),
+                heat2_val=_text(heat2_val),
+            )
+            for item, (heat1_val, heat2_val) in zip(shown, observed)
+        )
+        mech_rows = "\n".join(
+            _MECH_ROW.substitute(
+                parameter=_text(item.get("Parameter", "")),
+                spec=_text(item.get("Spec", "")),
+                heat1_val=_text(item.get("heat1_val", "")),
+            )
+            for item in data.get("mechanical", []) if not item.get("Hide")
+        )
+        return _PAGE.substitute(
+            self._titles,
+            logo_text="" if self.logo_path else '<span class="tvs-text">TVS</span>',
+            customer=_text(data.get("customer") or self.defaults["customer"]),
+            invoice_no=_text(data.get("invoice_no", "")),
+            qty=_text(data.get("qty", "")),
+            date=_text(data.get("date", "")),
+            reference=_text(data.get("reference") or self.defaults["reference"]),
+            part_details=_text(data.get("part_details") or self.defaults["part_details"]),
+            heat1=_text(data.get("heat1", "")),
+            heat2=_text(data.get("heat2", "")),
+            grade=_text(data.get("grade", "4512")),
+            chem_rows=chem_rows,
+            mech_rows=mech_rows,
+        )
+
+    def render(self, certificates, auto_print: bool = False, title: str = "MTC Report"):
+        certificates = list(certificates)
+        parts = [self.head(title)]
+        parts.extend(self.page(data, observed) for data, observed in zip(certificates, self._observations(certificates)))
+        if auto_print:
+            parts.append(_AUTO_PRINT)
+        parts.append(_DOCUMENT_TAIL)
+        return "".join(parts)
@@ -0,0 +1,72 @@
+import io
+import re
+import csv
+
+from .certificate_history import REGISTER_COLUMNS
+
+# Well below Excel's 1,048,576 row limit, and small enough to open comfortably
+MAX_ROWS_PER_SHEET = 50000
+
+_INVALID_SHEET_CHARS = re.compile(r"[\[\]:*?/\\]")
+
+
+def _sheet_title(grade: str, part: int, used: set):
+    base = _INVALID_SHEET_CHARS.sub("-", grade or "No Grade").strip() or "No Grade"
+    suffix = f" ({part})" if part > 1 else ""
+    title = base[:31 - len(suffix)] + suffix
+    n = 2
+    while title.lower() in used:
+        extra = f"~{n}"
+        title = base[:31 - len(suffix) - len(extra)] + extra + suffix
+        n += 1
+    used.add(title.lower())
+    return title
+
+
+def write_register_xlsx(rows, fileobj, max_rows_per_sheet: int = MAX_ROWS_PER_SHEET):
+    """
+    Streams (grade, row) pairs, grouped by grade, into a write-only workbook: one sheet
+    per grade, continued on "<grade> (2)", "(3)"... past `max_rows_per_sheet`. Rows go
+    straight to disk, so memory does not grow with the register. Returns the row count.
+    """
+    from openpyxl import Workbook
+
+    wb = Workbook(write_only=True)
+    used = set()
+    ws = None
+    current = None
+    part = 0
+    in_sheet = 0
+    total = 0
+    for grade, row in rows:
+        if grade != current or in_sheet >= max_rows_per_sheet:
+            part = part + 1 if grade == current else 1
+            current = grade
+            ws = wb.create_sheet(_sheet_title(grade, part, used))
+            ws.append(REGISTER_COLUMNS)
+            in_sheet = 0
+        ws.append(row)
+        in_sheet += 1
+        total += 1
+
+    if ws is None:
+        ws = wb.create_sheet("Register")
+        ws.append(REGISTER_COLUMNS)
+    wb.save(fileobj)
+    return total
+
+
+def iter_register_csv(rows, chunk_size: int = 64 * 1024):
+    """Encodes (grade, row) pairs as CSV and yields it in ~chunk_size byte chunks."""
+    buf = io.StringIO()
+    buf.write("\ufeff")  # BOM so Excel opens the UTF-8 file correctly
+    writer = csv.writer(buf)
+    writer.writerow(REGISTER_COLUMNS)
+    for _, row in rows:
+        writer.writerow(row)
+        if buf.tell() >= chunk_size:
+            yield buf.getvalue().encode("utf-8")
+            buf.seek(0)
+            buf.truncate()
+    if buf.tell():
+        yield buf.getvalue().encode("utf-8")
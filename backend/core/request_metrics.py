@@ -0,0 +1,102 @@
+import os
+import sys
+import threading
+import tracemalloc
+
+
+def rss_bytes():
+    """Current resident set size of this process, or None where it cannot be read."""
+    try:
+        import psutil
+        return psutil.Process().memory_info().rss
+    except ImportError:
+        pass
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, AttributeError):
+        pass
+    try:
+        import resource
+        # Peak rather than current RSS: KB on Linux, bytes on macOS
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return peak if sys.platform == "darwin" else peak * 1024
+    except ImportError:
+        return None
+
+
+class RequestMetrics:
+    """
+    Per-endpoint request count, latency and memory of this worker process.
+
+    With `track_memory`, tracemalloc runs for the life of the process and each request
+    records the peak Python allocation above what was allocated when it started, plus
+    the change in RSS. tracemalloc's peak is process-wide, so overlapping requests share
+    it: figures are exact when requests run one at a time and an upper bound otherwise.
+    """
+
+    def __init__(self, track_memory: bool = False):
+        self.track_memory = track_memory
+        self._lock = threading.Lock()
+        self._endpoints = {}
+        self._active = 0
+        if track_memory and not tracemalloc.is_tracing():
+            tracemalloc.start()
+
+    def start(self):
+        """Snapshot taken before the request runs; pass it to `finish`."""
+        if not self.track_memory:
+            return None
+        with self._lock:
+            self._active += 1
+            if self._active == 1:
+                tracemalloc.reset_peak()
+        return tracemalloc.get_traced_memory()[0], rss_bytes()
+
+    def finish(self, endpoint: str, seconds: float, status: int, snapshot=None):
+        peak = rss_delta = None
+        if snapshot is not None:
+            traced_before, rss_before = snapshot
+            peak = max(tracemalloc.get_traced_memory()[1] - traced_before, 0)
+            rss_after = rss_bytes()
+            if rss_before is not None and rss_after is not None:
+                rss_delta = rss_after - rss_before
+
+        with self._lock:
+            if snapshot is not None:
+                self._active -= 1
+            m = self._endpoints.setdefault(endpoint, {
+                "requests": 0, "errors": 0, "total_seconds": 0.0, "max_seconds": 0.0,
+                "last_peak_bytes": None, "max_peak_bytes": None, "total_peak_bytes": 0,
+                "max_rss_delta_bytes": None,
+            })
+            m["requests"] += 1
+            m["errors"] += status >= 500
+            m["total_seconds"] += seconds
+            m["max_seconds"] = max(m["max_seconds"], seconds)
+            if peak is not None:
+                m["last_peak_bytes"] = peak
+                m["max_peak_bytes"] = max(m["max_peak_bytes"] or 0, peak)
+                m["total_peak_bytes"] += peak
+            if rss_delta is not None:
+                m["max_rss_delta_bytes"] = max(m["max_rss_delta_bytes"] or 0, rss_delta)
+
+    def snapshot(self):
+        with self._lock:
+            endpoints = {}
+            for name, m in sorted(self._endpoints.items()):
+                n = m["requests"]
+                endpoints[name] = {
+                    "requests": n,
+                    "errors": m["errors"],
+                    "mean_ms": round(m["total_seconds"] / n * 1000, 1),
+                    "max_ms": round(m["max_seconds"] * 1000, 1),
+                    "last_peak_bytes": m["last_peak_bytes"],
+                    "max_peak_bytes": m["max_peak_bytes"],
+                    "mean_peak_bytes": round(m["total_peak_bytes"] / n) if m["max_peak_bytes"] is not None else None,
+                    "max_rss_delta_bytes": m["max_rss_delta_bytes"],
+                }
+        result = {"pid": os.getpid(), "track_memory": self.track_memory, "rss_bytes": rss_bytes(), "endpoints": endpoints}
+        if self.track_memory:
+            result["traced_bytes"] = tracemalloc.get_traced_memory()[0]
+        return result
@@ -0,0 +1,47 @@
+import re
+
+from .elements import column_symbol
+
+_NON_ALNUM = re.compile(r"[^a-z0-9]+")
+
+
+def column_key(column):
+    """
+    What a spectro column means, independent of how an export spells it: element columns
+    by symbol ("C [%]", "C%", "Carbon" -> "element:C"), anything else by its lower-cased
+    letters and digits ("HEAT NO." and "Heat No" -> "heatno").
+    """
+    symbol = column_symbol(column)
+    if symbol:
+        return f"element:{symbol}"
+    return _NON_ALNUM.sub("", str(column).lower())
+
+
+def align_columns(frames, role_finders=()):
+    """
+    Renames the columns of several spectro frames onto one shared set of names, so they
+    can be concatenated. A column takes the name it had in the first frame that has it.
+    `role_finders` (functions columns -> column or None, e.g. the heat/grade/date finders)
+    match columns that play the same role under unrelated names ("Heat No" / "Melt Id").
+    Returns the renamed frames.
+    """
+    canonical = {}
+    aligned = []
+    for df in frames:
+        roles = {}
+        for i, finder in enumerate(role_finders):
+            col = finder(list(df.columns))
+            if col is not None:
+                roles.setdefault(col, f"role:{i}")
+
+        mapping = {}
+        used = set()
+        for col in df.columns:
+            key = roles.get(col) or column_key(col)
+            if key in used:
+                # A second spelling of the same column within one file stays separate
+                key = f"column:{col}"
+            used.add(key)
+            mapping[col] = canonical.setdefault(key, col)
+        aligned.append(df.rename(columns=mapping))
+    return aligned
@@ -0,0 +1,72 @@
+import time
+import uuid
+import threading
+from collections import OrderedDict
+
+
+class SessionStore:
+    """
+    Keeps recently analysed spectro frames in memory so follow-up requests
+    (facets, exports, certificate drafts) can reuse them without a re-upload.
+    Least recently used sessions are evicted beyond `max_sessions` or after `ttl` seconds.
+
+    With a `shared` SharedCache, sessions are also persisted to disk so a request
+    landing on another worker process (uvicorn --workers N) still finds them.
+    """
+
+    def __init__(self, max_sessions: int = 8, ttl: int = 4 * 3600, shared=None):
+        self.max_sessions = max_sessions
+        self.ttl = ttl
+        self.shared = shared
+        self._sessions = OrderedDict()
+        self._lock = threading.Lock()
+
+    def create(self, df, **meta):
+        session_id = uuid.uuid4().hex
+        entry = {"df": df, "created": time.time(), **meta}
+        with self._lock:
+            self._sessions[session_id] = entry
+            self._evict()
+        self._persist(session_id, entry)
+        return session_id
+
+    def get(self, session_id: str):
+        with self._lock:
+            self._evict()
+            entry = self._sessions.get(session_id)
+            if entry is not None:
+                self._sessions.move_to_end(session_id)
+                return entry
+
+        if self.shared is None:
+            return None
+        entry = self.shared.get(self._key(session_id))
+        if entry is None or time.time() - entry["created"] > self.ttl:
+            return None
+        with self._lock:
+            self._sessions[session_id] = entry
+            self._evict()
+        return entry
+
+    def update(self, session_id: str, **fields):
+        """Adds derived data (e.g. facets) to a session and shares it with the other workers."""
+        entry = self.get(session_id)
+        if entry is None:
+            return None
+        entry.update(fields)
+        self._persist(session_id, entry)
+        return entry
+
+    def _persist(self, session_id, entry):
+        if self.shared is not None:
+            self.shared.set(self._key(session_id), entry)
+
+    def _key(self, session_id):
+        return f"session:{session_id}"
+
+    def _evict(self):
+        now = time.time()
+        for sid in [s for s, e in self._sessions.items() if now - e["created"] > self.ttl]:
+            del self._sessions[sid]
+        while len(self._sessions) > self.max_sessions:
+            self._sessions.popitem(last=False)
@@ -0,0 +1,233 @@
+import math
+import time
+
+import numpy as np
+import pandas as pd
+
+from .dtypes import widen, parse_dates
+from .elements import element_columns
+from .json_store import JsonStore
+
+ALL_GRADES = "*"
+
+
+class RunningStats:
+    """
+    Welford-style running aggregate (count, mean, sum of squared deviations, min, max).
+    Batches are folded in with Chan's parallel update, so adding a whole file costs
+    one vectorised pass and never needs the raw rows again.
+    """
+
+    def __init__(self, n=0, mean=0.0, m2=0.0, min=None, max=None):
+        self.n = n
+        self.mean = mean
+        self.m2 = m2
+        self.min = min
+        self.max = max
+
+    def merge(self, n, mean, m2, vmin, vmax):
+        if n == 0:
+            return self
+        total = self.n + n
+        delta = mean - self.mean
+        self.mean += delta * n / total
+        self.m2 += m2 + delta * delta * self.n * n / total
+        self.n = total
+        self.min = vmin if self.min is None else min(self.min, vmin)
+        self.max = vmax if self.max is None else max(self.max, vmax)
+        return self
+
+    def merge_stats(self, other):
+        return self.merge(other.n, other.mean, other.m2, other.min, other.max)
+
+    @property
+    def std(self):
+        # Sample standard deviation
+        return math.sqrt(self.m2 / (self.n - 1)) if self.n > 1 else 0.0
+
+    def to_dict(self):
+        return {"n": self.n, "mean": self.mean, "m2": self.m2, "min": self.min, "max": self.max}
+
+    @classmethod
+    def from_dict(cls, d):
+        return cls(d["n"], d["mean"], d["m2"], d["min"], d["max"])
+
+
+def capability(stats: RunningStats, lower=None, upper=None):
+    """Cp/Cpk for the given spec limits (Cp needs both limits; Cpk works one-sided)."""
+    sigma = stats.std
+    if stats.n < 2 or sigma == 0:
+        return {"cp": None, "cpk": None}
+    cp = (upper - lower) / (6 * sigma) if lower is not None and upper is not None else None
+    sides = []
+    if upper is not None:
+        sides.append((upper - stats.mean) / (3 * sigma))
+    if lower is not None:
+        sides.append((stats.mean - lower) / (3 * sigma))
+    return {"cp": cp, "cpk": min(sides) if sides else None}
+
+
+class SpcTracker:
+    """
+    Running SPC aggregates per grade and element, overall and per ISO week.
+    Every ingested spectro file is folded in once (tracked by content hash), so
+    trend queries read a few hundred aggregates instead of rescanning raw rows.
+
+    Layout of the backing JSON file:
+        {"files": {hash: {...}}, "grades": {grade: {symbol: {"total": stats, "weeks": {"2026-W02": stats}}}}}
+    """
+
+    def __init__(self, path: str, processor):
+        self.store = JsonStore(path, default={"files": {}, "grades": {}})
+        self.processor = processor
+
+    def has_file(self, file_hash: str):
+        return file_hash in self.store.load()["files"]
+
+    def ingest(self, df: pd.DataFrame, file_hash: str, source: str = ""):
+        """Folds one parsed spectro file into the aggregates. Returns False if it was already ingested."""
+        batches = self._batch_stats(df)
+
+        def apply(data):
+            if file_hash in data["files"]:
+                return False
+            grades = data["grades"]
+            for (grade, symbol, week), (n, mean, m2, vmin, vmax) in batches.items():
+                entry = grades.setdefault(grade, {}).setdefault(symbol, {"total": None, "weeks": {}})
+                if week is None:
+                    total = RunningStats.from_dict(entry["total"]) if entry["total"] else RunningStats()
+                    entry["total"] = total.merge(n, mean, m2, vmin, vmax).to_dict()
+                else:
+                    bucket = entry["weeks"].get(week)
+                    bucket = RunningStats.from_dict(bucket) if bucket else RunningStats()
+                    entry["weeks"][week] = bucket.merge(n, mean, m2, vmin, vmax).to_dict()
+            data["files"][file_hash] = {"source": source, "rows": int(len(df)), "ingested": time.time()}
+            return True
+
+        return self.store.update(apply)
+
+    def _batch_stats(self, df: pd.DataFrame):
+        """
+        Per (grade, element, week) count/mean/M2/min/max for one file, computed with groupby.
+        week=None batches feed the overall aggregate; ALL_GRADES collects every row.
+        """
+        elements = element_columns(df.columns)
+        if not elements:
+            return {}
+
+        grade_col = self.processor.find_grade_column(df.columns)
+        date_col = self.processor.find_date_column(df.columns)
+
+        keys = pd.DataFrame(index=df.index)
+        keys["grade"] = df[grade_col].astype(object).fillna("").astype(str).str.strip() if grade_col else ""
+        if date_col is not None:
+            iso = parse_dates(df[date_col]).dt.isocalendar()
+            keys["week"] = (iso["year"].astype("string") + "-W" + iso["week"].astype("string").str.zfill(2))
+        else:
+            keys["week"] = pd.Series(pd.NA, index=df.index, dtype="string")
+
+        batches = {}
+        for symbol, col in elements.items():
+            values = pd.to_numeric(widen(df[col]), errors="coerce").replace([np.inf, -np.inf], np.nan)
+            frame = keys.assign(v=values).dropna(subset=["v"])
+            if frame.empty:
+                continue
+            for by_grade in (True, False):
+                group_keys = (["grade"] if by_grade else [])
+                for with_week in (False, True):
+                    cols = group_keys + (["week"] if with_week else [])
+                    part = frame.dropna(subset=["week"]) if with_week else frame
+                    if part.empty:
+                        continue
+                    if cols:
+                        agg = part.groupby(cols)["v"].agg(["count", "mean", "var", "min", "max"])
+                    else:
+                        v = part["v"]
+                        agg = pd.DataFrame([[v.count(), v.mean(), v.var(), v.min(), v.max()]],
+                                           columns=["count", "mean", "var", "min", "max"])
+                    for idx, row in agg.iterrows():
+                        idx = idx if isinstance(idx, tuple) else (idx,)
+                        grade = idx[0] if by_grade else ALL_GRADES
+                        if by_grade and not grade:
+                            continue
+                        week = idx[-1] if with_week else None
+                        n = int(row["count"])
+                        m2 = float(row["var"]) * (n - 1) if n > 1 else 0.0
+                        batches[(grade, symbol, week)] = (n, float(row["mean"]), m2, float(row["min"]), float(row["max"]))
+        return batches
+
+    def grades(self):
+        return sorted(self.store.load()["grades"])
+
+    def trend(self, grade: str, symbol: str, limits=(None, None), max_points: int = 52, window: int = 4):
+        """
+        Overall mean/std/Cp/Cpk plus the weekly series (downsampled to at most `max_points`
+        buckets by merging neighbours) and a rolling mean/std over `window` buckets.
+        """
+        return self.trends(grade, [symbol], {symbol: limits}, max_points, window).get(symbol)
+
+    def trends(self, grade: str, symbols, limits: dict = None, max_points: int = 52, window: int = 4):
+        """
+        trend() for several elements of a grade ({symbol: trend}, elements without data left
+        out), reading the aggregates once. `limits` maps symbols to (lower, upper).
+        """
+        entries = self.store.load()["grades"].get(grade, {})
+        trends = {}
+        for symbol in symbols:
+            trend = self._trend(grade, symbol, entries.get(symbol), (limits or {}).get(symbol, (None, None)),
+                                max_points, window)
+            if trend:
+                trends[symbol] = trend
+        return trends
+
+    def _trend(self, grade, symbol, entry, limits, max_points, window):
+        if not entry or not entry["total"]:
+            return None
+
+        total = RunningStats.from_dict(entry["total"])
+        weeks = sorted(entry["weeks"].items())
+        buckets = [(week, week, RunningStats.from_dict(s)) for week, s in weeks]
+
+        # Downsample by merging adjacent buckets (aggregates merge exactly)
+        if max_points and len(buckets) > max_points:
+            size = math.ceil(len(buckets) / max_points)
+            merged = []
+            for i in range(0, len(buckets), size):
+                chunk = buckets[i:i + size]
+                stats = RunningStats()
+                for _, _, s in chunk:
+                    stats.merge_stats(s)
+                merged.append((chunk[0][0], chunk[-1][1], stats))
+            buckets = merged
+
+        series = []
+        for i, (start, end, stats) in enumerate(buckets):
+            rolling = RunningStats()
+            for _, _, s in buckets[max(0, i - window + 1):i + 1]:
+                rolling.merge_stats(s)
+            series.append({
+                "period": start if start == end else f"{start}..{end}",
+                "n": stats.n,
+                "mean": stats.mean,
+                "std": stats.std,
+                "min": stats.min,
+                "max": stats.max,
+                "rolling_mean": rolling.mean,
+                "rolling_std": rolling.std
+            })
+
+        lower, upper = limits
+        return {
+            "grade": grade,
+            "element": symbol,
+            "n": total.n,
+            # Samples without a date count in the totals but in no week of the series
+            "undated": total.n - sum(s.n for _, _, s in buckets),
+            "mean": total.mean,
+            "std": total.std,
+            "min": total.min,
+            "max": total.max,
+            "spec": {"lower": lower, "upper": upper},
+            **capability(total, lower, upper),
+            "series": series
+        }
@@ -0,0 +1,130 @@
+import os
+import time
+import pickle
+import bisect
+import threading
+
+import pandas as pd
+
+from .json_store import JsonStore
+from .utils import atomic_write_bytes
+from .dtypes import parse_dates
+
+UNDATED = "undated"
+MAX_CACHED_PARTITIONS = 64
+
+
+class SpectroStore:
+    """
+    Ingested spectro rows partitioned by day (one pickle per YYYY-MM-DD).
+    The date column is parsed once at ingest into datetime64, and the index keeps a
+    sorted list of partition days, so a range query bisects the index and loads only
+    the partitions it covers instead of scanning every uploaded file.
+
+    Layout:
+        <directory>/index.json       {"files": {hash: {...}}, "days": {"2026-01-05": rows}}
+        <directory>/YYYY-MM-DD.pkl   rows of that day (undated rows go to undated.pkl)
+    """
+
+    def __init__(self, directory: str, processor):
+        self.directory = directory
+        self.processor = processor
+        os.makedirs(directory, exist_ok=True)
+        self.index = JsonStore(os.path.join(directory, "index.json"), default={"files": {}, "days": {}})
+        self._partitions = {}
+        self._lock = threading.Lock()
+
+    def has_file(self, file_hash: str):
+        return file_hash in self.index.load()["files"]
+
+    def ingest(self, df: pd.DataFrame, file_hash: str, source: str = ""):
+        """Splits one parsed spectro file into day partitions. Returns False if it was already ingested."""
+        df, date_col = self._typed(df)
+        if date_col is not None:
+            day_keys = df[date_col].dt.strftime("%Y-%m-%d").fillna(UNDATED)
+        else:
+            day_keys = pd.Series(UNDATED, index=df.index)
+
+        def apply(data):
+            if file_hash in data["files"]:
+                return False
+            for day, rows in df.groupby(day_keys, sort=True):
+                existing = self._load_partition(day)
+                part = rows if existing is None else pd.concat([existing, rows], ignore_index=True)
+                self._write_partition(day, part.reset_index(drop=True))
+                data["days"][day] = int(len(part))
+            data["files"][file_hash] = {"source": source, "rows": int(len(df)), "ingested": time.time()}
+            return True
+
+        return self.index.update(apply)
+
+    def _typed(self, df: pd.DataFrame):
+        """Copy of `df` with its date column parsed to datetime64 (see dtypes.parse_dates)."""
+        date_col = self.processor.find_date_column(df.columns)
+        if date_col is None:
+            return df, None
+        if not pd.api.types.is_datetime64_any_dtype(df[date_col]):
+            df = df.copy()
+            df[date_col] = parse_dates(df[date_col])
+        return df, date_col
+
+    def days(self):
+        """Sorted partition days (without the undated bucket)."""
+        return sorted(d for d in self.index.load()["days"] if d != UNDATED)
+
+    def query(self, start: str = None, end: str = None, grade: str = None, include_undated: bool = False):
+        """
+        Rows with start <= date <= end (ISO dates, either bound optional), optionally for one grade.
+        Only the partitions inside the range are read.
+        """
+        days = self.days()
+        lo = bisect.bisect_left(days, start) if start else 0
+        hi = bisect.bisect_right(days, end) if end else len(days)
+        selected = days[lo:hi]
+        if include_undated and UNDATED in self.index.load()["days"]:
+            selected.append(UNDATED)
+
+        frames = []
+        for day in selected:
+            part = self._load_partition(day)
+            if part is None or part.empty:
+                continue
+            if grade:
+                grade_col = self.processor.find_grade_column(part.columns)
+                if grade_col is None:
+                    continue
+                part = part[part[grade_col].astype(str).str.strip() == grade.strip()]
+            if not part.empty:
+                frames.append(part)
+
+        df = pd.concat(frames, ignore_index=True) if frames else pd.DataFrame()
+        # Compacted text columns are categoricals: drop the categories the grade filter emptied
+        for col in df.columns[[isinstance(t, pd.CategoricalDtype) for t in df.dtypes]]:
+            df[col] = df[col].cat.remove_unused_categories()
+        return df, len(selected)
+
+    def _path(self, day: str):
+        return os.path.join(self.directory, f"{day}.pkl")
+
+    def _load_partition(self, day: str):
+        path = self._path(day)
+        try:
+            mtime = os.stat(path).st_mtime_ns
+        except OSError:
+            return None
+        with self._lock:
+            cached = self._partitions.get(day)
+            if cached and cached[0] == mtime:
+                return cached[1]
+        with open(path, "rb") as f:
+            df = pickle.load(f)
+        with self._lock:
+            self._partitions[day] = (mtime, df)
+            while len(self._partitions) > MAX_CACHED_PARTITIONS:
+                self._partitions.pop(next(iter(self._partitions)))
+        return df
+
+    def _write_partition(self, day: str, df: pd.DataFrame):
+        atomic_write_bytes(self._path(day), pickle.dumps(df, protocol=pickle.HIGHEST_PROTOCOL))
+        with self._lock:
+            self._partitions.pop(day, None)
@@ -0,0 +1,170 @@
+import re
+import hashlib
+import threading
+
+from .elements import ELEMENT_SYMBOLS, CERT_ELEMENTS
+
+# Bump when the discovery rules change so cached layouts are rebuilt
+LAYOUT_VERSION = 2
+
+# Layout of the shipped M537 template ("Final correct.xlsx", as discover_layout reads it:
+# row 14 is the "1. Chemical composition" heading); used for anything discovery cannot find
+DEFAULT_LAYOUT = {
+    "invoice_cell": [4, 3],
+    "qty_cell": [5, 3],
+    "date_cell": [6, 3],
+    "part_cell": [8, 2],
+    "customer_cell": [2, 1],
+    "reference_cell": [7, 1],
+    "heat_row": 13,
+    "elements": {
+        "Carbon": 15,
+        "Silicon": 16,
+        "Manganese": 17,
+        "Phosphorus": 18,
+        "Sulphur": 19,
+        "Copper": 20,
+        "Nickel": 21,
+        "Chromium": 22,
+        "Moly": 23,
+        "Magnesium": 24,
+        "CE": 25,
+        "Tin": 26,
+    },
+    "chem_rows": [14, 26],
+    "mechanical_rows": [28, 29, 30, 31],
+    "conclusion_row": 42,
+    # Template text offered as defaults for a new certificate
+    "defaults": {
+        "part_details": "",
+        "customer": "SUNDRAM FASTENERS LTD",
+        "reference": "REFERENCE - Ductile iron J434C GRADE 4512",
+    },
+}
+
+# Header label -> layout key (matched case-insensitively at the start of a cell)
+HEADER_LABELS = {
+    "invoice_cell": ("invoice no",),
+    "qty_cell": ("despatch quantity", "dispatch quantity"),
+    "date_cell": ("dispatch date", "despatch date"),
+    "part_cell": ("part name",),
+    "reference_cell": ("reference",),
+}
+
+_SECTION_RE = re.compile(r"^\d+\.\s*[a-z]")   # "2. Mechanical Properties", "3.   Microstructure"
+_SCAN_ROWS = 100
+_SCAN_COLS = 4
+
+_layouts = {}
+_lock = threading.Lock()
+
+
+def fingerprint(template_bytes: bytes):
+    return hashlib.sha256(template_bytes).hexdigest()
+
+
+def _cert_element(label: str):
+    """Template element label -> certificate element name ("Nickle" -> "Nickel")."""
+    symbol = next((s for name, s in ELEMENT_SYMBOLS.items() if name.lower() == label), None)
+    if symbol is None:
+        return None
+    return next(name for name in CERT_ELEMENTS if ELEMENT_SYMBOLS[name] == symbol)
+
+
+def discover_layout(ws):
+    """
+    Scans the A-D block of a template sheet once and locates the header cells, the
+    heat number row ("Element" in column A), one row per chemistry element, the
+    mechanical rows and the conclusion row from their labels. Fields that cannot be
+    found fall back to DEFAULT_LAYOUT.
+    """
+    rows = {}
+    texts = {}
+    max_row = min(ws.max_row or _SCAN_ROWS, _SCAN_ROWS)
+    for row in ws.iter_rows(min_row=1, max_row=max_row, max_col=_SCAN_COLS):
+        for cell in row:
+            if isinstance(cell.value, str) and cell.value.strip():
+                rows.setdefault(cell.row, {})[cell.column] = cell.value.strip().lower()
+                texts[(cell.row, cell.column)] = cell.value.strip()
+
+    # The generator only writes columns A-D, so labels must start in column A;
+    # anything else (e.g. a sheet shifted one column right) keeps the default layout
+    first_col = {r: cells[1] for r, cells in rows.items() if 1 in cells}
+    heat_row = next((r for r in sorted(first_col) if first_col[r] == "element"), None)
+    if heat_row is None:
+        return {**DEFAULT_LAYOUT, "discovered": [], "version": LAYOUT_VERSION}
+
+    layout = {"heat_row": heat_row, "customer_cell": [min(first_col), 1]}
+    for key, labels in HEADER_LABELS.items():
+        for r in sorted(rows):
+            col = next((c for c, text in sorted(rows[r].items()) if text.startswith(labels)), None)
+            if col is not None:
+                # Part details are written next to their label (merges resolve to the label cell)
+                layout[key] = [r, col + 1] if key == "part_cell" else [r, col]
+                break
+
+    mech_title = next((r for r in sorted(first_col) if "mechanical properties" in first_col[r]), None)
+
+    elements = {}
+    end = mech_title or max_row + 1
+    for r in range(heat_row + 1, end):
+        name = _cert_element(first_col.get(r, ""))
+        if name and name not in elements:
+            elements[name] = r
+    if len(elements) >= 3:
+        layout["elements"] = elements
+        layout["chem_rows"] = [heat_row + 1, max(elements.values())]
+
+    if mech_title is not None:
+        mech_rows = []
+        for r in range(mech_title + 1, max_row + 1):
+            text = first_col.get(r)
+            if text is None or _SECTION_RE.match(text):
+                break
+            mech_rows.append(r)
+        if mech_rows:
+            layout["mechanical_rows"] = mech_rows
+
+    conclusion = next((r for r in sorted(first_col) if first_col[r].startswith("conclusion")), None)
+    if conclusion is not None:
+        layout["conclusion_row"] = conclusion
+
+    defaults = dict(DEFAULT_LAYOUT["defaults"])
+    defaults["customer"] = texts[(layout["customer_cell"][0], 1)]
+    if "part_cell" in layout:
+        defaults["part_details"] = texts[(layout["part_cell"][0], layout["part_cell"][1] - 1)]
+    if "reference_cell" in layout:
+        defaults["reference"] = texts[tuple(layout["reference_cell"])]
+    layout["defaults"] = defaults
+
+    return {**DEFAULT_LAYOUT, **layout, "discovered": sorted(layout), "version": LAYOUT_VERSION}
+
+
+def get_layout(template_bytes: bytes, ws=None, shared=None):
+    """
+    Layout for a template, cached by content hash in memory and (optionally) in a
+    SharedCache, so each template is scanned once across requests and workers.
+    `ws` is the already loaded sheet if the caller has one; otherwise the template
+    is opened read-only just for the scan.
+    """
+    key = f"layout:{LAYOUT_VERSION}:{fingerprint(template_bytes)}"
+    with _lock:
+        layout = _layouts.get(key)
+    if layout is None and shared is not None:
+        layout = shared.get(key)
+    if layout is None:
+        if ws is None:
+            import io
+            from openpyxl import load_workbook
+            wb = load_workbook(io.BytesIO(template_bytes), read_only=True)
+            try:
+                layout = discover_layout(wb.active)
+            finally:
+                wb.close()
+        else:
+            layout = discover_layout(ws)
+        if shared is not None:
+            shared.set(key, layout)
+    with _lock:
+        _layouts[key] = layout
+    return layout
@@ -1 +1,96 @@
 # Utility functions for the backend
+import os
+import json
+import time
+import uuid
+import hashlib
+from contextlib import contextmanager
+
+
+@contextmanager
+def file_lock(path: str, timeout: float = 30.0):
+    """
+    Exclusive lock shared by every process on the machine (uvicorn --workers N),
+    held on a `<path>.lock` sidecar file so the data file itself can be replaced atomically.
+    """
+    lock_path = path + ".lock"
+    deadline = time.monotonic() + timeout
+    with open(lock_path, "a+b") as fh:
+        if os.name == "nt":
+            import msvcrt
+            while True:
+                try:
+                    fh.seek(0)
+                    msvcrt.locking(fh.fileno(), msvcrt.LK_NBLCK, 1)
+                    break
+                except OSError:
+                    if time.monotonic() > deadline:
+                        raise TimeoutError(f"Timed out waiting for lock on {path}")
+                    time.sleep(0.05)
+            try:
+                yield
+            finally:
+                fh.seek(0)
+                msvcrt.locking(fh.fileno(), msvcrt.LK_UNLCK, 1)
+        else:
+            import fcntl
+            while True:
+                try:
+                    fcntl.flock(fh.fileno(), fcntl.LOCK_EX | fcntl.LOCK_NB)
+                    break
+                except OSError:
+                    if time.monotonic() > deadline:
+                        raise TimeoutError(f"Timed out waiting for lock on {path}")
+                    time.sleep(0.05)
+            try:
+                yield
+            finally:
+                fcntl.flock(fh.fileno(), fcntl.LOCK_UN)
+
+
+def atomic_write_bytes(path: str, data: bytes):
+    """
+    Writes via a temp file + os.replace so readers never see a half-written file.
+    The temp name is unique per call, so threads of one process writing the same path
+    (the folder watcher and a request) never share it.
+    """
+    tmp_path = f"{path}.{os.getpid()}.{uuid.uuid4().hex}.tmp"
+    try:
+        with open(tmp_path, "xb") as f:
+            f.write(data)
+            f.flush()
+            os.fsync(f.fileno())
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+    for attempt in range(10):
+        try:
+            os.replace(tmp_path, path)
+            return
+        except PermissionError:
+            # Windows refuses to replace a file another process has open; retry briefly
+            if attempt == 9:
+                os.remove(tmp_path)
+                raise
+            time.sleep(0.05)
+
+
+def atomic_write_json(path: str, data):
+    atomic_write_bytes(path, json.dumps(data, indent=4).encode("utf-8"))
+
+
+def hash_file(file_obj, chunk_size: int = 1024 * 1024):
+    """SHA-256 of a binary file object (or path), read in chunks; file objects are rewound."""
+    digest = hashlib.sha256()
+    if isinstance(file_obj, str):
+        with open(file_obj, "rb") as f:
+            for chunk in iter(lambda: f.read(chunk_size), b""):
+                digest.update(chunk)
+        return digest.hexdigest()
+
+    file_obj.seek(0)
+    for chunk in iter(lambda: file_obj.read(chunk_size), b""):
+        digest.update(chunk)
+    file_obj.seek(0)
+    return digest.hexdigest()
@@ -0,0 +1,84 @@
+import numpy as np
+import pandas as pd
+
+from .dtypes import widen
+from .elements import element_symbol
+
+# How observed chemistry values are written on certificates, per element symbol;
+# settings["value_format"] overrides any of these ({"Mg": {"decimals": 4}, "default": {...}})
+DEFAULT_VALUE_FORMAT = {
+    "default": {"decimals": 2, "unit": "%"},
+    "Mg": {"decimals": 3},
+    "S": {"decimals": 3},
+}
+
+
+class ValueFormatter:
+    """
+    Formats observed chemistry values for certificates, the Excel file, the print view
+    and the API drafts alike: numbers get the element's decimals and unit ("3.50%",
+    "0.045%"), text ("<0.001", "3.5%") is kept as written and blanks stay blank.
+    Whole columns are formatted at once: numbers are parsed with one vectorized
+    pd.to_numeric and written with one format pattern per distinct rule.
+    """
+
+    def __init__(self, settings: dict = None):
+        config = {**DEFAULT_VALUE_FORMAT}
+        for key, rule in ((settings or {}).get("value_format") or {}).items():
+            key = key if key == "default" else (element_symbol(key) or key)
+            config[key] = {**config.get(key, {}), **rule}
+        default = config.pop("default")
+        self._default = (int(default.get("decimals", 2)), str(default.get("unit", "%")))
+        self._rules = {
+            symbol: (int(rule.get("decimals", self._default[0])), str(rule.get("unit", self._default[1])))
+            for symbol, rule in config.items()
+        }
+        self._lookup = {}
+
+    def rule(self, element=None):
+        """(decimals, unit) for an element given by name ("Carbon"), symbol or spectro column ("Mg %")."""
+        if element is None:
+            return self._default
+        rule = self._lookup.get(element)
+        if rule is None:
+            rule = self._rules.get(element_symbol(element), self._default)
+            self._lookup[element] = rule
+        return rule
+
+    def rules(self):
+        """The resolved rules, {"default": {"decimals": 2, "unit": "%"}, "Mg": {...}}, for clients that format too."""
+        return {key: {"decimals": decimals, "unit": unit}
+                for key, (decimals, unit) in {"default": self._default, **self._rules}.items()}
+
+    def format_series(self, series: pd.Series, element=None):
+        """A column of one element's values, formatted (object dtype, same index)."""
+        series = widen(series)
+        out = self._format(series, None, {self.rule(element): 0})
+        return pd.Series(out, index=series.index, name=series.name, dtype=object)
+
+    def format_cells(self, values, elements):
+        """Values of different elements (e.g. a certificate's chemistry rows), as a list of strings."""
+        distinct = {}
+        ids = np.array([distinct.setdefault(self.rule(e), len(distinct)) for e in elements], dtype=np.int64)
+        return self._format(pd.Series(list(values), dtype=object), ids, distinct).tolist()
+
+    def format_value(self, value, element=None):
+        return self.format_cells([value], [element])[0]
+
+    @staticmethod
+    def _format(series: pd.Series, ids, distinct):
+        numbers = pd.to_numeric(series, errors="coerce").to_numpy(dtype="float64", na_value=np.nan)
+        finite = np.isfinite(numbers)
+        out = np.full(len(numbers), "", dtype=object)
+
+        # Non-numbers as written (stripped); missing values and infinities stay blank
+        text = ~finite & ~np.isinf(numbers) & series.notna().to_numpy()
+        if text.any():
+            out[text] = [str(v).strip() for v in series.to_numpy(dtype=object)[text]]
+
+        for (decimals, unit), i in distinct.items():
+            selected = finite if ids is None else finite & (ids == i)
+            if selected.any():
+                pattern = f"%.{decimals}f" + unit.replace("%", "%%")
+                out[selected] = list(map(pattern.__mod__, numbers[selected].tolist()))
+        return out
@@ -0,0 +1,261 @@
+import io
+import re
+import zipfile
+import posixpath
+from xml.etree.ElementTree import iterparse
+
+from .elements import ELEMENT_SYMBOLS, element_symbol
+
+_NS = "{http://schemas.openxmlformats.org/spreadsheetml/2006/main}"
+_REL_NS = "{http://schemas.openxmlformats.org/officeDocument/2006/relationships}"
+_PKG_REL_NS = "{http://schemas.openxmlformats.org/package/2006/relationships}"
+_CELL_RE = re.compile(r"\$?([A-Z]+)\$?(\d+)")
+
+# The certificate occupies A1:D50 and is framed by a thick border
+PRINT_AREA = "A1:D50"
+LAST_COLUMN = 4
+FRAME_ROWS = 50
+
+# Cell styles parsed from styles.xml, keyed by the part's CRC and size: certificates from one template
+# and one set of settings share it, so a batch of them parses it once
+_style_cache = {}
+_STYLE_CACHE_SIZE = 32
+
+
+def _cell_index(ref: str):
+    """"C14" -> (14, 3)."""
+    letters, digits = _CELL_RE.match(ref).groups()
+    col = 0
+    for ch in letters:
+        col = col * 26 + ord(ch) - 64
+    return int(digits), col
+
+
+def _range(ref: str):
+    """"C28:D28" -> (28, 3, 28, 4); a single cell is a 1x1 range."""
+    first, _, last = ref.partition(":")
+    r1, c1 = _cell_index(first)
+    r2, c2 = _cell_index(last or first)
+    return r1, c1, r2, c2
+
+
+def _iter_end(part, *tags):
+    """(tag, element) for each element with one of `tags` (without namespace), cleared once handled."""
+    wanted = {_NS + t: t for t in tags}
+    for _, elem in iterparse(part, events=("end",)):
+        tag = wanted.get(elem.tag)
+        if tag is not None:
+            yield tag, elem
+            elem.clear()
+
+
+def _active_sheet(zf):
+    """Name and part path of the workbook's active sheet, and its print area ("A1:D50")."""
+    active, sheets, print_areas = 0, [], {}
+    with zf.open("xl/workbook.xml") as part:
+        for tag, elem in _iter_end(part, "workbookView", "sheet", "definedName"):
+            if tag == "workbookView":
+                active = int(elem.get("activeTab", 0))
+            elif tag == "sheet":
+                sheets.append((elem.get("name"), elem.get(_REL_NS + "id")))
+            elif elem.get("name") == "_xlnm.Print_Area" and elem.get("localSheetId") is not None:
+                print_areas[int(elem.get("localSheetId"))] = elem.text or ""
+
+    targets = {}
+    with zf.open("xl/_rels/workbook.xml.rels") as part:
+        for _, elem in iterparse(part, events=("end",)):
+            if elem.tag == _PKG_REL_NS + "Relationship":
+                targets[elem.get("Id")] = elem.get("Target")
+
+    name, rel_id = sheets[active]
+    target = targets[rel_id]
+    path = target.lstrip("/") if target.startswith("/") else posixpath.normpath(posixpath.join("xl", target))
+    area = print_areas.get(active, "")
+    # "'Sheet 1'!$A$1:$D$50" -> "A1:D50"
+    area = area.rsplit("!", 1)[-1].replace("$", "") or None
+    return name, path, area
+
+
+def _shared_strings(zf):
+    if "xl/sharedStrings.xml" not in zf.namelist():
+        return []
+    strings = []
+    with zf.open("xl/sharedStrings.xml") as part:
+        for _, elem in _iter_end(part, "si"):
+            strings.append("".join(t.text or "" for t in elem.iter(_NS + "t")))
+    return strings
+
+
+def _styles(zf):
+    """Per cell style index: {"border": {"left": "thick", ...}, "fill": "FFFFFFFF" or None}."""
+    info = zf.getinfo("xl/styles.xml")
+    key = (info.CRC, info.file_size)
+    cached = _style_cache.get(key)
+    if cached is None:
+        with zf.open(info) as part:
+            cached = _parse_styles(part)
+        if len(_style_cache) >= _STYLE_CACHE_SIZE:
+            _style_cache.pop(next(iter(_style_cache)))
+        _style_cache[key] = cached
+    return cached
+
+
+def _parse_styles(part):
+    borders, fills, xfs = [], [], []
+    in_cell_xfs = False
+    for event, elem in iterparse(part, events=("start", "end")):
+        if elem.tag == _NS + "cellXfs":
+            in_cell_xfs = event == "start"
+        elif event != "end":
+            continue
+        elif elem.tag == _NS + "border":
+            borders.append({side: child.get("style") for side in ("left", "right", "top", "bottom")
+                            for child in [elem.find(_NS + side)] if child is not None and child.get("style")})
+            elem.clear()
+        elif elem.tag == _NS + "fill":
+            pattern = elem.find(_NS + "patternFill")
+            color = pattern.find(_NS + "fgColor") if pattern is not None else None
+            solid = pattern is not None and pattern.get("patternType") not in (None, "none")
+            fills.append(color.get("rgb") if solid and color is not None else None)
+            elem.clear()
+        elif elem.tag == _NS + "xf" and in_cell_xfs:
+            border, fill = int(elem.get("borderId", 0)), int(elem.get("fillId", 0))
+            xfs.append({"border": borders[border] if border < len(borders) else {},
+                        "fill": fills[fill] if fill < len(fills) else None})
+    return xfs
+
+
+def read_certificate(content: bytes):
+    """
+    The parts of a generated certificate's active sheet that its layout checks need, read
+    straight from the xlsx XML with a streaming parser (no openpyxl workbook is built):
+    cell values and style ids, hidden rows, merged ranges, print area and fit-to-page.
+    """
+    with zipfile.ZipFile(io.BytesIO(content)) as zf:
+        name, path, print_area = _active_sheet(zf)
+        strings = _shared_strings(zf)
+        styles = _styles(zf)
+
+        cells, hidden_rows, merges = {}, set(), set()
+        page = {"fit_to_page": False, "fit_to_width": None, "fit_to_height": None}
+        with zf.open(path) as part:
+            for tag, elem in _iter_end(part, "c", "row", "mergeCell", "pageSetUpPr", "pageSetup"):
+                if tag == "c":
+                    kind = elem.get("t")
+                    v = elem.find(_NS + "v")
+                    if kind == "inlineStr":
+                        value = "".join(t.text or "" for t in elem.iter(_NS + "t"))
+                    elif v is None or v.text is None:
+                        value = None
+                    elif kind == "s":
+                        value = strings[int(v.text)]
+                    else:
+                        value = v.text
+                    cells[_cell_index(elem.get("r"))] = (value, int(elem.get("s", 0)))
+                elif tag == "row":
+                    if elem.get("hidden") in ("1", "true"):
+                        hidden_rows.add(int(elem.get("r")))
+                elif tag == "mergeCell":
+                    merges.add(_range(elem.get("ref")))
+                elif tag == "pageSetUpPr":
+                    page["fit_to_page"] = elem.get("fitToPage") in ("1", "true")
+                else:
+                    for key, attr in (("fit_to_width", "fitToWidth"), ("fit_to_height", "fitToHeight")):
+                        # Both default to 1 when the attribute is absent
+                        page[key] = int(elem.get(attr, 1))
+
+    return {"sheet": name, "print_area": print_area, **page, "cells": cells,
+            "hidden_rows": hidden_rows, "merges": merges, "styles": styles}
+
+
+def cell_value(sheet: dict, row: int, col: int):
+    """Value of a cell as stored in the sheet XML (text; numbers unconverted), or None."""
+    entry = sheet["cells"].get((row, col))
+    return entry[0] if entry else None
+
+
+def _cell_style(sheet: dict, row: int, col: int):
+    entry = sheet["cells"].get((row, col))
+    styles = sheet["styles"]
+    style = entry[1] if entry else 0
+    return styles[style] if style < len(styles) else {"border": {}, "fill": None}
+
+
+def cell_border(sheet: dict, row: int, col: int):
+    """Styled sides of a cell's border: {"left": "thick", "top": "thin", ...}."""
+    return _cell_style(sheet, row, col)["border"]
+
+
+def cell_fill(sheet: dict, row: int, col: int):
+    """ARGB colour of a cell's pattern fill ("FFFFFFFF"), or None when it has none."""
+    return _cell_style(sheet, row, col)["fill"]
+
+
+def verify_certificate(content, layout: dict, data: dict = None, required_merges=()):
+    """
+    Checks the layout invariants of a certificate the ExcelGenerator filled in from
+    `layout` (template_layout.get_layout):
+    - print area A1:D50, fit to one page wide,
+    - nothing written or merged right of column D,
+    - in the chemistry block, exactly the empty rows are hidden (with `data`: exactly
+      the rows of its chemistry items are shown),
+    - observations merged across C:D on the mechanical rows in use,
+    - the thick frame around A1:D50, and every range of `required_merges` ("A2:B2").
+    `content` is the xlsx bytes or what read_certificate returned for them. Returns a list
+    of error messages (empty when the certificate is fine).
+    """
+    sheet = read_certificate(content) if isinstance(content, (bytes, bytearray)) else content
+    errors = []
+
+    if sheet["print_area"] != PRINT_AREA:
+        errors.append(f"Print area is {sheet['print_area']}, expected {PRINT_AREA}")
+    if not sheet["fit_to_page"]:
+        errors.append("Fit to page is not set")
+    if sheet["fit_to_width"] != 1:
+        errors.append(f"Fit to width is {sheet['fit_to_width']}, expected 1 page")
+
+    for (row, col), (value, _) in sorted(sheet["cells"].items()):
+        if col > LAST_COLUMN and value not in (None, ""):
+            errors.append(f"Cell right of column D is not empty at row {row}, column {col}: {value}")
+    for merge in sorted(sheet["merges"]):
+        if merge[3] > LAST_COLUMN:
+            errors.append(f"Merged range crosses column D: rows {merge[0]}-{merge[2]}, columns {merge[1]}-{merge[3]}")
+    for ref in required_merges:
+        if _range(ref) not in sheet["merges"]:
+            errors.append(f"Missing merged range {ref}")
+
+    chem_first, chem_last = layout["chem_rows"]
+    expected_rows = None
+    if data is not None:
+        element_rows = {ELEMENT_SYMBOLS[name]: row for name, row in layout["elements"].items()}
+        expected_rows = {element_rows.get(element_symbol(item.get("Element", "")))
+                         for item in data.get("chemistry", [])} - {None}
+    for row in range(chem_first, chem_last + 1):
+        hidden = row in sheet["hidden_rows"]
+        filled = any(cell_value(sheet, row, col) not in (None, "") for col in range(1, LAST_COLUMN + 1))
+        if hidden and filled:
+            errors.append(f"Chemistry row {row} is hidden but has content")
+        elif not hidden and not filled:
+            errors.append(f"Chemistry row {row} is empty but not hidden")
+        if expected_rows is not None and hidden == (row in expected_rows):
+            errors.append(f"Chemistry row {row} should be {'shown' if row in expected_rows else 'hidden'}")
+
+    mech_rows = layout["mechanical_rows"]
+    if data is not None:
+        mech_rows = mech_rows[:len(data.get("mechanical", []))]
+    for row in mech_rows:
+        if (row, 3, row, 4) not in sheet["merges"]:
+            errors.append(f"Mechanical row {row} is not merged across C:D")
+
+    for row in range(1, FRAME_ROWS + 1):
+        if cell_border(sheet, row, 1).get("left") != "thick":
+            errors.append(f"Thick left border missing at A{row}")
+        if cell_border(sheet, row, LAST_COLUMN).get("right") != "thick":
+            errors.append(f"Thick right border missing at D{row}")
+    for col in range(1, LAST_COLUMN + 1):
+        letter = "ABCD"[col - 1]
+        if cell_border(sheet, 1, col).get("top") != "thick":
+            errors.append(f"Thick top border missing at {letter}1")
+        if cell_border(sheet, FRAME_ROWS, col).get("bottom") != "thick":
+            errors.append(f"Thick bottom border missing at {letter}{FRAME_ROWS}")
+    return errors
@@ -1,14 +1,27 @@
-from fastapi import FastAPI, UploadFile, File, HTTPException, Body
+from fastapi import FastAPI, UploadFile, File, HTTPException, Body, Request
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import StreamingResponse
+from fastapi.responses import StreamingResponse, Response, JSONResponse, HTMLResponse
 import os
 import json
+import asyncio
 import io
-import pandas as pd
+import gzip
+import hashlib
+import datetime
+import importlib.util
+import tempfile
+import uuid
+import time
 from typing import List, Dict, Any
 
-from core.excel_processor import ExcelProcessor
-from core.excel_generator import ExcelGenerator
+# pandas/openpyxl-backed modules (core.excel_processor, core.excel_generator) are
+# imported on first use or during warm-up to keep cold start fast
+from core.json_store import JsonStore
+from core.session_store import SessionStore
+from core.certificate_store import CertificateStore
+from core.shared_cache import SharedCache
+from core.utils import hash_file, file_lock
+from core.request_metrics import RequestMetrics
 
 app = FastAPI(title="MTC Report API")
 
@@ -18,6 +31,7 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["X-Certificate-Id", "X-Changed-Fields"],
 )
 
 # Resolve paths relative to the project root (where the .bat is run from)
@@ -25,37 +39,225 @@ ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
 SETTINGS_FILE = os.path.join(ROOT_DIR, "settings.json")
 FORMATS_FILE = os.path.join(ROOT_DIR, "report_formats.json")
 GRADE_MASTER_FILE = os.path.join(ROOT_DIR, "grade_master.json")
-processor = ExcelProcessor()
+# Cache directory shared by all worker processes (parsed uploads, sessions)
+CACHE_DIR = os.environ.get("MTC_CACHE_DIR", os.path.join(ROOT_DIR, ".mtc_cache"))
+shared_cache = SharedCache(CACHE_DIR, max_bytes=int(float(os.environ.get("MTC_CACHE_MB", "512")) * 1024 * 1024))
+# Persistent analytics data (SPC aggregates, ...)
+DATA_DIR = os.environ.get("MTC_DATA_DIR", os.path.join(ROOT_DIR, "data"))
+_processor = None
+_spc = None
+_spectro_store = None
+_history = None
+certificates = CertificateStore(max_items=int(os.environ.get("MTC_MAX_CERTIFICATES", "16")), shared=shared_cache)
+sessions = SessionStore(max_sessions=int(os.environ.get("MTC_MAX_SESSIONS", "8")), shared=shared_cache)
+# MTC_TRACK_MEMORY=1 records each request's peak memory (tracemalloc adds some overhead)
+metrics = RequestMetrics(track_memory=os.environ.get("MTC_TRACK_MEMORY", "0") == "1")
+
+DEFAULT_SETTINGS = {
+    "chem_title": "1. Chemical composition",
+    "mech_title": "2. Mechanical Properties",
+    "micro_title": "3. Microstructure",
+    "matrix_title": "3.1 Matrix",
+    "header_align": "center",
+    "header_fill_color": "#d9e1f2",
+    "border_style": "thin",
+    "font_family": "Calibri",
+    "font_size": 10
+}
+
+# In-process caches: files are only re-parsed when they change on disk
+settings_store = JsonStore(SETTINGS_FILE, default=DEFAULT_SETTINGS)
+formats_store = JsonStore(FORMATS_FILE)
+grade_master_store = JsonStore(GRADE_MASTER_FILE)
+
+# Upload limit for /api/analyze (MB); enforced from Content-Length before the body is read
+MAX_UPLOAD_MB = float(os.environ.get("MTC_MAX_UPLOAD_MB", "200"))
+MAX_UPLOAD_BYTES = int(MAX_UPLOAD_MB * 1024 * 1024)
+# Server-side folders /api/analyze-path may read from (separated by os.pathsep)
+SHARED_DIRS = [d for d in os.environ.get("MTC_SHARED_DIRS", "").split(os.pathsep) if d]
+# Processes parsing the files of a multi-file /api/analyze in parallel
+PARSE_WORKERS = int(os.environ.get("MTC_PARSE_WORKERS", str(min(4, os.cpu_count() or 1))))
+_parse_pool = None
+# Folder the spectrometer exports into (else settings["watch_dir"]); new files are ingested automatically
+WATCH_DIR = os.environ.get("MTC_WATCH_DIR", "")
+WATCH_INTERVAL = float(os.environ.get("MTC_WATCH_INTERVAL", "5"))
+WATCH_SETTLE = float(os.environ.get("MTC_WATCH_SETTLE", "10"))
+_watcher = None
+
+# MTC_WARMUP=1 pre-loads engines, template and grade master before the server reports ready
+WARMUP = os.environ.get("MTC_WARMUP", "0") == "1"
+_warm = {"done": False}
+
+# Raw template bytes keyed by path -> (mtime/size stamp, bytes)
+_template_cache = {}
+
+# Pre-serialized /api/bootstrap bodies keyed by the versions of the backing files
+_bootstrap_cache = {}
+
+# ValueFormatter for the current settings: (settings version, formatter)
+_formatter = (None, None)
+
+def get_processor():
+    """The processor pulls in pandas, so it is created on first use (or during warm-up)."""
+    global _processor
+    if _processor is None:
+        from core.excel_processor import ExcelProcessor
+        _processor = ExcelProcessor()
+    return _processor
+
+def get_value_formatter():
+    """The ValueFormatter for the saved settings' value_format, rebuilt when the settings change."""
+    global _formatter
+    version = settings_store.version
+    if _formatter[0] != version or _formatter[1] is None:
+        from core.value_format import ValueFormatter
+        _formatter = (version, ValueFormatter(settings_store.load()))
+    return _formatter[1]
+
+def get_parse_pool():
+    global _parse_pool
+    if _parse_pool is None:
+        from concurrent.futures import ProcessPoolExecutor
+        _parse_pool = ProcessPoolExecutor(max_workers=PARSE_WORKERS)
+    return _parse_pool
+
+def get_spc():
+    global _spc
+    if _spc is None:
+        from core.spc import SpcTracker
+        os.makedirs(DATA_DIR, exist_ok=True)
+        _spc = SpcTracker(os.path.join(DATA_DIR, "spc_aggregates.json"), get_processor())
+    return _spc
+
+def get_spectro_store():
+    global _spectro_store
+    if _spectro_store is None:
+        from core.spectro_store import SpectroStore
+        _spectro_store = SpectroStore(os.path.join(DATA_DIR, "spectro"), get_processor())
+    return _spectro_store
+
+def get_history():
+    global _history
+    if _history is None:
+        from core.certificate_history import CertificateHistory
+        _history = CertificateHistory(os.path.join(DATA_DIR, "certificates.sqlite3"))
+    return _history
+
+def record_certificate(cert_id: str, data: dict, output: bytes = None, template_hash: str = None):
+    """Archives an issued certificate (payload and, when given, the file as downloaded)."""
+    try:
+        get_history().record(cert_id, data, output=output, template_hash=template_hash)
+    except Exception as e:
+        print(f"WARNING: Could not record certificate {cert_id}: {e}")
+
+def resolve_template_path(settings: dict):
+    template_name = settings.get("mtc_template_path", "Final correct.xlsx")
+
+    # Robust path resolution:
+    # 1. Try absolute path as provided
+    # 2. Try as relative path to ROOT_DIR
+    # 3. Try just the filename (handling both / and \ slashes for cloud/local compatibility)
+
+    filename = template_name.replace('\\', '/').split('/')[-1]
+
+    possible_paths = [
+        template_name,
+        os.path.join(ROOT_DIR, template_name),
+        os.path.join(ROOT_DIR, filename)
+    ]
+
+    for p in possible_paths:
+        if p and os.path.exists(p) and os.path.isfile(p):
+            return p
+
+    raise FileNotFoundError(f"Template file not found. Tried: {possible_paths}")
+
+def load_template_bytes(path: str):
+    """Template file contents, re-read only when the file changes."""
+    st = os.stat(path)
+    stamp = (st.st_mtime_ns, st.st_size)
+    cached = _template_cache.get(path)
+    if cached is None or cached[0] != stamp:
+        with open(path, "rb") as f:
+            cached = (stamp, f.read())
+        _template_cache[path] = cached
+    return cached[1]
+
+@app.on_event("startup")
+def warm_up():
+    if not WARMUP:
+        return
+    get_processor()
+    import core.excel_generator  # noqa: F401 (loads openpyxl)
+    settings = settings_store.load()
+    formats_store.load()
+    grade_master_store.load()
+    try:
+        from core.template_layout import get_layout
+        get_layout(load_template_bytes(resolve_template_path(settings)), shared=shared_cache)
+    except FileNotFoundError as e:
+        print(f"WARNING: Warm-up could not pre-load the MTC template: {e}")
+    _warm["done"] = True
+
+@app.on_event("startup")
+def start_watcher():
+    global _watcher
+    directory = WATCH_DIR or settings_store.load().get("watch_dir")
+    if not directory:
+        return
+    if not os.path.isdir(directory):
+        print(f"WARNING: Watch folder {directory} not found; it is re-checked on every scan")
+    from core.folder_watcher import FolderWatcher
+    _watcher = FolderWatcher(directory, ingest_watched, interval=WATCH_INTERVAL, settle_seconds=WATCH_SETTLE)
+    _watcher.start()
+
+@app.on_event("shutdown")
+def shut_down_parse_pool():
+    if _watcher is not None:
+        _watcher.stop()
+    if _parse_pool is not None:
+        _parse_pool.shutdown(cancel_futures=True)
+
+@app.middleware("http")
+async def limit_upload_size(request: Request, call_next):
+    # Reject oversized uploads before FastAPI spools the multipart body
+    if request.url.path.startswith("/api/analyze"):
+        length = request.headers.get("content-length")
+        if length and length.isdigit() and int(length) > MAX_UPLOAD_BYTES:
+            return JSONResponse(status_code=413, content={"detail": f"File exceeds the {MAX_UPLOAD_MB:g} MB upload limit"})
+    return await call_next(request)
+
+@app.middleware("http")
+async def record_metrics(request: Request, call_next):
+    snapshot = metrics.start()
+    start = time.perf_counter()
+    status = 500
+    try:
+        response = await call_next(request)
+        status = response.status_code
+        return response
+    finally:
+        # Route templates ("/api/certificates/{cert_id}") keep the endpoint list bounded
+        route = request.scope.get("route")
+        metrics.finish(getattr(route, "path", "unmatched"), time.perf_counter() - start, status, snapshot)
+
+@app.get("/api/metrics")
+async def get_metrics():
+    """Request counts, latency and (with MTC_TRACK_MEMORY=1) peak memory per endpoint for this worker."""
+    return metrics.snapshot()
 
 @app.get("/api/settings")
 async def get_settings():
-    if os.path.exists(SETTINGS_FILE):
-        with open(SETTINGS_FILE, "r") as f:
-            return json.load(f)
-    return {
-        "chem_title": "1. Chemical composition",
-        "mech_title": "2. Mechanical Properties",
-        "micro_title": "3. Microstructure",
-        "matrix_title": "3.1 Matrix",
-        "header_align": "center",
-        "header_fill_color": "#d9e1f2",
-        "border_style": "thin",
-        "font_family": "Calibri",
-        "font_size": 10
-    }
+    return settings_store.load()
 
 @app.post("/api/settings")
 async def update_settings(settings: dict):
-    with open(SETTINGS_FILE, "w") as f:
-        json.dump(settings, f, indent=4)
+    settings_store.save(settings)
     return {"status": "success"}
 
 @app.get("/api/formats")
 async def get_formats():
-    if os.path.exists(FORMATS_FILE):
-        with open(FORMATS_FILE, "r") as f:
-            return json.load(f)
-    return {}
+    return formats_store.load()
 
 @app.post("/api/formats")
 async def save_format(payload: dict):
@@ -64,19 +266,12 @@ async def save_format(payload: dict):
     if not name:
         raise HTTPException(status_code=400, detail="Format name is required")
     
-    formats = await get_formats()
-    formats[name] = cols
-    with open(FORMATS_FILE, "w") as f:
-        json.dump(formats, f, indent=4)
+    formats_store.update(lambda formats: formats.__setitem__(name, cols))
     return {"status": "success"}
 
 @app.delete("/api/formats/{name}")
 async def delete_format(name: str):
-    formats = await get_formats()
-    if name in formats:
-        del formats[name]
-        with open(FORMATS_FILE, "w") as f:
-            json.dump(formats, f, indent=4)
+    formats_store.update(lambda formats: formats.pop(name, None))
     # Return success even if not found to handle stale frontend states gracefully
     return {"status": "success"}
 
@@ -86,34 +281,32 @@ async def rename_format(name: str, payload: dict):
     if not new_name:
         raise HTTPException(status_code=400, detail="New name is required")
     
-    formats = await get_formats()
-    if name in formats:
-        cols = formats.pop(name)
-        formats[new_name] = cols
-        with open(FORMATS_FILE, "w") as f:
-            json.dump(formats, f, indent=4)
-        return {"status": "success"}
-    raise HTTPException(status_code=404, detail="Format not found")
+    def rename(formats):
+        if name not in formats:
+            raise HTTPException(status_code=404, detail="Format not found")
+        formats[new_name] = formats.pop(name)
+
+    formats_store.update(rename)
+    return {"status": "success"}
 
 @app.get("/api/grade-master")
 async def get_grade_master():
-    if os.path.exists(GRADE_MASTER_FILE):
-        with open(GRADE_MASTER_FILE, "r") as f:
-            data = json.load(f)
-            # Migration: If it's the old format (list per grade), wrap it
-            migrated = False
-            for grade in data:
-                if isinstance(data[grade], list):
-                    data[grade] = {
-                        "chemistry": data[grade],
-                        "mechanical": []
-                    }
-                    migrated = True
-            if migrated:
-                with open(GRADE_MASTER_FILE, "w") as fw:
-                    json.dump(data, fw, indent=4)
-            return data
-    return {}
+    data = grade_master_store.load()
+    if migrate_grade_master(data):
+        grade_master_store.update(migrate_grade_master)
+    return data
+
+def migrate_grade_master(data: dict):
+    # Migration: If it's the old format (list per grade), wrap it
+    migrated = False
+    for grade in data:
+        if isinstance(data[grade], list):
+            data[grade] = {
+                "chemistry": data[grade],
+                "mechanical": []
+            }
+            migrated = True
+    return migrated
 
 @app.post("/api/grade-master")
 async def save_grade_specs(payload: dict):
@@ -123,63 +316,604 @@ async def save_grade_specs(payload: dict):
     if not grade:
         raise HTTPException(status_code=400, detail="Grade name is required")
     
-    master = await get_grade_master()
-    master[grade] = specs
-    with open(GRADE_MASTER_FILE, "w") as f:
-        json.dump(master, f, indent=4)
+    def save(master):
+        migrate_grade_master(master)
+        master[grade] = specs
+
+    grade_master_store.update(save)
     return {"status": "success"}
 
 @app.delete("/api/grade-master/{grade}")
 async def delete_grade_master_entry(grade: str):
-    master = await get_grade_master()
-    if grade in master:
-        del master[grade]
-        with open(GRADE_MASTER_FILE, "w") as f:
-            json.dump(master, f, indent=4)
+    grade_master_store.update(lambda master: master.pop(grade, None))
     return {"status": "success"}
 
+def compile_grade_specs(master: dict):
+    """
+    Flattens the grade master into lookup tables keyed by the trimmed, upper-cased
+    Element/Parameter name (the same normalisation the Dashboard uses when applying specs).
+    """
+    compiled = {}
+    for grade, entry in master.items():
+        compiled[grade.strip()] = {
+            "chemistry": {
+                (c.get("Element") or "").strip().upper(): c.get("Spec", "")
+                for c in entry.get("chemistry", []) if c.get("Element")
+            },
+            "mechanical": {
+                (m.get("Parameter") or "").strip().upper(): m.get("Spec", "")
+                for m in entry.get("mechanical", []) if m.get("Parameter")
+            }
+        }
+    return compiled
+
+def get_capabilities():
+    engines = {
+        "xlsx": importlib.util.find_spec("openpyxl") is not None,
+        "xls": importlib.util.find_spec("xlrd") is not None,
+        "xlsb": importlib.util.find_spec("pyxlsb") is not None,
+        "csv": True
+    }
+    return {"engines": engines, "gzip": True}
+
+@app.get("/api/bootstrap")
+async def bootstrap(request: Request, compiled: bool = False):
+    """
+    Everything the Dashboard needs at startup in one round trip.
+    The JSON body is built and gzipped once per change of the underlying files.
+    """
+    master = await get_grade_master()
+    key = (settings_store.version, formats_store.version, grade_master_store.version, compiled)
+    cached = _bootstrap_cache.get(key)
+    if cached is None:
+        body = {
+            "settings": settings_store.load(),
+            "formats": formats_store.load(),
+            "grade_master": master,
+            "capabilities": get_capabilities(),
+            # Per-element precision the drafts use, so the Dashboard formats raw values the same way
+            "value_format": get_value_formatter().rules()
+        }
+        if compiled:
+            body["compiled_specs"] = compile_grade_specs(master)
+        raw = json.dumps(body).encode("utf-8")
+        cached = {
+            "etag": '"' + hashlib.sha1(raw).hexdigest() + '"',
+            "raw": raw,
+            "gzip": gzip.compress(raw, compresslevel=6)
+        }
+        _bootstrap_cache.clear()
+        _bootstrap_cache[key] = cached
+
+    headers = {"ETag": cached["etag"], "Cache-Control": "no-cache", "Vary": "Accept-Encoding"}
+    if request.headers.get("if-none-match") == cached["etag"]:
+        return Response(status_code=304, headers=headers)
+    if "gzip" in request.headers.get("accept-encoding", ""):
+        headers["Content-Encoding"] = "gzip"
+        return Response(content=cached["gzip"], media_type="application/json", headers=headers)
+    return Response(content=cached["raw"], media_type="application/json", headers=headers)
+
+def analyze_source(source, name: str, with_facets: bool, with_drafts: bool = False):
+    """
+    Parses a spectro file (path or file object) and opens a session for it.
+    Parsed frames are dtype-compacted and cached by content hash in the shared cache,
+    so re-analysing the same export on any worker skips the Excel parse.
+    """
+    processor = get_processor()
+    file_hash = hash_file(source)
+    df = shared_cache.get(f"frame:{file_hash}")
+    if df is None:
+        df = cache_frame(file_hash, processor.load_spectro_frame(source))
+    ingest_history(df, file_hash, name)
+    result = processor.build_report(df, with_facets=with_facets, with_drafts=with_drafts, with_data=False,
+                                    formatter=get_value_formatter() if with_drafts else None)
+    result["memory"] = shared_cache.get(f"frame-memory:{file_hash}")
+    result["session_id"] = sessions.create(df, source=name, facets=result.get("facets"), drafts=result.get("drafts"))
+    return report_response(result, df)
+
+def cache_frame(file_hash: str, df):
+    """Compacts a freshly parsed frame and caches it (with its memory report) by content hash."""
+    from core.dtypes import compact_frame
+    df, memory = compact_frame(df)
+    shared_cache.set(f"frame:{file_hash}", df)
+    shared_cache.set(f"frame-memory:{file_hash}", memory)
+    return df
+
+async def analyze_sources(uploads, with_facets: bool, with_drafts: bool):
+    """
+    Several spectro files ([(name, file object)...]) as one session: files not in the
+    parse cache are parsed concurrently in the process pool, then the frames are aligned,
+    merged with a `source_file` column and de-duplicated (ExcelProcessor.merge_frames).
+    """
+    from core.dtypes import compact_frame
+    from core.excel_processor import load_frame
+    processor = get_processor()
+
+    entries = {}
+    for name, file_obj in uploads:
+        # The same file uploaded twice is parsed (and merged) once
+        entries.setdefault(hash_file(file_obj), (name, file_obj))
+    frames = {h: shared_cache.get(f"frame:{h}") for h in entries}
+
+    missing = [h for h, df in frames.items() if df is None]
+    loop = asyncio.get_running_loop()
+    pool = get_parse_pool()
+    parsed = await asyncio.gather(
+        *(loop.run_in_executor(pool, load_frame, entries[h][1].read()) for h in missing),
+        return_exceptions=True
+    )
+    for h, df in zip(missing, parsed):
+        if isinstance(df, BaseException):
+            raise Exception(f"{entries[h][0]}: {df}")
+        frames[h] = cache_frame(h, df)
+
+    for h, (name, _) in entries.items():
+        ingest_history(frames[h], h, name)
+
+    df, duplicates = processor.merge_frames([(entries[h][0], frames[h]) for h in entries])
+    df, memory = compact_frame(df)
+    result = processor.build_report(df, with_facets=with_facets, with_drafts=with_drafts, with_data=False,
+                                    formatter=get_value_formatter() if with_drafts else None)
+    result["memory"] = memory
+    result["files"] = [{"name": entries[h][0], "rows": len(frames[h])} for h in entries]
+    result["duplicates_removed"] = duplicates
+    source = " + ".join(name for name, _ in entries.values())
+    result["session_id"] = sessions.create(df, source=source, facets=result.get("facets"), drafts=result.get("drafts"))
+    return report_response(result, df)
+
+def report_response(result: dict, df):
+    """JSON response for a report payload, with the rows encoded straight from the frame (no jsonable_encoder)."""
+    from core.frame_json import report_body
+    return Response(report_body(result, df), media_type="application/json")
+
+def ingest_history(df, file_hash: str, name: str):
+    """Adds a newly seen spectro file (once per content hash) to the day-partitioned store and the SPC aggregates."""
+    for label, target in (("spectro store", get_spectro_store), ("SPC", get_spc)):
+        try:
+            store = target()
+            if not store.has_file(file_hash):
+                store.ingest(df, file_hash, source=name)
+        except Exception as e:
+            print(f"WARNING: {label} ingest failed for {name}: {e}")
+
+def ingest_watched(path: str, name: str, file_hash: str):
+    """
+    FolderWatcher callback: parses a settled export into the frame cache, the day store and
+    the SPC aggregates. Returns its row count, or None if both stores already have it.
+    """
+    store, spc = get_spectro_store(), get_spc()
+    # Every worker watches the folder; the lock lets only one of them parse a new file
+    with file_lock(os.path.join(store.directory, "watch")):
+        if store.has_file(file_hash) and spc.has_file(file_hash):
+            return None
+        df = shared_cache.get(f"frame:{file_hash}")
+        if df is None:
+            df = cache_frame(file_hash, get_processor().load_spectro_frame(path))
+        ingest_history(df, file_hash, name)
+        return len(df)
+
+@app.get("/api/watch/status")
+async def watch_status():
+    """Watched export folder: last scan and the state of each file (pending, ingested, known, error)."""
+    if _watcher is None:
+        return {"directory": None, "running": False, "files": []}
+    return _watcher.status()
+
+@app.get("/api/watch/latest")
+async def analyze_latest_watched(with_facets: bool = False, with_drafts: bool = False):
+    """The newest ingested export of the watched folder as an analyze session (served from the parse cache)."""
+    path = _watcher.latest() if _watcher is not None else None
+    if path is None:
+        raise HTTPException(status_code=404, detail="No watched export has been ingested yet")
+    try:
+        return analyze_source(path, os.path.basename(path), with_facets, with_drafts)
+    except Exception as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
 @app.post("/api/analyze")
-async def analyze_report(file: UploadFile = File(...)):
+async def analyze_report(file: UploadFile = File(None), files: List[UploadFile] = File(None),
+                         with_facets: bool = False, with_drafts: bool = False):
+    """
+    Analyses one spectro file (`file`) or several (`files`, e.g. consecutive days), which
+    are merged into one session with a `source_file` column.
+    """
+    uploads = ([file] if file else []) + list(files or [])
+    if not uploads:
+        raise HTTPException(status_code=400, detail="No file uploaded")
+    try:
+        for upload in uploads:
+            size = upload.size
+            if size is None:
+                upload.file.seek(0, os.SEEK_END)
+                size = upload.file.tell()
+                upload.file.seek(0)
+            if size > MAX_UPLOAD_BYTES:
+                raise HTTPException(status_code=413, detail=f"{upload.filename} exceeds the {MAX_UPLOAD_MB:g} MB upload limit")
+        try:
+            if len(uploads) == 1:
+                # Parse straight from the spooled upload instead of copying it into memory
+                return analyze_source(uploads[0].file, uploads[0].filename, with_facets, with_drafts)
+            return await analyze_sources([(u.filename, u.file) for u in uploads], with_facets, with_drafts)
+        except Exception as e:
+            raise HTTPException(status_code=400, detail=str(e))
+    finally:
+        for upload in uploads:
+            await upload.close()
+
+def resolve_shared_path(path: str):
+    """Resolves `path` and makes sure it lies inside one of the configured shared folders."""
+    if not SHARED_DIRS:
+        raise HTTPException(status_code=403, detail="No shared folders configured (set MTC_SHARED_DIRS)")
+    real = os.path.realpath(path)
+    for root in SHARED_DIRS:
+        root = os.path.realpath(root)
+        try:
+            if os.path.commonpath([real, root]) == root:
+                return real
+        except ValueError:
+            # Different drives on Windows
+            continue
+    raise HTTPException(status_code=403, detail="Path is outside the shared folders")
+
+@app.post("/api/analyze-path")
+async def analyze_path(payload: dict, with_facets: bool = False, with_drafts: bool = False):
+    """Parses a spectro export that already sits on the shared drive, without uploading it."""
+    path = payload.get("path")
+    if not path:
+        raise HTTPException(status_code=400, detail="Path is required")
+    real = resolve_shared_path(path)
+    if not os.path.isfile(real):
+        raise HTTPException(status_code=404, detail="File not found")
+    if os.path.getsize(real) > MAX_UPLOAD_BYTES:
+        raise HTTPException(status_code=413, detail=f"File exceeds the {MAX_UPLOAD_MB:g} MB upload limit")
     try:
-        content = await file.read()
-        result = processor.parse_spectro_report(content)
-        return result
+        return analyze_source(real, real, with_facets, with_drafts)
     except Exception as e:
         raise HTTPException(status_code=400, detail=str(e))
 
+def get_session(session_id: str):
+    entry = sessions.get(session_id)
+    if entry is None:
+        raise HTTPException(status_code=404, detail="Session expired or not found. Please re-upload the report.")
+    return entry
+
+@app.get("/api/facets")
+async def get_facets(session_id: str):
+    """Distinct values/counts per column for an analysed file (computed once per session)."""
+    entry = get_session(session_id)
+    if entry.get("facets") is None:
+        entry = sessions.update(session_id, facets=get_processor().build_facets(entry["df"]))
+    return entry["facets"]
+
+@app.get("/api/drafts")
+async def get_drafts(session_id: str, heat: str = None):
+    """Formatted certificate chemistry + detected grade per heat (computed once per session)."""
+    entry = get_session(session_id)
+    if entry.get("drafts") is None:
+        entry = sessions.update(session_id, drafts=get_processor().build_heat_drafts(entry["df"]))
+    if heat is None:
+        return entry["drafts"]
+    if heat not in entry["drafts"]:
+        raise HTTPException(status_code=404, detail=f"Heat {heat} not found in this report")
+    return entry["drafts"][heat]
+
+@app.get("/api/spectro/query")
+async def query_spectro(start: str = None, end: str = None, grade: str = None,
+                        include_undated: bool = False, with_facets: bool = False):
+    """
+    Rows from every ingested spectro file between start and end (YYYY-MM-DD, inclusive),
+    optionally for one grade. Only the matching day partitions are read. The result is
+    registered as a session, so facets/exports work on it like on an uploaded file.
+    """
+    for value in (start, end):
+        if value:
+            try:
+                datetime.date.fromisoformat(value)
+            except ValueError:
+                raise HTTPException(status_code=400, detail=f"Invalid date '{value}', expected YYYY-MM-DD")
+
+    df, partitions = get_spectro_store().query(start, end, grade, include_undated)
+    if df.empty:
+        return {"data": [], "columns": [], "heats": [], "partitions": partitions}
+    result = get_processor().build_report(df, with_facets=with_facets, with_data=False)
+    result["partitions"] = partitions
+    result["session_id"] = sessions.create(df, source=f"query:{start}..{end}", facets=result.get("facets"))
+    return report_response(result, df)
+
+def spec_limits_for(grade: str):
+    """{symbol: (lower, upper)} from the grade master's chemistry specs for `grade` (first spec per element)."""
+    from core.elements import element_symbol, parse_spec_limits
+    entry = grade_master_store.load().get(grade)
+    limits = {}
+    if isinstance(entry, dict):
+        for item in entry.get("chemistry", []):
+            symbol = element_symbol(item.get("Element"))
+            if symbol and symbol not in limits:
+                limits[symbol] = parse_spec_limits(item.get("Spec"))
+    return limits
+
+@app.get("/api/spc/grades")
+async def spc_grades():
+    return {"grades": get_spc().grades()}
+
+@app.get("/api/spc/trends")
+async def spc_trends(grade: str = "*", element: str = None, max_points: int = 52, window: int = 4,
+                     lsl: float = None, usl: float = None):
+    """
+    Mean, std, Cp/Cpk and downsampled weekly trends per element for a grade ("*" = all grades),
+    served from the running aggregates. Spec limits come from the grade master unless lsl/usl are given.
+    """
+    from core.elements import SYMBOLS, element_symbol
+    spc = get_spc()
+    symbols = SYMBOLS
+    if element:
+        symbol = element_symbol(element)
+        if not symbol:
+            raise HTTPException(status_code=400, detail=f"Unknown element: {element}")
+        symbols = [symbol]
+
+    # The grade master and the aggregates are each read once for all elements
+    specs = spec_limits_for(grade)
+    limits = {}
+    for symbol in symbols:
+        lower, upper = specs.get(symbol, (None, None))
+        limits[symbol] = (lsl if lsl is not None else lower, usl if usl is not None else upper)
+    trends = spc.trends(grade, symbols, limits, max_points=max_points, window=window)
+    if element and not trends:
+        raise HTTPException(status_code=404, detail="No data for this grade/element yet")
+    return trends[symbols[0]] if element else {"grade": grade, "elements": trends}
+
+XLSX_MEDIA_TYPE = "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"
+
+def fill_certificate(settings: dict, data: dict):
+    """Fills the configured template; returns (generator, workbook, layout, template hash)."""
+    from core.excel_generator import ExcelGenerator
+    from core.template_layout import fingerprint
+    template_bytes = load_template_bytes(resolve_template_path(settings))
+    generator = ExcelGenerator(settings, layout_cache=shared_cache)
+    wb, layout = generator.fill(template_bytes, data)
+    return generator, wb, layout, fingerprint(template_bytes)
+
+def certificate_response(content: bytes, cert_id: str, changed):
+    return Response(
+        content,
+        media_type=XLSX_MEDIA_TYPE,
+        headers={
+            "Content-Disposition": "attachment; filename=Generated_Report.xlsx",
+            "X-Certificate-Id": cert_id,
+            "X-Changed-Fields": ",".join(changed)
+        }
+    )
+
+@app.post("/api/certificates")
+async def create_certificate(payload: Dict[str, Any] = Body(...)):
+    """
+    Generates a certificate like /api/generate-excel and keeps the filled workbook,
+    so later edits can go through PATCH /api/certificates/{id}.
+    """
+    settings = payload.get("settings", {})
+    data = payload.get("data", {})
+    try:
+        generator, wb, layout, template_hash = fill_certificate(settings, data)
+        cert_id = certificates.create(wb, layout, settings, data, template_hash)
+        content = generator.serialize(wb)
+        record_certificate(cert_id, data, content, template_hash)
+        return certificate_response(content, cert_id, ["*"])
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+@app.patch("/api/certificates/{cert_id}")
+async def patch_certificate(cert_id: str, payload: Dict[str, Any] = Body(...)):
+    """
+    Applies only the changed top-level fields in `data` (e.g. {"invoice_no": "..."} or the
+    edited "chemistry" list) to the held workbook and returns the updated file. New settings,
+    a changed template or a certificate held by another worker fall back to a full fill.
+    """
+    entry = certificates.get(cert_id)
+    base = entry or certificates.payload(cert_id)
+    if base is None:
+        raise HTTPException(status_code=404, detail="Certificate expired or not found. Please generate it again.")
+
+    settings = payload.get("settings") or base["settings"]
+    data = {**base["data"], **payload.get("data", {})}
+    try:
+        from core.excel_generator import ExcelGenerator
+        from core.template_layout import fingerprint
+        template_hash = fingerprint(load_template_bytes(resolve_template_path(settings)))
+
+        changed = None
+        if entry is not None and settings == entry["settings"] and template_hash == entry["template_hash"]:
+            generator = ExcelGenerator(settings, layout_cache=shared_cache)
+            changed = generator.patch(entry["wb"], entry["layout"], entry["data"], data)
+            wb, layout = entry["wb"], entry["layout"]
+        if changed is None:
+            generator, wb, layout, template_hash = fill_certificate(settings, data)
+            changed = ["*"]
+
+        certificates.put(cert_id, wb, layout, settings, data, template_hash, created=base["created"])
+        content = generator.serialize(wb)
+        record_certificate(cert_id, data, content, template_hash)
+        return certificate_response(content, cert_id, changed)
+    except Exception as e:
+        # The held workbook may be half patched; the next request rebuilds it from the stored payload
+        certificates.discard(cert_id)
+        raise HTTPException(status_code=500, detail=str(e))
+
+@app.get("/api/certificates/search")
+def search_certificates(invoice: str = None, heat: str = None, grade: str = None,
+                        start: str = None, end: str = None, limit: int = 100):
+    """
+    Issued certificates from the archive, newest first: invoice and heat match by prefix
+    (either heat column), grade exactly, issue date between start and end (YYYY-MM-DD,
+    inclusive). Returns their ids, search fields and template hashes, not the payloads.
+    """
+    for value in (start, end):
+        if value:
+            try:
+                datetime.date.fromisoformat(value)
+            except ValueError:
+                raise HTTPException(status_code=400, detail=f"Invalid date '{value}', expected YYYY-MM-DD")
+    started = time.perf_counter()
+    results = get_history().search(invoice, heat, grade, start, end, limit=max(1, min(limit, 1000)))
+    return {"certificates": results, "elapsed_ms": round((time.perf_counter() - started) * 1000, 2)}
+
+@app.get("/api/certificates/{cert_id}")
+def get_archived_certificate(cert_id: str):
+    """An archived certificate's search fields and payload (`data`), e.g. to reissue it with edits."""
+    entry = get_history().get(cert_id)
+    if entry is None:
+        raise HTTPException(status_code=404, detail="Certificate not found")
+    return entry
+
+@app.get("/api/certificates/{cert_id}/file")
+def reprint_certificate(cert_id: str):
+    """The certificate file exactly as it was issued, served from the archive (nothing is regenerated)."""
+    content = get_history().output(cert_id)
+    if content is None:
+        raise HTTPException(status_code=404, detail="No archived file for this certificate")
+    return Response(
+        content,
+        media_type=XLSX_MEDIA_TYPE,
+        headers={
+            "Content-Disposition": "attachment; filename=Generated_Report.xlsx",
+            "X-Certificate-Id": cert_id
+        }
+    )
+
+@app.post("/api/print-batch")
+def print_batch(payload: Dict[str, Any] = Body(...)):
+    """
+    One printable HTML document for a stack of certificates, a page each: `certificates`
+    (data dicts as for /api/generate-excel) and/or `certificate_ids` of issued ones.
+    `auto_print` opens the browser's print dialog on load.
+    """
+    from core.print_renderer import PrintRenderer
+    from core.template_layout import get_layout
+
+    batch = list(payload.get("certificates") or [])
+    for cert_id in payload.get("certificate_ids") or []:
+        # Certificates no longer held by the workers are printed from the archive
+        entry = certificates.get(cert_id) or certificates.payload(cert_id) or get_history().get(cert_id)
+        if entry is None:
+            raise HTTPException(status_code=404, detail=f"Certificate {cert_id} not found")
+        batch.append(entry["data"])
+    if not batch:
+        raise HTTPException(status_code=400, detail="No certificates to print")
+
+    settings = payload.get("settings") or settings_store.load()
+    try:
+        # Customer/reference/part text of the configured template, for certificates that leave them blank
+        defaults = get_layout(load_template_bytes(resolve_template_path(settings)), shared=shared_cache)["defaults"]
+    except FileNotFoundError:
+        defaults = None
+    html = PrintRenderer(settings, defaults).render(batch, auto_print=bool(payload.get("auto_print")))
+    return HTMLResponse(html)
+
+@app.get("/api/register")
+def certificate_register(month: str, format: str = "xlsx", max_rows_per_sheet: int = None):
+    """
+    Register of every certificate issued in `month` (YYYY-MM): one row per heat with
+    invoice, grade, chemistry and mechanical values. xlsx has one sheet per grade
+    (split past max_rows_per_sheet); csv is a single streamed file.
+    """
+    try:
+        datetime.datetime.strptime(month, "%Y-%m")
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Month must be YYYY-MM")
+    from core import register_export
+
+    rows = get_history().register_rows(month)
+    if format == "csv":
+        return StreamingResponse(
+            register_export.iter_register_csv(rows),
+            media_type="text/csv",
+            headers={"Content-Disposition": f"attachment; filename=MTC_Register_{month}.csv"}
+        )
+    if format != "xlsx":
+        raise HTTPException(status_code=400, detail="Format must be xlsx or csv")
+
+    # The write-only workbook goes to a spooled temp file (on disk once it grows) and is streamed back
+    out = tempfile.SpooledTemporaryFile(max_size=8 * 1024 * 1024)
+    register_export.write_register_xlsx(rows, out, max_rows_per_sheet or register_export.MAX_ROWS_PER_SHEET)
+    out.seek(0)
+
+    def stream():
+        try:
+            while chunk := out.read(64 * 1024):
+                yield chunk
+        finally:
+            out.close()
+
+    return StreamingResponse(
+        stream(),
+        media_type=XLSX_MEDIA_TYPE,
+        headers={"Content-Disposition": f"attachment; filename=MTC_Register_{month}.xlsx"}
+    )
+
+@app.post("/api/export")
+def export_view(payload: Dict[str, Any] = Body(...)):
+    """
+    Downloads the Report Viewer grid as filtered on screen: `filters` ({column: [values]}),
+    the columns of saved format `format_name` (or an explicit `columns` list) and
+    `file_format` xlsx|csv. Only the selected rows/columns are read, chunk by chunk.
+    """
+    from core import grid_export
+
+    entry = get_session(payload.get("session_id", ""))
+    df = entry["df"]
+    file_format = payload.get("file_format", "xlsx")
+    if file_format not in ("xlsx", "csv"):
+        raise HTTPException(status_code=400, detail="Format must be xlsx or csv")
+
+    columns = payload.get("columns")
+    format_name = payload.get("format_name")
+    if format_name:
+        formats = formats_store.load()
+        if format_name not in formats:
+            raise HTTPException(status_code=404, detail=f"Format '{format_name}' not found")
+        columns = formats[format_name]
+    columns = grid_export.project_columns(df, columns)
+    mask = get_processor().filter_mask(df, payload.get("filters"))
+
+    filename = f"Report_{format_name or 'View'}".replace(" ", "_")
+    if file_format == "csv":
+        return StreamingResponse(
+            grid_export.iter_csv(df, mask, columns),
+            media_type="text/csv",
+            headers={"Content-Disposition": f"attachment; filename={filename}.csv"}
+        )
+
+    out = tempfile.SpooledTemporaryFile(max_size=8 * 1024 * 1024)
+    grid_export.write_xlsx(df, mask, columns, out)
+    out.seek(0)
+
+    def stream():
+        try:
+            while chunk := out.read(64 * 1024):
+                yield chunk
+        finally:
+            out.close()
+
+    return StreamingResponse(
+        stream(),
+        media_type=XLSX_MEDIA_TYPE,
+        headers={"Content-Disposition": f"attachment; filename={filename}.xlsx"}
+    )
+
 @app.post("/api/generate-excel")
 async def generate_excel(payload: Dict[str, Any] = Body(...)):
     try:
         settings = payload.get("settings", {})
         data_to_fill = payload.get("data", {})
         
-        # Resolve template path
-        template_name = settings.get("mtc_template_path", "Final correct.xlsx")
+        template_path = resolve_template_path(settings)
         
-        # Robust path resolution:
-        # 1. Try absolute path as provided
-        # 2. Try as relative path to ROOT_DIR
-        # 3. Try just the filename (handling both / and \ slashes for cloud/local compatibility)
-        
-        filename = template_name.replace('\\', '/').split('/')[-1]
-        
-        possible_paths = [
-            template_name,
-            os.path.join(ROOT_DIR, template_name),
-            os.path.join(ROOT_DIR, filename)
-        ]
-        
-        template_path = None
-        for p in possible_paths:
-            if p and os.path.exists(p) and os.path.isfile(p):
-                template_path = p
-                break
-        
-        if not template_path:
-             raise FileNotFoundError(f"Template file not found. Tried: {possible_paths}")
-        
-        generator = ExcelGenerator(settings)
-        excel_bytes = generator.generate(template_path, data_to_fill)
+        from core.excel_generator import ExcelGenerator
+        from core.template_layout import fingerprint
+        template_bytes = load_template_bytes(template_path)
+        generator = ExcelGenerator(settings, layout_cache=shared_cache)
+        excel_bytes = generator.generate(template_bytes, data_to_fill)
+        record_certificate(uuid.uuid4().hex, data_to_fill, excel_bytes, fingerprint(template_bytes))
         
         return StreamingResponse(
             io.BytesIO(excel_bytes),
@@ -189,10 +923,21 @@ async def generate_excel(payload: Dict[str, Any] = Body(...)):
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
+@app.get("/api/template-layout")
+async def template_layout():
+    """Rows/cells discovered from the configured MTC template's labels (cached per template content)."""
+    try:
+        template_bytes = load_template_bytes(resolve_template_path(settings_store.load()))
+    except FileNotFoundError as e:
+        raise HTTPException(status_code=404, detail=str(e))
+    from core.template_layout import get_layout
+    return get_layout(template_bytes, shared=shared_cache)
+
 @app.get("/api/health")
 async def health_check():
-    return {"status": "healthy"}
+    return {"status": "healthy", "warmed_up": _warm["done"]}
 
 if __name__ == "__main__":
     import uvicorn
-    uvicorn.run("main:app", host="0.0.0.0", port=8000, reload=True)
+    # Auto-reload doubles startup work; plant PCs can turn it off with MTC_RELOAD=0
+    uvicorn.run("main:app", host="0.0.0.0", port=8000, reload=os.environ.get("MTC_RELOAD", "1") == "1")
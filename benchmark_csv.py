@@ -0,0 +1,84 @@
+"""
+CSV spectro exports: the previous read (pd.read_csv with a comma, then a semicolon on
+error) against core.csv_reader (sniffed format, float64 element columns declared up
+front, pyarrow's multithreaded parser when installed).
+
+Writes synthetic exports in the two layouts the plant sees (comma/point and
+semicolon/decimal comma) and prints parse time and the columns each path found.
+
+Usage:
+    python benchmark_csv.py --rows 50000 200000 1000000
+"""
+import argparse
+import io
+import os
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+
+ROOT_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.join(ROOT_DIR, "backend"))
+
+from core.csv_reader import read_spectro_csv, csv_engine  # noqa: E402
+
+LAYOUTS = {"comma": {"sep": ",", "decimal": "."}, "semicolon": {"sep": ";", "decimal": ","}}
+
+
+def make_csv(rows: int, sep: str, decimal: str, seed: int = 0):
+    """Synthetic spectrometer CSV export (element columns as "C [%]", like the machine writes them)."""
+    rng = np.random.default_rng(seed)
+    df = pd.DataFrame({
+        "Date": pd.Timestamp("2026-01-01") + pd.to_timedelta(rng.integers(0, 30, rows), unit="D"),
+        "Heat No": [f"{h}A26-DISA" for h in rng.integers(100, 400, rows)],
+        "Sample Id": [f"S{i:07d}" for i in range(rows)],
+        "Grade": rng.choice(["FG260", "SG 500/7", "4512"], rows),
+    })
+    for symbol, mean, sd, decimals in [("C", 3.6, 0.15, 3), ("Si", 2.4, 0.2, 3), ("Mn", 0.3, 0.05, 3),
+                                       ("P", 0.03, 0.005, 4), ("S", 0.01, 0.002, 4), ("Cu", 0.5, 0.1, 3),
+                                       ("Ni", 0.02, 0.005, 4), ("Cr", 0.03, 0.005, 4), ("Mo", 0.01, 0.002, 4),
+                                       ("Mg", 0.045, 0.005, 4), ("Sn", 0.01, 0.002, 4)]:
+        df[f"{symbol} [%]"] = rng.normal(mean, sd, rows).round(decimals)
+    return df.to_csv(sep=sep, decimal=decimal, index=False).encode("utf-8")
+
+
+def previous_read(content: bytes):
+    try:
+        return pd.read_csv(io.BytesIO(content))
+    except Exception:
+        return pd.read_csv(io.BytesIO(content), sep=";")
+
+
+def timed(fn, content):
+    start = time.perf_counter()
+    df = fn(content)
+    return time.perf_counter() - start, df
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, nargs="+", default=[50000, 200000, 1000000])
+    args = parser.parse_args()
+
+    paths = [("previous", previous_read), ("sniffed/c", lambda b: read_spectro_csv(io.BytesIO(b), engine="c"))]
+    if csv_engine() == "pyarrow":
+        paths.append(("sniffed/pyarrow", lambda b: read_spectro_csv(io.BytesIO(b), engine="pyarrow")))
+    else:
+        print("pyarrow is not installed; only the C engine is measured")
+
+    print(f"{'layout':>10}{'rows':>9}{'MB':>7}" + "".join(f"{name + ' s':>18}{'cols':>6}" for name, _ in paths))
+    for rows in args.rows:
+        for layout, fmt in LAYOUTS.items():
+            content = make_csv(rows, **fmt)
+            line = f"{layout:>10}{rows:>9}{len(content) / 1e6:>7.1f}"
+            for _, fn in paths:
+                seconds, df = timed(fn, content)
+                numeric = sum(pd.api.types.is_float_dtype(t) for t in df.dtypes)
+                line += f"{seconds:>18.2f}{f'{df.shape[1]}/{numeric}':>6}"
+            print(line)
+    print("cols: columns found / float columns (15/11 expected)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,90 @@
+"""
+/api/analyze JSON encoding: the generic path (rows as dicts -> jsonable_encoder ->
+json.dumps) against core.frame_json, which encodes the rows straight from the frame.
+
+Checks both produce the same bytes, then prints time and peak Python memory per
+row count.
+
+Usage:
+    python benchmark_serializer.py --rows 10000 50000 200000
+"""
+import argparse
+import json
+import os
+import sys
+import time
+import tracemalloc
+
+import numpy as np
+import pandas as pd
+
+ROOT_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.join(ROOT_DIR, "backend"))
+
+from core.excel_processor import ExcelProcessor  # noqa: E402
+from core.frame_json import report_body  # noqa: E402
+
+
+def make_frame(rows: int, seed: int = 0):
+    """Parsed spectro frame (as load_spectro_frame returns it) with some blanks and infs."""
+    rng = np.random.default_rng(seed)
+    df = pd.DataFrame({
+        "S.No": range(1, rows + 1),
+        "Date": pd.Timestamp("2026-01-01") + pd.to_timedelta(rng.integers(0, 30, rows), unit="D"),
+        "Heat No": [f"{h}A26-DISA" for h in rng.integers(100, 400, rows)],
+        "C%": rng.normal(3.6, 0.15, rows).round(2),
+        "Si%": rng.normal(2.4, 0.2, rows).round(2),
+        "Mn%": rng.normal(0.3, 0.05, rows).round(3),
+        "P%": rng.normal(0.03, 0.005, rows).round(4),
+        "S%": rng.normal(0.01, 0.002, rows).round(4),
+        "Mg": rng.normal(0.045, 0.005, rows).round(4),
+        "Sample Id": [f"S{i:06d}" for i in range(rows)],
+        "Grade": rng.choice(["FG260", "SG 500/7", "4512"], rows),
+    })
+    df.loc[df.sample(frac=0.02, random_state=seed).index, "Mn%"] = np.nan
+    df.loc[df.sample(frac=0.001, random_state=seed + 1).index, "Mg"] = np.inf
+    return ExcelProcessor().calculate_ce(df)
+
+
+def generic_body(processor, df):
+    from fastapi.encoders import jsonable_encoder
+    result = processor.build_report(df)
+    return json.dumps(jsonable_encoder(result), ensure_ascii=False, allow_nan=False,
+                      indent=None, separators=(",", ":")).encode("utf-8")
+
+
+def direct_body(processor, df):
+    return report_body(processor.build_report(df, with_data=False), df)
+
+
+def measure(fn, *args):
+    start = time.perf_counter()
+    fn(*args)
+    elapsed = time.perf_counter() - start
+    tracemalloc.start()
+    fn(*args)
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return elapsed, peak
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, nargs="+", default=[10000, 50000, 200000])
+    args = parser.parse_args()
+
+    processor = ExcelProcessor()
+    print(f"{'rows':>8}{'MB':>8}{'generic s':>11}{'direct s':>10}{'speedup':>9}{'generic MB':>12}{'direct MB':>11}")
+    for rows in args.rows:
+        df = make_frame(rows)
+        body = direct_body(processor, df)
+        if body != generic_body(processor, df):
+            raise SystemExit(f"Encodings differ for {rows} rows")
+        g_time, g_peak = measure(generic_body, processor, df)
+        d_time, d_peak = measure(direct_body, processor, df)
+        print(f"{rows:>8}{len(body) / 1e6:>8.1f}{g_time:>11.2f}{d_time:>10.2f}{g_time / d_time:>8.1f}x"
+              f"{g_peak / 1e6:>12.1f}{d_peak / 1e6:>11.1f}")
+
+
+if __name__ == "__main__":
+    main()
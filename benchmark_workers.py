@@ -0,0 +1,133 @@
+"""
+Throughput of /api/analyze for different uvicorn worker counts.
+
+Starts the backend with `uvicorn main:app --workers N` for each N, fires
+concurrent uploads of distinct synthetic spectro files (so the shared parse
+cache does not short-circuit the work) and prints requests/second per N.
+
+Usage:
+    python benchmark_workers.py --workers 1 2 4 --requests 120 --concurrency 8
+"""
+import argparse
+import io
+import os
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+import urllib.request
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+import pandas as pd
+
+ROOT_DIR = os.path.dirname(os.path.abspath(__file__))
+BACKEND_DIR = os.path.join(ROOT_DIR, "backend")
+
+
+def make_spectro_file(rows: int, seed: int):
+    """Synthetic spectro export shaped like the plant's daily files."""
+    rng = np.random.default_rng(seed)
+    df = pd.DataFrame({
+        "S.No": range(1, rows + 1),
+        "Date": pd.Timestamp("2026-01-01") + pd.to_timedelta(rng.integers(0, 30, rows), unit="D"),
+        "Heat No": [f"{h}A26-DISA" for h in rng.integers(100, 400, rows)],
+        "C%": rng.normal(3.6, 0.15, rows).round(3),
+        "Si%": rng.normal(2.4, 0.2, rows).round(3),
+        "Mn%": rng.normal(0.3, 0.05, rows).round(3),
+        "P%": rng.normal(0.03, 0.005, rows).round(4),
+        "S%": rng.normal(0.01, 0.002, rows).round(4),
+        "Mg": rng.normal(0.045, 0.005, rows).round(4),
+        "Sample Id": [f"S{i:05d}" for i in range(rows)],
+        "Grade": rng.choice(["FG260", "SG 500/7", "4512"], rows),
+    })
+    buf = io.BytesIO()
+    df.to_excel(buf, index=False)
+    return buf.getvalue()
+
+
+def multipart_body(filename: str, content: bytes):
+    boundary = uuid.uuid4().hex
+    head = (
+        f"--{boundary}\r\n"
+        f'Content-Disposition: form-data; name="file"; filename="{filename}"\r\n'
+        "Content-Type: application/octet-stream\r\n\r\n"
+    ).encode()
+    tail = f"\r\n--{boundary}--\r\n".encode()
+    return head + content + tail, f"multipart/form-data; boundary={boundary}"
+
+
+def free_port():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def wait_ready(base: str, timeout: float = 60):
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        try:
+            with urllib.request.urlopen(f"{base}/api/health", timeout=2):
+                return
+        except OSError:
+            time.sleep(0.2)
+    raise RuntimeError("Backend did not become ready")
+
+
+def run_one(workers: int, files, concurrency: int):
+    port = free_port()
+    base = f"http://127.0.0.1:{port}"
+    # Every analyze also feeds the SPC aggregates, day partitions and history under
+    # MTC_DATA_DIR: keep the synthetic uploads out of the real data/
+    env = dict(os.environ,
+               MTC_CACHE_DIR=tempfile.mkdtemp(prefix="mtc_bench_"),
+               MTC_DATA_DIR=tempfile.mkdtemp(prefix="mtc_bench_data_"))
+    server = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "main:app", "--host", "127.0.0.1",
+         "--port", str(port), "--workers", str(workers), "--log-level", "warning"],
+        cwd=BACKEND_DIR, env=env
+    )
+    try:
+        wait_ready(base)
+
+        def post(i):
+            body, ctype = multipart_body(f"bench_{i}.xlsx", files[i])
+            req = urllib.request.Request(f"{base}/api/analyze", data=body, headers={"Content-Type": ctype})
+            with urllib.request.urlopen(req, timeout=120) as resp:
+                resp.read()
+                return resp.status
+
+        start = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=concurrency) as pool:
+            statuses = list(pool.map(post, range(len(files))))
+        elapsed = time.perf_counter() - start
+        errors = sum(1 for s in statuses if s != 200)
+        return len(files) / elapsed, elapsed, errors
+    finally:
+        server.terminate()
+        server.wait(timeout=30)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 2, 4])
+    parser.add_argument("--requests", type=int, default=120)
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--rows", type=int, default=300)
+    args = parser.parse_args()
+
+    print(f"Generating {args.requests} synthetic spectro files ({args.rows} rows each)...")
+    files = [make_spectro_file(args.rows, seed) for seed in range(args.requests)]
+
+    print(f"\n{'workers':>8}{'req/s':>10}{'seconds':>10}{'errors':>8}{'speedup':>10}")
+    baseline = None
+    for n in args.workers:
+        rps, elapsed, errors = run_one(n, files, args.concurrency)
+        baseline = baseline or rps
+        print(f"{n:>8}{rps:>10.1f}{elapsed:>10.2f}{errors:>8}{rps / baseline:>9.2f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -33,6 +33,12 @@ interface TestResult {
     Hide?: boolean;
 }
 
+// Precomputed per heat by /api/analyze?with_drafts=true
+interface HeatDraft {
+    grade: string;
+    samples: Record<string, string>[];
+}
+
 interface MTCData {
     invoice_no: string;
     date: string;
@@ -73,6 +79,45 @@ const ELEMENT_ALIASES: Record<string, string[]> = {
     "Moly": ["Mo [%]", "Mo", "MOLYBDENUM", "MOLY", "Mo%"],
 };
 
+// Dashboard element names that the backend drafts spell differently
+const DRAFT_ELEMENT_NAMES: Record<string, string> = { "Nickle": "Nickel", "Molybdenum": "Moly" };
+
+// Element symbols, the keys of the backend's value_format rules
+const ELEMENT_SYMBOLS: Record<string, string> = {
+    "Carbon": "C", "Silicon": "Si", "Manganese": "Mn", "Phosphorus": "P", "Sulphur": "S", "Chromium": "Cr",
+    "Copper": "Cu", "Tin": "Sn", "Magnesium": "Mg", "Nickle": "Ni", "Nickel": "Ni", "Moly": "Mo",
+    "Molybdenum": "Mo", "CE": "CE",
+};
+
+type ValueFormat = Record<string, { decimals: number; unit: string }>;
+
+// Used until /api/bootstrap has sent the configured rules (same defaults as backend/core/value_format.py)
+const DEFAULT_VALUE_FORMAT: ValueFormat = {
+    "default": { decimals: 2, unit: "%" }, "Mg": { decimals: 3, unit: "%" }, "S": { decimals: 3, unit: "%" },
+};
+
+// Python's "%.Nf": like toFixed, except exact ties (0.125 at 2 decimals) round to even
+const toFixedHalfEven = (x: number, decimals: number) => {
+    const rounded = x.toFixed(decimals);
+    const exact = Math.abs(x).toFixed(100);
+    const point = exact.indexOf('.');
+    if (!/^50*$/.test(exact.slice(point + 1 + decimals))) return rounded;
+    const truncated = exact.slice(0, decimals ? point + 1 + decimals : point);
+    return Number(truncated[truncated.length - 1]) % 2 === 0 ? (x < 0 ? '-' : '') + truncated : rounded;
+};
+
+// Observed value as the backend's ValueFormatter writes it ("3.49%", "0.045%"); text kept, blanks blank
+const formatObserved = (value: any, element: string, rules: ValueFormat) => {
+    if (value === null || value === undefined) return "";
+    const text = value.toString().trim();
+    if (text === "") return "";
+    const number = Number(text);
+    if (Number.isNaN(number)) return text;
+    if (!Number.isFinite(number)) return "";
+    const rule = rules[ELEMENT_SYMBOLS[element] || ""] || rules["default"] || DEFAULT_VALUE_FORMAT["default"];
+    return toFixedHalfEven(number, rule.decimals) + rule.unit;
+};
+
 const STANDARD_ELEMENTS = ["Carbon", "Silicon", "Manganese", "Phosphorus", "Sulphur", "Chromium", "Copper", "Tin", "Magnesium", "Nickle", "Moly"];
 const STANDARD_MECHANICAL = ["2.1 Hardness", "2.2 Tensile Strength", "2.3 Yield Strength", "2.4 % Of Elongation"];
 
@@ -109,6 +154,7 @@ export default function Dashboard() {
         grade: ""
     });
     const [settings, setSettings] = useState<any>(null);
+    const [valueFormat, setValueFormat] = useState<ValueFormat>(DEFAULT_VALUE_FORMAT);
     const [loading, setLoading] = useState(false);
     const [error, setError] = useState<string | null>(null);
     const [deduplicate, setDeduplicate] = useState(false);
@@ -124,7 +170,12 @@ export default function Dashboard() {
     const [activeFilterCol, setActiveFilterCol] = useState<string | null>(null);
     const [gradeMaster, setGradeMaster] = useState<Record<string, { chemistry: any[], mechanical: any[] }>>({});
     const [selectedGradeMaster, setSelectedGradeMaster] = useState<string>("");
+    const [facets, setFacets] = useState<{ columns: Record<string, { values: string[], counts: number[] }>, grades: string[] } | null>(null);
+    const [heatDrafts, setHeatDrafts] = useState<Record<string, HeatDraft> | null>(null);
+    const [sessionId, setSessionId] = useState<string | null>(null);
     const filterRef = React.useRef<HTMLDivElement>(null);
+    // Last certificate generated on the server, so later downloads only send the edited fields
+    const certificateRef = React.useRef<{ id: string, data: MTCData, settings: any } | null>(null);
 
     useEffect(() => {
         const handleClickOutside = (event: MouseEvent) => {
@@ -137,11 +188,24 @@ export default function Dashboard() {
     }, []);
 
     useEffect(() => {
-        fetchSettings();
-        fetchFormats();
-        fetchGradeMaster();
+        fetchBootstrap();
     }, []);
 
+    // Single round trip for startup state; falls back to the individual endpoints
+    const fetchBootstrap = async () => {
+        try {
+            const res = await axios.get(`${API_BASE}/bootstrap`);
+            setSettings(res.data.settings);
+            if (res.data.value_format) setValueFormat(res.data.value_format);
+            setSavedFormats({ ...res.data.formats });
+            setGradeMaster(res.data.grade_master);
+        } catch (err) {
+            fetchSettings();
+            fetchFormats();
+            fetchGradeMaster();
+        }
+    };
+
     const fetchGradeMaster = async () => {
         try {
             const res = await axios.get(`${API_BASE}/grade-master`);
@@ -170,17 +234,25 @@ export default function Dashboard() {
     };
 
     const handleFileUpload = async (e: React.ChangeEvent<HTMLInputElement>) => {
-        const file = e.target.files?.[0];
-        if (!file) return;
+        const files = Array.from(e.target.files || []);
+        if (files.length === 0) return;
 
         setError(null);
         const formData = new FormData();
-        formData.append('file', file);
+        // Several reports are parsed in parallel and merged into one dataset
+        if (files.length === 1) {
+            formData.append('file', files[0]);
+        } else {
+            files.forEach(f => formData.append('files', f));
+        }
 
         try {
-            const res = await axios.post(`${API_BASE}/analyze`, formData);
+            const res = await axios.post(`${API_BASE}/analyze`, formData, { params: { with_facets: true, with_drafts: true } });
             const analyzedData = res.data.data;
             setData(analyzedData);
+            setFacets(res.data.facets || null);
+            setHeatDrafts(res.data.drafts || null);
+            setSessionId(res.data.session_id || null);
             setAvailableHeats(res.data.heats || []);
             setSelectedFormat(""); // Reset format selection on new upload
             setColumnFilters({}); // Reset filters on new upload
@@ -210,7 +282,7 @@ export default function Dashboard() {
             if (res.data.heats && res.data.heats.length > 0) {
                 const h1 = res.data.heats[0];
                 const h2 = res.data.heats.length > 1 ? res.data.heats[1] : res.data.heats[0];
-                autoMapHeats(h1, h2, res.data.data);
+                autoMapHeats(h1, h2, res.data.data, res.data.drafts || null);
             }
         } catch (err: any) {
             const msg = err.response?.data?.detail || "Error analyzing report. Please check the file format.";
@@ -267,25 +339,44 @@ export default function Dashboard() {
         }
     };
 
-    const autoMapHeats = (h1: string, h2: string, currentData?: any[]) => {
+    const autoMapHeats = (h1: string, h2: string, currentData?: any[], drafts?: Record<string, HeatDraft> | null) => {
         const activeData = currentData || filteredData;
-        const row1 = activeData.find(d => (d['Heat No'] || d['HEAT NO'] || d['heat_no'] || '').toString() === h1);
-        const row2 = activeData.find(d => (d['Heat No'] || d['HEAT NO'] || d['heat_no'] || '').toString() === h2);
-
-        const newChem = mtcData.chemistry.map(item => {
-            const aliases = ELEMENT_ALIASES[item.Element || ""] || [];
-            let v1 = "";
-            let v2 = "";
-            if (row1) {
-                const col = Object.keys(row1).find(k => aliases.includes(k));
-                if (col) v1 = row1[col]?.toString() || "";
-            }
-            if (row2) {
-                const col = Object.keys(row2).find(k => aliases.includes(k));
-                if (col) v2 = row2[col]?.toString() || "";
-            }
-            return { ...item, heat1_val: v1, heat2_val: v2 };
-        });
+        const heatRows = (heat: string) => activeData.filter(d => (d['Heat No'] || d['HEAT NO'] || d['heat_no'] || '').toString() === heat);
+        const row1 = heatRows(h1)[0];
+        // The same heat in both columns shows its second sample in column 2 (its first if it has only one)
+        const sample2 = h2 === h1 ? 1 : 0;
+
+        // Drafts are built from the whole file, so only use them while no filter has dropped rows
+        const draftSource = drafts !== undefined ? drafts : (activeData.length === data.length ? heatDrafts : null);
+        const draft1 = draftSource?.[h1]?.samples[0];
+        const draft2 = draftSource?.[h2]?.samples[sample2] || draftSource?.[h2]?.samples[0];
+
+        let newChem: TestResult[];
+        if (draft1 && draft2) {
+            // Precomputed chemistry: a lookup per element, no row scanning
+            newChem = mtcData.chemistry.map(item => {
+                const name = DRAFT_ELEMENT_NAMES[item.Element || ""] || item.Element || "";
+                return { ...item, heat1_val: draft1[name] || "", heat2_val: draft2[name] || "" };
+            });
+        } else {
+            const rows2 = heatRows(h2);
+            const row2 = rows2[sample2] || rows2[0];
+            newChem = mtcData.chemistry.map(item => {
+                const aliases = ELEMENT_ALIASES[item.Element || ""] || [];
+                let v1 = "";
+                let v2 = "";
+                // Formatted like the drafts, so a heat looks the same whichever path filled it
+                if (row1) {
+                    const col = Object.keys(row1).find(k => aliases.includes(k));
+                    if (col) v1 = formatObserved(row1[col], item.Element || "", valueFormat);
+                }
+                if (row2) {
+                    const col = Object.keys(row2).find(k => aliases.includes(k));
+                    if (col) v2 = formatObserved(row2[col], item.Element || "", valueFormat);
+                }
+                return { ...item, heat1_val: v1, heat2_val: v2 };
+            });
+        }
 
         const newMech = mtcData.mechanical.map(m => {
             if (!row1 || !m.Parameter) return m;
@@ -294,7 +385,8 @@ export default function Dashboard() {
             return col ? { ...m, heat1_val: row1[col]?.toString() || "" } : m;
         });
 
-        setMtcData(prev => ({ ...prev, heat1: h1, heat2: h2, chemistry: newChem, mechanical: newMech }));
+        const draftGrade = draftSource?.[h1]?.grade || "";
+        setMtcData(prev => ({ ...prev, heat1: h1, heat2: h2, chemistry: newChem, mechanical: newMech, grade: prev.grade || draftGrade }));
     };
 
     // Auto-sync mapping when filters change
@@ -441,7 +533,40 @@ export default function Dashboard() {
         });
     });
 
+    const handleExportView = async (fileFormat: 'xlsx' | 'csv') => {
+        if (!sessionId) return;
+        setLoading(true);
+        try {
+            // The backend re-applies the same filters to the analysed file and streams the result
+            const response = await axios.post(`${API_BASE}/export`, {
+                session_id: sessionId,
+                filters: columnFilters,
+                // Columns as shown (a loaded format may have been toggled since)
+                columns: masterColumns.filter(c => visibleColumns.includes(c)),
+                file_format: fileFormat
+            }, { responseType: 'blob' });
+
+            const url = window.URL.createObjectURL(new Blob([response.data]));
+            const link = document.createElement('a');
+            link.href = url;
+            link.setAttribute('download', `Report_${selectedFormat || 'View'}.${fileFormat}`);
+            document.body.appendChild(link);
+            link.click();
+            link.remove();
+        } catch (err: any) {
+            const msg = err.response?.status === 404
+                ? "Session expired. Please re-upload the report."
+                : "Failed to export the current view.";
+            setError(msg);
+        } finally {
+            setLoading(false);
+        }
+    };
+
     const getUniqueValues = (col: string) => {
+        // Precomputed by the backend at analyze time
+        const facet = facets?.columns[col];
+        if (facet) return facet.values;
         const vals = data.map(row => (row[col] ?? "").toString());
         return Array.from(new Set(vals)).filter(v => v !== "").sort();
     };
@@ -485,12 +610,32 @@ export default function Dashboard() {
             const downloadSettings = settings || {
                 mtc_template_path: "Final correct.xlsx"
             };
-            const response = await axios.post(`${API_BASE}/generate-excel`, {
-                data: mtcData,
-                settings: downloadSettings
-            }, {
-                responseType: 'blob'
-            });
+            const requestCertificate = async () => {
+                const last = certificateRef.current;
+                if (last && JSON.stringify(last.settings) === JSON.stringify(downloadSettings)) {
+                    const changed: Partial<MTCData> = {};
+                    (Object.keys(mtcData) as (keyof MTCData)[]).forEach(key => {
+                        if (JSON.stringify(mtcData[key]) !== JSON.stringify(last.data[key])) {
+                            (changed as any)[key] = mtcData[key];
+                        }
+                    });
+                    try {
+                        return await axios.patch(`${API_BASE}/certificates/${last.id}`, { data: changed }, { responseType: 'blob' });
+                    } catch (err: any) {
+                        // Expired on the server: generate it again below
+                        if (err.response?.status !== 404) throw err;
+                    }
+                }
+                return await axios.post(`${API_BASE}/certificates`, {
+                    data: mtcData,
+                    settings: downloadSettings
+                }, {
+                    responseType: 'blob'
+                });
+            };
+            const response = await requestCertificate();
+            const certificateId = response.headers['x-certificate-id'];
+            certificateRef.current = certificateId ? { id: certificateId, data: mtcData, settings: downloadSettings } : null;
 
             const url = window.URL.createObjectURL(new Blob([response.data]));
             const link = document.createElement('a');
@@ -506,7 +651,7 @@ export default function Dashboard() {
             setLoading(false);
         }
     };
-    const gradesInRange = Array.from(new Set(data.flatMap((row: any) => {
+    const gradesInRange = facets ? facets.grades : Array.from(new Set(data.flatMap((row: any) => {
         const gradeAliases = [
             "Grade", "GRADE", "Grade No", "Cast Grade", "Grade / Spec",
             "Reference", "Ref / Grade", "Material Grade", "Spec / Grade", "MATERIAL", "SPEC", "Standard"
@@ -608,6 +753,25 @@ export default function Dashboard() {
                         </div>
                     </div>
 
+                    {sessionId && (
+                        <div>
+                            <h3 className="text-sm font-semibold uppercase tracking-wider text-gray-400 mb-2 font-mono">Export View</h3>
+                            <div className="grid grid-cols-2 gap-2">
+                                {(['xlsx', 'csv'] as const).map(fmt => (
+                                    <button
+                                        key={fmt}
+                                        onClick={() => handleExportView(fmt)}
+                                        disabled={loading}
+                                        className="bg-[#31333f] p-2 rounded-lg text-xs font-bold text-gray-300 hover:bg-[#3d3f4b] hover:text-white transition-all border border-gray-700/50 flex items-center justify-center gap-2 disabled:opacity-50"
+                                    >
+                                        <Download className="w-3 h-3" />
+                                        {fmt.toUpperCase()}
+                                    </button>
+                                ))}
+                            </div>
+                        </div>
+                    )}
+
                     <div>
                         <label className="flex items-center gap-3 mb-4 cursor-pointer group">
                             <input
@@ -654,7 +818,7 @@ export default function Dashboard() {
                 <div className="flex justify-between items-start mb-10">
                     <h1 className="text-4xl font-bold text-white tracking-tight">Spectro Report Viewer</h1>
                     <div className="flex items-center gap-4">
-                        <input type="file" className="hidden" onChange={handleFileUpload} id="spectro-upload-header" />
+                        <input type="file" multiple className="hidden" onChange={handleFileUpload} id="spectro-upload-header" />
                         <label htmlFor="spectro-upload-header" className="px-6 py-2 bg-red-600 text-white text-xs font-black uppercase tracking-widest rounded-xl hover:bg-red-700 cursor-pointer shadow-lg shadow-red-900/20 transition-all active:scale-95 flex items-center gap-2">
                             <Upload className="w-4 h-4" />
                             Upload Report
@@ -699,7 +863,7 @@ export default function Dashboard() {
                                         <p className="text-gray-200 text-lg font-semibold">Drag and drop file here</p>
                                         <p className="text-sm text-gray-500 mt-2">Limit 200MB per file • XLSX, CSV</p>
                                     </div>
-                                    <input type="file" className="hidden" onChange={handleFileUpload} id="spectro-upload" />
+                                    <input type="file" multiple className="hidden" onChange={handleFileUpload} id="spectro-upload" />
                                     <label htmlFor="spectro-upload" className="mt-10 px-10 py-3 bg-red-600 text-white font-bold rounded-2xl hover:bg-red-700 cursor-pointer shadow-xl shadow-red-900/20 transition-all active:scale-95 z-10">Browse files</label>
                                 </div>
                             </section>
@@ -0,0 +1,280 @@
+"""
+Load test for the FastAPI backend.
+
+Drives a weighted mix of endpoints from N concurrent clients, either in-process
+(TestClient, no server needed), against a uvicorn started for the run, or against
+a server that is already running. Uploads are distinct synthetic spectro files, so
+the shared parse cache does not short-circuit /api/analyze. Prints throughput,
+p50/p95/p99 latency and error rate per endpoint and saves them as JSON.
+
+Usage:
+    python load_test.py --requests 200 --concurrency 8
+    python load_test.py --target local --workers 2 --mix analyze=1,generate=2,settings=4
+    python load_test.py --target http://127.0.0.1:8000 --duration 60 --output after.json --compare before.json
+"""
+import argparse
+import datetime
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import urllib.error
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+
+from benchmark_workers import BACKEND_DIR, free_port, make_spectro_file, multipart_body, wait_ready
+
+DEFAULT_MIX = "analyze=2,generate=2,settings=4,bootstrap=2"
+ENDPOINTS = ("analyze", "generate", "settings", "settings-save", "bootstrap", "health")
+
+# A certificate shaped like the Dashboard's download payload
+CERTIFICATE = {
+    "invoice_no": "LT-0001",
+    "qty": "1200 no's",
+    "date": "01-10-2026",
+    "part_details": "",
+    "heat1": "120A26-DISA",
+    "heat2": "121A26-DISA",
+    "grade": "4512",
+    "chemistry": [
+        {"Element": name, "Spec": "-", "heat1_val": value, "heat2_val": value}
+        for name, value in [("Carbon", 3.61), ("Silicon", 2.42), ("Manganese", 0.31), ("Phosphorus", 0.031),
+                            ("Sulphur", 0.011), ("Magnesium", 0.045), ("CE", 4.42)]
+    ],
+    "mechanical": [
+        {"Parameter": "3.1 Hardness", "Spec": "156-217 HB", "heat1_val": "197/197/197/207/207 BHN"},
+        {"Parameter": "3.2 Tensile Strength", "Spec": "Min 450 Mpa", "heat1_val": "515.28 Mpa"},
+    ],
+}
+
+
+class InProcessClient:
+    """Calls the app through TestClient; nothing is sent over the network."""
+
+    def __init__(self):
+        sys.path.insert(0, BACKEND_DIR)
+        import main
+        from fastapi.testclient import TestClient
+        self.client = TestClient(main.app)
+
+    def request(self, method, path, json_body=None, upload=None):
+        files = {"file": upload} if upload else None
+        resp = self.client.request(method, path, json=json_body, files=files)
+        return resp.status_code, resp.content
+
+
+class HttpClient:
+    def __init__(self, base: str):
+        self.base = base.rstrip("/")
+
+    def request(self, method, path, json_body=None, upload=None):
+        headers = {}
+        data = None
+        if upload:
+            data, headers["Content-Type"] = multipart_body(*upload)
+        elif json_body is not None:
+            data = json.dumps(json_body).encode()
+            headers["Content-Type"] = "application/json"
+        req = urllib.request.Request(self.base + path, data=data, headers=headers, method=method)
+        try:
+            with urllib.request.urlopen(req, timeout=300) as resp:
+                return resp.status, resp.read()
+        except urllib.error.HTTPError as e:
+            return e.code, e.read()
+
+
+class Scenario:
+    """The request each mix entry sends. Upload files are used round-robin."""
+
+    def __init__(self, files):
+        self.files = files
+        self._next = 0
+        self._lock = threading.Lock()
+        self.settings = None
+
+    def _upload(self):
+        with self._lock:
+            i = self._next
+            self._next += 1
+        return f"load_{i}.xlsx", self.files[i % len(self.files)]
+
+    def run(self, client, name):
+        if name == "analyze":
+            return client.request("POST", "/api/analyze", upload=self._upload())
+        if name == "generate":
+            return client.request("POST", "/api/generate-excel", {"settings": self.settings, "data": CERTIFICATE})
+        if name == "settings":
+            return client.request("GET", "/api/settings")
+        if name == "settings-save":
+            # Writes back the settings read at start-up, so the file keeps its content
+            return client.request("POST", "/api/settings", self.settings)
+        if name == "bootstrap":
+            return client.request("GET", "/api/bootstrap")
+        if name == "health":
+            return client.request("GET", "/api/health")
+
+
+def parse_mix(text: str):
+    mix = {}
+    for part in text.split(","):
+        name, _, weight = part.partition("=")
+        name = name.strip()
+        if name not in ENDPOINTS:
+            raise SystemExit(f"Unknown endpoint in --mix: {name} (choose from {', '.join(ENDPOINTS)})")
+        mix[name] = float(weight or 1)
+    return mix
+
+
+def summarize(samples, elapsed):
+    """samples: (endpoint, seconds, ok) -> per-endpoint and overall statistics."""
+    def stats(rows):
+        latencies = np.array([s for _, s, _ in rows]) * 1000
+        errors = sum(1 for _, _, ok in rows if not ok)
+        return {
+            "requests": len(rows),
+            "throughput_rps": round(len(rows) / elapsed, 2),
+            "p50_ms": round(float(np.percentile(latencies, 50)), 1),
+            "p95_ms": round(float(np.percentile(latencies, 95)), 1),
+            "p99_ms": round(float(np.percentile(latencies, 99)), 1),
+            "mean_ms": round(float(latencies.mean()), 1),
+            "error_rate": round(errors / len(rows), 4),
+        }
+
+    endpoints = sorted({name for name, _, _ in samples})
+    result = {name: stats([s for s in samples if s[0] == name]) for name in endpoints}
+    if samples:
+        result["ALL"] = stats(samples)
+    return result
+
+
+def print_table(summary, baseline=None):
+    print(f"\n{'endpoint':<14}{'reqs':>7}{'req/s':>9}{'p50 ms':>9}{'p95 ms':>9}{'p99 ms':>9}{'errors':>9}"
+          + (f"{'p95 vs base':>13}" if baseline else ""))
+    for name, s in summary.items():
+        line = (f"{name:<14}{s['requests']:>7}{s['throughput_rps']:>9.1f}{s['p50_ms']:>9.1f}"
+                f"{s['p95_ms']:>9.1f}{s['p99_ms']:>9.1f}{s['error_rate']:>8.1%}")
+        base = (baseline or {}).get(name)
+        if base and base["p95_ms"]:
+            line += f"{s['p95_ms'] / base['p95_ms']:>12.2f}x"
+        print(line)
+
+
+def start_server(workers: int):
+    port = free_port()
+    env = dict(os.environ,
+               MTC_CACHE_DIR=os.environ.get("MTC_CACHE_DIR", tempfile.mkdtemp(prefix="mtc_load_cache_")),
+               MTC_DATA_DIR=os.environ.get("MTC_DATA_DIR", tempfile.mkdtemp(prefix="mtc_load_data_")))
+    server = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "main:app", "--host", "127.0.0.1",
+         "--port", str(port), "--workers", str(workers), "--log-level", "warning"],
+        cwd=BACKEND_DIR, env=env
+    )
+    base = f"http://127.0.0.1:{port}"
+    try:
+        wait_ready(base)
+    except Exception:
+        server.terminate()
+        raise
+    return server, base
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--target", default="inprocess",
+                        help="'inprocess', 'local' (start uvicorn for the run) or a base URL")
+    parser.add_argument("--workers", type=int, default=1, help="uvicorn workers for --target local")
+    parser.add_argument("--mix", default=DEFAULT_MIX,
+                        help=f"endpoint=weight list; endpoints: {', '.join(ENDPOINTS)}")
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--requests", type=int, default=200, help="total requests (ignored with --duration)")
+    parser.add_argument("--duration", type=float, help="run for this many seconds instead of a fixed count")
+    parser.add_argument("--rows", type=int, default=300, help="rows per synthetic spectro file")
+    parser.add_argument("--files", type=int, default=20, help="distinct synthetic files to upload")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", help="save results as JSON (default: load_test_<timestamp>.json)")
+    parser.add_argument("--compare", help="earlier results JSON to compare p95 latency against")
+    args = parser.parse_args()
+
+    mix = parse_mix(args.mix)
+    scenario = Scenario([make_spectro_file(args.rows, args.seed + i) for i in range(args.files)]
+                        if "analyze" in mix else [b""])
+
+    server = None
+    if args.target == "inprocess":
+        # Keep the run's caches and history out of the project folders
+        os.environ.setdefault("MTC_CACHE_DIR", tempfile.mkdtemp(prefix="mtc_load_cache_"))
+        os.environ.setdefault("MTC_DATA_DIR", tempfile.mkdtemp(prefix="mtc_load_data_"))
+        client = InProcessClient()
+    elif args.target == "local":
+        server, base = start_server(args.workers)
+        client = HttpClient(base)
+    else:
+        client = HttpClient(args.target)
+
+    try:
+        status, body = client.request("GET", "/api/settings")
+        if status != 200:
+            raise SystemExit(f"GET /api/settings returned {status}")
+        scenario.settings = json.loads(body)
+
+        names = list(mix)
+        weights = np.array([mix[n] for n in names]) / sum(mix.values())
+        rng = np.random.default_rng(args.seed)
+        deadline = time.perf_counter() + args.duration if args.duration else None
+        plan = iter(rng.choice(names, size=args.requests, p=weights)) if not deadline else None
+        plan_lock = threading.Lock()
+        samples = []
+
+        def next_endpoint():
+            with plan_lock:
+                if deadline:
+                    return rng.choice(names, p=weights) if time.perf_counter() < deadline else None
+                return next(plan, None)
+
+        def worker():
+            while (name := next_endpoint()) is not None:
+                start = time.perf_counter()
+                try:
+                    status, _ = scenario.run(client, str(name))
+                    ok = 200 <= status < 300
+                except Exception:
+                    ok = False
+                samples.append((str(name), time.perf_counter() - start, ok))
+
+        print(f"Target: {args.target}  concurrency: {args.concurrency}  mix: {args.mix}")
+        start = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=args.concurrency) as pool:
+            for _ in range(args.concurrency):
+                pool.submit(worker)
+        elapsed = time.perf_counter() - start
+    finally:
+        if server is not None:
+            server.terminate()
+            server.wait(timeout=30)
+
+    summary = summarize(samples, elapsed)
+    baseline = None
+    if args.compare:
+        with open(args.compare, encoding="utf-8") as f:
+            baseline = json.load(f)["endpoints"]
+    print_table(summary, baseline)
+    print(f"\n{len(samples)} requests in {elapsed:.2f}s")
+
+    output = args.output or f"load_test_{datetime.datetime.now():%Y%m%d_%H%M%S}.json"
+    with open(output, "w", encoding="utf-8") as f:
+        json.dump({
+            "run_at": datetime.datetime.now().isoformat(timespec="seconds"),
+            "config": vars(args),
+            "elapsed_s": round(elapsed, 3),
+            "endpoints": summary,
+        }, f, indent=2)
+    print(f"Results saved to {output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,86 @@
+"""
+Import-time profile of the backend (and optionally the Streamlit app).
+
+Runs `python -X importtime` in a fresh interpreter and prints the slowest
+modules by cumulative and self time.
+
+Usage:
+    python profile_startup.py                 # backend/main.py
+    python profile_startup.py --target app    # Streamlit app.py (its module-level code and imports)
+    python profile_startup.py --top 30 --output startup_profile.json
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+import time
+
+ROOT_DIR = os.path.dirname(os.path.abspath(__file__))
+
+TARGETS = {
+    # (working directory, statement to profile)
+    "backend": (os.path.join(ROOT_DIR, "backend"), "import main"),
+    # app.py itself, so its lazy imports show up as they are: main() only runs under
+    # `streamlit run`, the module-level code runs in Streamlit's bare mode
+    "app": (ROOT_DIR, "import app"),
+}
+
+
+def profile(target: str):
+    cwd, stmt = TARGETS[target]
+    start = time.perf_counter()
+    proc = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", stmt],
+        cwd=cwd, capture_output=True, text=True
+    )
+    wall = time.perf_counter() - start
+    if proc.returncode != 0:
+        raise SystemExit(f"Import failed:\n{proc.stderr[-2000:]}")
+
+    modules = []
+    for line in proc.stderr.splitlines():
+        # "import time: self [us] | cumulative | imported package"
+        if not line.startswith("import time:") or "imported package" in line:
+            continue
+        self_us, cum_us, name = line[len("import time:"):].split("|", 2)
+        modules.append({
+            "module": name.strip(),
+            "depth": (len(name) - len(name.lstrip())) // 2,
+            "self_ms": int(self_us) / 1000,
+            "cumulative_ms": int(cum_us) / 1000,
+        })
+    return {"target": target, "wall_ms": wall * 1000, "modules": modules}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--target", choices=sorted(TARGETS), default="backend")
+    parser.add_argument("--top", type=int, default=15)
+    parser.add_argument("--output", help="Write the full profile as JSON")
+    args = parser.parse_args()
+
+    report = profile(args.target)
+    mods = report["modules"]
+    top_level = [m for m in mods if m["depth"] == 0]
+
+    print(f"Startup profile: {args.target}  (interpreter wall time {report['wall_ms']:.0f} ms)")
+    print(f"Total import time: {sum(m['cumulative_ms'] for m in top_level):.0f} ms\n")
+
+    # Depth 0/1 are the target's own imports and what they pull in directly
+    print(f"{'Imports by cumulative time':<50}{'ms':>10}")
+    for m in sorted([m for m in mods if m["depth"] <= 1], key=lambda m: m["cumulative_ms"], reverse=True)[:args.top]:
+        print(f"  {m['module']:<48}{m['cumulative_ms']:>10.1f}")
+
+    print(f"\n{'Modules by self time':<50}{'ms':>10}")
+    for m in sorted(mods, key=lambda m: m["self_ms"], reverse=True)[:args.top]:
+        print(f"  {m['module']:<48}{m['self_ms']:>10.1f}")
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=4)
+        print(f"\nFull profile written to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
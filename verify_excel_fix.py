@@ -1,4 +1,6 @@
 from backend.core.excel_generator import ExcelGenerator
+from backend.core.template_layout import get_layout
+from backend.core.workbook_verifier import read_certificate, verify_certificate, cell_value, cell_fill
 import os
 import json
 
@@ -34,80 +36,56 @@ template_path = r"e:\2026 Report Famat\Final correct.xlsx"
 generator = ExcelGenerator(settings)
 output_bytes = generator.generate(template_path, data)
 
+# Expected rows come from the template's labels (same discovery the generator uses)
+with open(template_path, "rb") as f:
+    layout = get_layout(f.read())
+carbon_row = layout["elements"]["Carbon"]
+tin_row = layout["elements"]["Tin"]
+nickel_row = layout["elements"]["Nickel"]
+mech_row = layout["mechanical_rows"][0]
+
 output_path = r"e:\2026 Report Famat\verification_output.xlsx"
 with open(output_path, "wb") as f:
     f.write(output_bytes)
 
-# Verify
-from openpyxl import load_workbook
-wb = load_workbook(output_path)
-ws = wb.active
-
-errors = []
-
-# 1. Check Merges
-merges = [str(r) for r in ws.merged_cells.ranges]
-expected_merges = ["A2:B2", "C4:D4"] # Removed A14:D14 as we now unmerge it for data
-for em in expected_merges:
-    if not any(em in m for m in merges):
-        errors.append(f"Missing expected merge range: {em}")
-
-# 1.1 Check Print Setup
-if 'A$1:$D$50' not in str(ws.print_area):
-    errors.append(f"Print Area mismatch: {ws.print_area}, expected A1:D50")
+# Verify straight from the xlsx XML (no openpyxl reload)
+sheet = read_certificate(output_bytes)
 
-if not ws.sheet_properties.pageSetUpPr.fitToPage:
-    errors.append("FitToPage not set in sheet_properties")
+# Layout invariants: print area/fit to page, nothing right of column D, hidden empty
+# chemistry rows, C:D merges on the mechanical rows, thick outer border, template merges
+errors = verify_certificate(sheet, layout, data, required_merges=["A2:B2", "C4:D4"]) # A14:D14 is unmerged for data
 
-# 2. Check Column E
-for r in range(1, 100):
-    val = ws.cell(row=r, column=5).value
-    if val is not None:
-        errors.append(f"Column E is NOT empty at Row {r}: {val}")
-
-# 3. Check Concatenated Headers
-h4 = ws.cell(row=4, column=3).value
+# Concatenated Headers
+h4 = cell_value(sheet, 4, 3)
 if "Invoice No : INV-123" not in str(h4):
     errors.append(f"Row 4 Header mismatch: {h4}")
 
-h5 = ws.cell(row=5, column=3).value
+h5 = cell_value(sheet, 5, 3)
 if "Despatch Quantity:  100 Nos" not in str(h5):
     errors.append(f"Row 5 Header mismatch: {h5}")
 
-# 4. Check Chemistry Row Mapping & Clearing
-c14 = ws.cell(row=14, column=3).value
-if "3.50%" not in str(c14):
-    errors.append(f"Carbon not found at Row 14: {c14}")
-
-c26 = ws.cell(row=26, column=3).value
-if "0.10%" not in str(c26):
-    errors.append(f"Tin not found at Row 26: {c26}")
+# Chemistry Row Mapping & Clearing
+c_carbon = cell_value(sheet, carbon_row, 3)
+if "3.50%" not in str(c_carbon):
+    errors.append(f"Carbon not found at Row {carbon_row}: {c_carbon}")
 
-c21 = ws.cell(row=21, column=3).value
-if c21 is not None and not ws.row_dimensions[21].hidden:
-    errors.append(f"Slot Row 21 (Nickel) should be HIDDEN if empty, but found: {c21}")
+c_tin = cell_value(sheet, tin_row, 3)
+if "0.10%" not in str(c_tin):
+    errors.append(f"Tin not found at Row {tin_row}: {c_tin}")
 
-# 5. Check Mechanical Row Mapping & Merges
-m28 = ws.cell(row=28, column=3).value
-if "200 BHN" not in str(m28):
-    errors.append(f"Hardness not found at Row 28: {m28}")
+c_nickel = cell_value(sheet, nickel_row, 3)
+if c_nickel is not None or nickel_row not in sheet["hidden_rows"]:
+    errors.append(f"Slot Row {nickel_row} (Nickel) should be HIDDEN if empty, but found: {c_nickel}")
 
-# Check if C28:D28 is merged
-mechanical_merges = ["C28:D28", "C29:D29", "C30:D30", "C31:D31"]
-for mm in mechanical_merges:
-    if not any(mm in m for m in merges):
-         errors.append(f"Missing expected mechanical merge: {mm}")
+# Mechanical Row Mapping
+m_first = cell_value(sheet, mech_row, 3)
+if "200 BHN" not in str(m_first):
+    errors.append(f"Hardness not found at Row {mech_row}: {m_first}")
 
-# 6. Check Aesthetic Refinements (V15)
-# Carbon row background (should be None or white)
-carbon_fill = ws.cell(row=14, column=1).fill.start_color.index
-if carbon_fill not in ['00000000', 'FFFFFFFF', '00FFFFFF']:
-    errors.append(f"Carbon row (14) background should be white/None, but found: {carbon_fill}")
-
-# Thick border check (A1)
-border_left = ws.cell(row=1, column=1).border.left.style
-if border_left != 'thick':
-    errors.append(f"Outer border at A1 (left) should be thick, but found: {border_left}")
+# Aesthetic Refinements (V15): Carbon row background (should be None or white)
+carbon_fill = cell_fill(sheet, carbon_row, 1)
+if carbon_fill not in [None, '00000000', 'FFFFFFFF', '00FFFFFF']:
+    errors.append(f"Carbon row ({carbon_row}) background should be white/None, but found: {carbon_fill}")
 
 if not errors:
     print("VERIFICATION SUCCESSFUL: Aesthetics V15 (White Carbon, Merged Mechanical, Thick Border)")
@@ -115,4 +93,3 @@ else:
     print("VERIFICATION FAILED:")
     for e in errors:
         print(f" - {e}")
-
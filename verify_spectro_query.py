@@ -0,0 +1,74 @@
+from backend.core.excel_processor import ExcelProcessor
+from backend.core.spectro_store import SpectroStore
+from backend.core.dtypes import compact_frame
+import tempfile
+import pandas as pd
+
+# Two grades in one compacted file: Grade and Heat No become categoricals
+rows = 60
+df = pd.DataFrame({
+    "S.No": range(1, rows + 1),
+    "Date": ["05-01-2026"] * rows,
+    "Heat No": [f"{100 + i % 6}A26" for i in range(rows)],
+    "Grade": ["4512" if i % 2 == 0 else "6003" for i in range(rows)],
+    "C [%]": [3.5 + (i % 10) / 100 for i in range(rows)],
+})
+df, _ = compact_frame(df)
+
+processor = ExcelProcessor()
+errors = []
+with tempfile.TemporaryDirectory() as directory:
+    store = SpectroStore(directory, processor)
+    store.ingest(df, "verify-hash", "verify.xlsx")
+
+    # Query one grade out of two: no other grade or its heats may reach the filter dropdowns
+    result, _ = store.query(grade="4512")
+    facets = processor.build_facets(result)
+
+    if len(result) != rows // 2:
+        errors.append(f"Expected {rows // 2} rows of grade 4512, got {len(result)}")
+    grade_facet = facets["columns"]["Grade"]
+    if grade_facet["values"] != ["4512"] or grade_facet["counts"] != [rows // 2]:
+        errors.append(f"Grade facet lists grades without rows: {grade_facet}")
+    if facets["grades"] != ["4512"]:
+        errors.append(f"Facet grades should be ['4512'], found: {facets['grades']}")
+    if 0 in facets["columns"]["Heat No"]["counts"]:
+        errors.append(f"Heat No facet lists heats without rows: {facets['columns']['Heat No']}")
+    heats = processor.build_report(result, with_data=False)["heats"]
+    if sorted(heats) != ["100A26", "102A26", "104A26"]:
+        errors.append(f"Heats of grade 4512 mismatch: {heats}")
+
+# Text dates as CSV exports write them (ISO, year first) next to day-first ones: every row
+# must land in its own day, so a January query returns all twenty
+days = 20
+text_df = pd.DataFrame({
+    "Date": [f"2026-01-{d:02d}" for d in range(1, days + 1)],
+    "Heat No": [f"{200 + d}A26" for d in range(days)],
+    "Grade": ["4512"] * days,
+    "C [%]": [3.5] * days,
+})
+day_first = pd.DataFrame({"Date": ["21-01-2026", "22/01/2026"], "Heat No": ["301A26", "302A26"],
+                          "Grade": ["4512", "4512"], "C [%]": [3.6, 3.7]})
+
+with tempfile.TemporaryDirectory() as directory:
+    store = SpectroStore(directory, processor)
+    store.ingest(text_df, "verify-text-dates", "verify.csv")
+    store.ingest(day_first, "verify-day-first", "verify.xlsx")
+
+    expected_days = [f"2026-01-{d:02d}" for d in range(1, days + 3)]
+    if store.days() != expected_days:
+        errors.append(f"Text dates filed into the wrong days: {store.days()}")
+    result, _ = store.query(start="2026-01-01", end="2026-01-31", include_undated=True)
+    if len(result) != days + 2:
+        errors.append(f"January query should return {days + 2} rows, got {len(result)}")
+    result, _ = store.query(start="2026-01-13", end="2026-01-13")
+    heats = result["Heat No"].astype(str).tolist() if not result.empty else []
+    if heats != ["212A26"]:
+        errors.append(f"2026-01-13 should hold heat 212A26, found: {heats}")
+
+if not errors:
+    print("VERIFICATION SUCCESSFUL: Grade query facets only list values present in the result, text dates filed by day")
+else:
+    print("VERIFICATION FAILED:")
+    for e in errors:
+        print(f" - {e}")